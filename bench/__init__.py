@@ -0,0 +1,3 @@
+# -*- coding: utf-8 -*-
+# bench/__init__.py
+"""PDF 解析基准测试：合成语料（corpus.py）+ 分阶段计时（run.py，python -m bench.run）。"""
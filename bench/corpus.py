@@ -0,0 +1,243 @@
+# -*- coding: utf-8 -*-
+# bench/corpus.py
+"""
+基准测试用的合成 PDF 语料：仿照 95598 代理购电价格表的版式，覆盖解析器里专门处理过的几种情况。
+
+    标准版（河北）        单一制 / 两部制 各一行 1-10（20）千伏，后面带几页说明文字
+    浙江                  多一列「政府性基金」，表里第一条 1-10kV 是说明行，取第 2、3 条并倒序
+    江苏                  先两部制后单一制
+    缺尖（福建）          只有 峰 / 平 / 谷 三档
+    上海                  只写「10千伏」，首页没有「国网XX电力有限公司」字样
+    表头兜底（四川）      表头认不出分时列，走表头顺序 + 数字簇右对齐
+    大文档（山东）        十几页，价格表在中间页，用来观察预筛 / 按页切分的效果
+
+不依赖任何 PDF 库：直接写 PDF 对象，中文用 STSong-Light（Adobe-GB1，不嵌入字体），表格线用 m / l 画。
+同样的输入每次生成的字节完全相同，方便按 SHA-256 对比。
+"""
+import os
+
+FONT = (
+    b"<< /Type /Font /Subtype /Type0 /BaseFont /STSong-Light /Encoding /UniGB-UCS2-H "
+    b"/DescendantFonts [<< /Type /Font /Subtype /CIDFontType0 /BaseFont /STSong-Light "
+    b"/CIDSystemInfo << /Registry (Adobe) /Ordering (GB1) /Supplement 2 >> "
+    b"/FontDescriptor << /Type /FontDescriptor /FontName /STSong-Light /Flags 6 "
+    b"/FontBBox [0 -200 1000 900] /ItalicAngle 0 /Ascent 880 /Descent -120 /CapHeight 880 /StemV 93 >> "
+    b"/DW 1000 >>] >>"
+)
+PAGE_W, PAGE_H = 595, 842
+
+HEADER = ["用电分类", "电压等级", "非分时电度电价", "尖峰时段", "高峰时段", "平时段", "低谷时段"]
+
+# 各电压等级 × 制度的基准价：(不分时, 尖, 峰, 平, 谷)
+BASE_PRICES = {
+    ("单一制", "不满1千伏"): ("0.6512", "1.1234", "0.9321", "0.6012", "0.3012"),
+    ("单一制", "1-10（20）千伏"): ("0.6312", "1.1034", "0.9121", "0.5812", "0.2812"),
+    ("单一制", "35千伏"): ("0.6112", "1.0834", "0.8921", "0.5612", "0.2612"),
+    ("两部制", "1-10（20）千伏"): ("0.5812", "1.0534", "0.8621", "0.5312", "0.2312"),
+    ("两部制", "35千伏"): ("0.5612", "1.0334", "0.8421", "0.5112", "0.2112"),
+    ("两部制", "110千伏"): ("0.5412", "1.0134", "0.8221", "0.4912", "0.1912"),
+}
+
+
+def _hex(text):
+    return "<" + text.encode("utf-16-be").hex() + ">"
+
+
+def _text(x, y, text, size=7):
+    return f"BT /F1 {size} Tf {x} {y} Td {_hex(text)} Tj ET"
+
+
+def table_ops(header, rows, x0=20, y0=760, col_w=72, row_h=20, size=6):
+    """一张带完整框线的表：文字 + 横线 + 竖线。"""
+    allrows = [header] + rows
+    ncol = max(len(r) for r in allrows)
+    ops = []
+    for ri, row in enumerate(allrows):
+        y = y0 - ri * row_h
+        for ci, cell in enumerate(row):
+            if cell:
+                ops.append(_text(x0 + ci * col_w + 3, y - 14, str(cell), size))
+    height = len(allrows) * row_h
+    for ri in range(len(allrows) + 1):
+        y = y0 - ri * row_h
+        ops.append(f"{x0} {y} m {x0 + ncol * col_w} {y} l S")
+    for ci in range(ncol + 1):
+        x = x0 + ci * col_w
+        ops.append(f"{x} {y0} m {x} {y0 - height} l S")
+    return ops
+
+
+def notes_ops(k, lines=30):
+    """一页说明文字（和真实公告一样满是「元/千瓦时」，但不含千伏 / 分时表头，预筛会整页跳过）。"""
+    ops = [_text(40, 800, f"附件{k}：政策说明", 12)]
+    for i in range(lines):
+        ops.append(_text(40, 770 - i * 22, f"第{i + 1}条 代理购电用户电价由代理购电价格、输配电价和政府性基金及附加组成，单位：元/千瓦时。", 9))
+    return ops
+
+
+def write_pdf(path, pages):
+    """pages：每页一组绘图指令。"""
+    objs = [b"<< /Type /Catalog /Pages 2 0 R >>"]
+    kids = " ".join(f"{4 + 2 * i} 0 R" for i in range(len(pages)))
+    objs.append(f"<< /Type /Pages /Kids [{kids}] /Count {len(pages)} >>".encode())
+    objs.append(FONT)
+    for i, ops in enumerate(pages):
+        stream = "\n".join(ops).encode()
+        objs.append(
+            f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 {PAGE_W} {PAGE_H}] "
+            f"/Resources << /Font << /F1 3 0 R >> >> /Contents {5 + 2 * i} 0 R >>".encode()
+        )
+        objs.append(b"<< /Length %d >>\nstream\n" % len(stream) + stream + b"\nendstream")
+
+    out = b"%PDF-1.4\n"
+    offsets = []
+    for i, obj in enumerate(objs):
+        offsets.append(len(out))
+        out += f"{i + 1} 0 obj\n".encode() + obj + b"\nendobj\n"
+    xref = len(out)
+    out += f"xref\n0 {len(objs) + 1}\n0000000000 65535 f \n".encode()
+    out += b"".join(f"{o:010d} 00000 n \n".encode() for o in offsets)
+    out += f"trailer\n<< /Size {len(objs) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF".encode()
+
+    with open(path, "wb") as f:
+        f.write(out)
+    return path
+
+
+# ==========================
+# 各版式
+# ==========================
+def _row(scheme, voltage, label=None, prices=None):
+    return [label or scheme, voltage, *(prices or BASE_PRICES[(scheme, voltage)])]
+
+
+def _expected(*pairs, drop=()):
+    """期望的 1-10kV 输出：[(制度, 不分时, 尖, 峰, 平, 谷), ...]；drop 里的档位期望为空。"""
+    out = []
+    for scheme, prices in pairs:
+        vals = [float(v) for v in prices]
+        for p in drop:
+            vals[["不分时", "尖", "峰", "平", "谷"].index(p)] = None
+        out.append((scheme, *vals))
+    return out
+
+
+def _standard_rows():
+    return [
+        _row("单一制", "不满1千伏", label="工商业"),
+        _row("单一制", "1-10（20）千伏"),
+        _row("单一制", "35千伏"),
+        _row("两部制", "1-10（20）千伏"),
+        _row("两部制", "35千伏"),
+        _row("两部制", "110千伏"),
+    ]
+
+
+def case_standard():
+    pages = [[_text(40, 800, "国网河北省电力有限公司代理购电价格表", 12)] + table_ops(HEADER, _standard_rows())]
+    pages += [notes_ops(k) for k in range(1, 4)]
+    expected = _expected(
+        ("单一制", BASE_PRICES[("单一制", "1-10（20）千伏")]),
+        ("两部制", BASE_PRICES[("两部制", "1-10（20）千伏")]),
+    )
+    return "河北省", pages, expected
+
+
+def case_zhejiang_fund():
+    header = ["用电分类", "电压等级", "非分时电度电价", "政府性基金", "尖峰", "高峰", "平段", "低谷"]
+    fund = "0.0292"
+    two = ("0.7012", "1.3162", "1.0969", "0.6648", "0.2526")
+    one = ("0.7312", "1.3462", "1.1269", "0.6948", "0.2826")
+    rows = [
+        ["说明", "1-10千伏 含税", "", "", "", "", "", ""],
+        ["两部制", "1-10（20）千伏", two[0], fund, *two[1:]],
+        ["单一制", "1-10（20）千伏", one[0], fund, *one[1:]],
+        ["两部制", "35千伏", "0.6812", fund, "1.2962", "1.0769", "0.6448", "0.2326"],
+    ]
+    pages = [[_text(40, 800, "国网浙江省电力有限公司代理购电价格", 12)] + table_ops(header, rows, col_w=70)]
+    return "浙江省", pages, _expected(("单一制", one), ("两部制", two))
+
+
+def case_jiangsu_reversed():
+    rows = [
+        _row("两部制", "1-10（20）千伏"),
+        _row("单一制", "1-10（20）千伏"),
+        _row("两部制", "35千伏"),
+    ]
+    pages = [[_text(40, 800, "国网江苏省电力有限公司代理购电价格", 12)] + table_ops(HEADER, rows)]
+    expected = _expected(
+        ("单一制", BASE_PRICES[("单一制", "1-10（20）千伏")]),
+        ("两部制", BASE_PRICES[("两部制", "1-10（20）千伏")]),
+    )
+    return "江苏省", pages, expected
+
+
+def case_missing_jian():
+    header = ["用电分类", "电压等级", "非分时电度电价", "高峰", "平段", "低谷"]
+    rows = [[r[0], r[1], r[2], r[4], r[5], r[6]] for r in _standard_rows()]
+    pages = [[_text(40, 800, "国网福建省电力有限公司代理购电价格", 12)] + table_ops(header, rows, col_w=85)]
+    expected = _expected(
+        ("单一制", BASE_PRICES[("单一制", "1-10（20）千伏")]),
+        ("两部制", BASE_PRICES[("两部制", "1-10（20）千伏")]),
+        drop=("尖",),
+    )
+    return "福建省", pages, expected
+
+
+def case_shanghai_10kv():
+    rows = [[r[0], r[1].replace("1-10（20）千伏", "10千伏"), *r[2:]] for r in _standard_rows()]
+    pages = [[_text(40, 800, "上海市代理购电工商业用户电价表", 12)] + table_ops(HEADER, rows)]
+    pages += [notes_ops(k) for k in range(1, 3)]
+    expected = _expected(
+        ("单一制", BASE_PRICES[("单一制", "1-10（20）千伏")]),
+        ("两部制", BASE_PRICES[("两部制", "1-10（20）千伏")]),
+    )
+    return "上海市", pages, expected
+
+
+def case_header_fallback():
+    # 分时档位挤在一个表头格子里，认不出列号，走表头顺序 + 数字簇右对齐
+    header = ["用电分类", "电压等级", "不分时", "分时电价（尖、峰、平、谷）", "", "", ""]
+    pages = [[_text(40, 800, "国网四川省电力有限公司代理购电价格", 12)] + table_ops(header, _standard_rows())]
+    expected = _expected(
+        ("单一制", BASE_PRICES[("单一制", "1-10（20）千伏")]),
+        ("两部制", BASE_PRICES[("两部制", "1-10（20）千伏")]),
+    )
+    return "四川省", pages, expected
+
+
+def case_long_document():
+    pages = [[_text(40, 800, "国网山东省电力有限公司代理购电价格公告", 12)] + notes_ops(0)[1:]]
+    pages += [notes_ops(k) for k in range(1, 6)]
+    pages.append(table_ops(HEADER, _standard_rows()))
+    pages += [notes_ops(k) for k in range(6, 12)]
+    expected = _expected(
+        ("单一制", BASE_PRICES[("单一制", "1-10（20）千伏")]),
+        ("两部制", BASE_PRICES[("两部制", "1-10（20）千伏")]),
+    )
+    return "山东省", pages, expected
+
+
+CASES = {
+    "standard": case_standard,
+    "zhejiang_fund": case_zhejiang_fund,
+    "jiangsu_reversed": case_jiangsu_reversed,
+    "missing_jian": case_missing_jian,
+    "shanghai_10kv": case_shanghai_10kv,
+    "header_fallback": case_header_fallback,
+    "long_document": case_long_document,
+}
+
+
+def build_corpus(out_dir, cases=None):
+    """
+    生成语料，返回 [{"case", "province", "path", "pages", "expected"}, ...]。
+    expected 为期望的 1-10kV 行：(制度, 不分时, 尖, 峰, 平, 谷)，浮点或 None。
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    out = []
+    for name in cases or CASES:
+        province, pages, expected = CASES[name]()
+        path = write_pdf(os.path.join(out_dir, f"{name}.pdf"), pages)
+        out.append({"case": name, "province": province, "path": path, "pages": len(pages), "expected": expected})
+    return out
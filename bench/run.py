@@ -0,0 +1,258 @@
+# -*- coding: utf-8 -*-
+# bench/run.py
+"""
+PDF 解析基准测试：生成合成语料（bench/corpus.py），逐个文档分阶段计时，结果写成 JSON + CSV。
+
+    python -m bench.run                               # 结果写到 bench_results/
+    python -m bench.run --repeat 10 --backend geometry
+    python -m bench.run -o 新结果/ --baseline bench_results/results.json --threshold 0.2
+
+阶段（与 parse_single_pdf 的实际调用链一致，只是拆开计时）：
+    open      打开文档 + 第 1 页文字 + 省份识别
+    extract   页面预筛 + 抽表（额外记录其中的 prefilter / tables 两部分）
+    detect    表格行 → DataFrame + 行文本索引 + 识别布局（列、表头顺序、1-10kV 行）
+    map       按布局取价、省份修正 + 全电压矩阵
+    total     以上之和
+
+每个用例跑 --repeat 次（先空跑一次预热），记录 min / median / mean / max（毫秒），
+同时把结果与语料里的期望电价比对，结果不对的用例在 JSON 里 correct=false。
+传 --baseline 时与之前的 results.json 逐项比较中位数，total 变慢超过阈值或结果不对时退出码为 1。
+"""
+import argparse
+import contextlib
+import csv
+import hashlib
+import io
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime
+
+import pandas as pd
+import pdfplumber
+
+from bench.corpus import CASES, build_corpus
+from core.extract_backends import BACKENDS, DEFAULT_BACKEND
+from core.page_filter import new_stats
+from core.pdf_parser import (
+    build_price_matrix,
+    build_price_rows,
+    detect_layout,
+    detect_province_from_text,
+    first_page_text,
+    open_pdf,
+    rows_from_pages,
+    rows_to_frame,
+)
+from core.table_index import TableIndex
+
+STAGES = ["open", "extract", "prefilter", "tables", "detect", "map", "total"]
+PRICE_COLUMNS = ["不分时电价", "尖", "峰", "平", "谷"]
+DEFAULT_OUT = "bench_results"
+DEFAULT_REPEAT = 5
+DEFAULT_THRESHOLD = 0.25      # 中位数变慢 25% 以上算回归
+
+
+# ==========================
+# 单次计时
+# ==========================
+def run_once(path, prefilter=True, backend=DEFAULT_BACKEND):
+    """按阶段解析一遍，返回 ({阶段: 毫秒}, 结果 DataFrame)。解析过程里的 print 不输出。"""
+    t = {}
+    with contextlib.redirect_stdout(io.StringIO()):
+        t0 = time.perf_counter()
+        with open_pdf(path) as pdf:
+            province = detect_province_from_text(first_page_text(pdf))
+            t1 = time.perf_counter()
+            stats = new_stats()
+            rows = rows_from_pages(pdf.pages, prefilter=prefilter, stats=stats, backend=backend)
+            t2 = time.perf_counter()
+
+        df = pd.DataFrame()
+        if rows:
+            frame = rows_to_frame(rows)
+            index = TableIndex(frame)
+            layout = detect_layout(index, province)
+            t3 = time.perf_counter()
+            if layout is not None:
+                df = build_price_rows(frame, province, layout)
+            df.attrs["price_matrix"] = build_price_matrix(index, province, layout, df)
+        else:
+            t3 = time.perf_counter()
+        t4 = time.perf_counter()
+
+    t["open"] = (t1 - t0) * 1000
+    t["extract"] = (t2 - t1) * 1000
+    t["prefilter"] = stats["prefilter_ms"]
+    t["tables"] = stats["extract_ms"]
+    t["detect"] = (t3 - t2) * 1000
+    t["map"] = (t4 - t3) * 1000
+    t["total"] = (t4 - t0) * 1000
+    return t, df
+
+
+def check(df, expected):
+    """结果与期望的 1-10kV 电价逐格比较，返回不一致的说明列表（空列表表示正确）。"""
+    if len(df) != len(expected):
+        return [f"行数 {len(df)} ≠ 期望 {len(expected)}"]
+    problems = []
+    for (_, row), (scheme, *prices) in zip(df.iterrows(), expected):
+        if row["制度"] != scheme:
+            problems.append(f"制度 {row['制度']} ≠ {scheme}")
+        for col, want in zip(PRICE_COLUMNS, prices):
+            got = row[col]
+            got = None if got is None or pd.isna(got) else float(got)
+            if (got is None) != (want is None) or (got is not None and abs(got - want) > 1e-9):
+                problems.append(f"{scheme} {col}: {got} ≠ {want}")
+    return problems
+
+
+def _sha256(path):
+    with open(path, "rb") as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+def summarize(samples):
+    return {
+        "min_ms": round(min(samples), 3),
+        "median_ms": round(statistics.median(samples), 3),
+        "mean_ms": round(statistics.fmean(samples), 3),
+        "max_ms": round(max(samples), 3),
+    }
+
+
+def bench_case(case, repeat=DEFAULT_REPEAT, prefilter=True, backend=DEFAULT_BACKEND):
+    run_once(case["path"], prefilter, backend)        # 预热（导入、正则编译、字体映射）
+    samples = {s: [] for s in STAGES}
+    df = None
+    for _ in range(repeat):
+        t, df = run_once(case["path"], prefilter, backend)
+        for s in STAGES:
+            samples[s].append(t[s])
+    problems = check(df, case["expected"])
+    return {
+        "case": case["case"],
+        "province": case["province"],
+        "pages": case["pages"],
+        "bytes": os.path.getsize(case["path"]),
+        "sha256": _sha256(case["path"]),   # 语料变了（corpus.py 改过）时中位数不可直接比
+        "correct": not problems,
+        "problems": problems,
+        "stages": {s: summarize(v) for s, v in samples.items()},
+    }
+
+
+# ==========================
+# 结果输出 / 对比
+# ==========================
+def git_commit():
+    try:
+        out = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                             cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))), timeout=10)
+    except (OSError, subprocess.SubprocessError):
+        return None
+    return out.stdout.strip() or None
+
+
+def write_results(out_dir, meta, cases):
+    os.makedirs(out_dir, exist_ok=True)
+    json_path = os.path.join(out_dir, "results.json")
+    with open(json_path, "w", encoding="utf-8") as f:
+        json.dump({"meta": meta, "cases": cases}, f, ensure_ascii=False, indent=1)
+
+    csv_path = os.path.join(out_dir, "results.csv")
+    with open(csv_path, "w", encoding="utf-8-sig", newline="") as f:
+        w = csv.writer(f)
+        w.writerow(["case", "province", "pages", "correct", "stage", "min_ms", "median_ms", "mean_ms", "max_ms"])
+        for c in cases:
+            for s, v in c["stages"].items():
+                w.writerow([c["case"], c["province"], c["pages"], c["correct"], s,
+                            v["min_ms"], v["median_ms"], v["mean_ms"], v["max_ms"]])
+    return json_path, csv_path
+
+
+def compare_baseline(cases, baseline_path, threshold=DEFAULT_THRESHOLD):
+    """逐用例、逐阶段比较中位数，返回 (表格行, 是否有 total 回归)。"""
+    with open(baseline_path, "r", encoding="utf-8") as f:
+        old = {c["case"]: c for c in json.load(f)["cases"]}
+
+    lines = []
+    regressed = False
+    for c in cases:
+        o = old.get(c["case"])
+        if o is None:
+            lines.append(f"{c['case']:<20} （基线里没有）")
+            continue
+        note = "" if o.get("sha256") == c["sha256"] else "  （语料已变化）"
+        parts = []
+        for s in STAGES:
+            new_ms = c["stages"][s]["median_ms"]
+            old_ms = o["stages"].get(s, {}).get("median_ms")
+            if not old_ms:
+                continue
+            ratio = new_ms / old_ms
+            parts.append(f"{s} {ratio:.2f}x")
+            if s == "total" and ratio > 1 + threshold:
+                regressed = True
+                parts[-1] += " ⚠"
+        lines.append(f"{c['case']:<20} " + "  ".join(parts) + note)
+    return lines, regressed
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="PDF 解析分阶段基准测试（合成语料）")
+    ap.add_argument("-o", "--out", default=DEFAULT_OUT, help=f"结果目录（默认 {DEFAULT_OUT}/）")
+    ap.add_argument("--repeat", type=int, default=DEFAULT_REPEAT, help=f"每个用例计时次数（默认 {DEFAULT_REPEAT}）")
+    ap.add_argument("--backend", default=DEFAULT_BACKEND, choices=list(BACKENDS), help="抽表引擎")
+    ap.add_argument("--no-prefilter", action="store_true", help="不做页面预筛，整页抽表")
+    ap.add_argument("--case", action="append", choices=list(CASES), help="只跑指定用例（可重复）")
+    ap.add_argument("--baseline", help="之前的 results.json，对比各阶段中位数")
+    ap.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                    help=f"total 中位数变慢超过这个比例算回归（默认 {DEFAULT_THRESHOLD}）")
+    args = ap.parse_args(argv)
+
+    prefilter = not args.no_prefilter
+    corpus = build_corpus(os.path.join(args.out, "corpus"), args.case)
+
+    cases = []
+    for case in corpus:
+        r = bench_case(case, args.repeat, prefilter, args.backend)
+        cases.append(r)
+        mark = "OK " if r["correct"] else "ERR"
+        st = r["stages"]
+        print(f"{mark} {r['case']:<20} {r['pages']:>3}页  total {st['total']['median_ms']:8.1f} ms  "
+              f"(open {st['open']['median_ms']:.1f} / extract {st['extract']['median_ms']:.1f} / "
+              f"detect {st['detect']['median_ms']:.1f} / map {st['map']['median_ms']:.1f})")
+        for p in r["problems"]:
+            print("    ", p)
+
+    meta = {
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "git_commit": git_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "pdfplumber": pdfplumber.__version__,
+        "pandas": pd.__version__,
+        "backend": args.backend,
+        "prefilter": prefilter,
+        "repeat": args.repeat,
+    }
+    json_path, csv_path = write_results(args.out, meta, cases)
+    print(f"结果已写入：{json_path}、{csv_path}")
+
+    failed = any(not c["correct"] for c in cases)
+    if args.baseline:
+        lines, regressed = compare_baseline(cases, args.baseline, args.threshold)
+        print(f"\n与基线 {args.baseline} 比较（中位数，新 / 旧）：")
+        for line in lines:
+            print("  " + line)
+        failed = failed or regressed
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
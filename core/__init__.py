@@ -0,0 +1,7 @@
+# -*- coding: utf-8 -*-
+# core/__init__.py
+"""
+各页面共用的非 UI 逻辑（下载、解析、缓存等）。
+
+页面脚本由 Streamlit 以项目根目录为工作目录启动，可直接 `from core.xxx import ...`。
+"""
@@ -0,0 +1,207 @@
+# -*- coding: utf-8 -*-
+# core/batch.py
+"""
+命令行批量解析（不启动 Streamlit，可放进 cron / 跑历史 PDF 归档）。
+
+    python -m core.batch 归档目录/ -o 输出目录/
+    python -m core.batch urls.txt -o 输出目录/ --workers 8 --month 2026-10 --save-history
+    python -m core.batch a.pdf b.pdf https://www.95598.cn/...pdf
+    python -m core.batch 归档目录/ --compare-backends     # 各抽表引擎的耗时与结果是否一致
+
+输入可以是：目录（递归找 *.pdf）、单个 PDF、或 URL 列表文件（每行一个链接或本地路径，# 开头为注释）。
+输出（与 Page1 完全一致，行顺序 = 输入顺序；目录按路径排序）：
+    电价解析结果.xlsx / .parquet / .csv
+    全电压等级电价.xlsx / .parquet / .csv   同一批 PDF 里全部电压等级 × 制度的价格（--save-history 存的就是这张）
+    解析失败列表.csv      URL, 错误信息
+    解析耗时统计.csv      每个文档的耗时 / 预筛统计
+    抽表引擎对比.csv      仅 --compare-backends：每个文档 × 每个引擎一行
+"""
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import pandas as pd
+
+from core.extract_backends import AUTO, BACKENDS, compare_backends
+from core.fetch import DEFAULT_WORKERS, DEFAULT_PER_HOST
+from core.history import TariffHistory, normalize_month
+from core.pdf_parser import DEFAULT_PARSE_WORKERS
+from core.pipeline import collect, is_url, iter_parse_sources
+from core.price_matrix import matrix_frame
+
+RESULT_NAME = "电价解析结果"
+MATRIX_NAME = "全电压等级电价"
+ERROR_NAME = "解析失败列表"
+STATS_NAME = "解析耗时统计"
+COMPARE_NAME = "抽表引擎对比"
+FORMATS = ("xlsx", "parquet", "csv")
+
+
+def expand_inputs(inputs):
+    """目录 → 其下全部 PDF（按路径排序）；.txt 等列表文件 → 逐行读取；PDF / URL 原样保留。"""
+    items = []
+    for x in inputs:
+        if is_url(x):
+            items.append(x)
+            continue
+        p = Path(x)
+        if p.is_dir():
+            items.extend(str(f) for f in sorted(p.rglob("*")) if f.suffix.lower() == ".pdf")
+        elif p.suffix.lower() == ".pdf":
+            items.append(str(p))
+        elif p.is_file():
+            for line in p.read_text(encoding="utf-8-sig").splitlines():
+                line = line.strip()
+                if line and not line.startswith("#"):
+                    items.append(line)
+        else:
+            raise FileNotFoundError(f"找不到输入：{x}")
+    return items
+
+
+def write_outputs(df_price, errors, out_dir, formats=FORMATS):
+    """按 Page1 的格式写结果；返回写出的文件列表。"""
+    out_dir = Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    written = []
+
+    df_matrix = matrix_frame(df_price.attrs.get("price_matrix", []))
+    for name, df in ((RESULT_NAME, df_price), (MATRIX_NAME, df_matrix)):
+        if "xlsx" in formats:
+            path = out_dir / f"{name}.xlsx"
+            df.to_excel(path, index=False)          # 与 Page1 下载按钮相同的写法
+            written.append(path)
+        if "parquet" in formats:
+            path = out_dir / f"{name}.parquet"
+            df.to_parquet(path, index=False)
+            written.append(path)
+        if "csv" in formats:
+            path = out_dir / f"{name}.csv"
+            df.to_csv(path, index=False, encoding="utf-8-sig")   # utf-8-sig：Excel 直接打开不乱码
+            written.append(path)
+
+    path = out_dir / f"{ERROR_NAME}.csv"
+    pd.DataFrame(errors, columns=["URL", "错误信息"]).to_csv(path, index=False, encoding="utf-8-sig")
+    written.append(path)
+
+    path = out_dir / f"{STATS_NAME}.csv"
+    pd.DataFrame(df_price.attrs.get("parse_stats", [])).to_csv(path, index=False, encoding="utf-8-sig")
+    written.append(path)
+    return written
+
+
+def run(items, out_dir, formats=FORMATS, quiet=False, **parse_kwargs):
+    """解析一批输入并写出结果，返回 (df_price, errors)。"""
+    t0 = time.perf_counter()
+    events = []
+    for ev in iter_parse_sources(items, **parse_kwargs):
+        events.append(ev)
+        if not quiet:
+            status = "失败：" + ev.error if ev.error else f"{len(ev.df)} 行"
+            print(f"[{len(events)}/{len(items)}] {ev.url}  {status}", file=sys.stderr)
+
+    df_price, errors = collect(events)
+    written = write_outputs(df_price, errors, out_dir, formats)
+    if not quiet:
+        print(
+            f"完成：{len(items)} 个文档，{len(df_price)} 行电价，{len(errors)} 个失败，"
+            f"耗时 {time.perf_counter() - t0:.1f}s",
+            file=sys.stderr,
+        )
+        for path in written:
+            print(f"  → {path}", file=sys.stderr)
+    return df_price, errors
+
+
+def compare_local(items, out_dir, prefilter=True, quiet=False):
+    """对每个本地 PDF 用各引擎各解析一遍，写 抽表引擎对比.csv；返回对比表。URL 先跳过（对比只看本地文件）。"""
+    records = []
+    for item in items:
+        if is_url(item):
+            continue
+        try:
+            rows = compare_backends(item, prefilter=prefilter)
+        except Exception as e:
+            rows = [{"引擎": "", "错误信息": str(e)}]
+        for r in rows:
+            records.append({"文件": item, **r})
+        if not quiet:
+            print(f"[对比] {item}", file=sys.stderr)
+            for r in rows:
+                print("    " + "  ".join(f"{k}={v}" for k, v in r.items()), file=sys.stderr)
+
+    df = pd.DataFrame(records)
+    out_dir = Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    df.to_csv(out_dir / f"{COMPARE_NAME}.csv", index=False, encoding="utf-8-sig")
+    return df
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(prog="python -m core.batch", description="批量解析国网代理购电价格 PDF")
+    ap.add_argument("inputs", nargs="+", help="目录 / PDF 文件 / URL 列表文件 / URL")
+    ap.add_argument("-o", "--out", default="批量解析结果", help="输出目录（默认 ./批量解析结果）")
+    ap.add_argument("--formats", default=",".join(FORMATS), help="输出格式，逗号分隔：xlsx,parquet,csv")
+    ap.add_argument("--workers", type=int, default=DEFAULT_PARSE_WORKERS, help="解析进程数")
+    ap.add_argument("--download-workers", type=int, default=DEFAULT_WORKERS, help="并发下载数")
+    ap.add_argument("--per-host", type=int, default=DEFAULT_PER_HOST, help="单主机并发上限")
+    ap.add_argument("--no-prefilter", action="store_true", help="关闭页面预筛（全量抽表）")
+    ap.add_argument("--backend", default=AUTO, choices=[AUTO, *BACKENDS],
+                    help="抽表引擎（默认 auto：按 data/extract_backends.json 的省份配置）")
+    ap.add_argument("--compare-backends", action="store_true",
+                    help="只做引擎对比：本地 PDF 用各引擎各解析一遍，输出耗时和结果是否一致")
+    ap.add_argument("--month", help="电价生效月份 YYYY-MM（配合 --save-history）")
+    ap.add_argument("--save-history", action="store_true", help="解析结果存入电价历史库（解析版）")
+    ap.add_argument("-q", "--quiet", action="store_true")
+    args = ap.parse_args(argv)
+
+    formats = [f.strip().lower() for f in args.formats.split(",") if f.strip()]
+    unknown = set(formats) - set(FORMATS)
+    if unknown:
+        ap.error(f"不支持的输出格式：{', '.join(sorted(unknown))}")
+    if args.save_history and not args.month:
+        ap.error("--save-history 需要同时指定 --month")
+    if args.month:
+        try:
+            args.month = normalize_month(args.month)
+        except ValueError as e:
+            ap.error(str(e))
+
+    try:
+        items = expand_inputs(args.inputs)
+    except FileNotFoundError as e:
+        ap.error(str(e))
+    if not items:
+        ap.error("没有找到任何 PDF / 链接")
+
+    if args.compare_backends:
+        df_cmp = compare_local(items, args.out, prefilter=not args.no_prefilter, quiet=args.quiet)
+        same = [c for c in df_cmp.columns if c.startswith("与")]
+        # 有文档出错或结果不一致时返回非 0
+        return 0 if not df_cmp.empty and "错误信息" not in df_cmp and df_cmp[same].all().all() else 1
+
+    df_price, errors = run(
+        items,
+        args.out,
+        formats=formats,
+        quiet=args.quiet,
+        max_workers=args.download_workers,
+        per_host=args.per_host,
+        parse_workers=args.workers,
+        prefilter=not args.no_prefilter,
+        backend=args.backend,
+    )
+
+    if args.save_history and not df_price.empty:
+        df_matrix = matrix_frame(df_price.attrs.get("price_matrix", []))
+        saved = TariffHistory().save(df_matrix if not df_matrix.empty else df_price, args.month, source="raw")
+        if not args.quiet:
+            print(f"已存入电价历史库：{args.month}（解析版）{saved} 条", file=sys.stderr)
+
+    # 一条都没解析出来时返回非 0，方便 cron 报警
+    return 0 if not df_price.empty else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,28 @@
+# -*- coding: utf-8 -*-
+# core/config.py
+"""
+全局路径配置。
+- 缓存目录默认放在项目根目录下的 .cache/，可用环境变量 POWER_PRICE_CACHE 覆盖（随时可删）；
+- 持久数据（电价历史库等）默认放在项目根目录下的 data/，可用环境变量 POWER_PRICE_DATA 覆盖。
+"""
+import os
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+
+CACHE_ROOT = Path(os.environ.get("POWER_PRICE_CACHE", PROJECT_ROOT / ".cache"))
+
+DATA_ROOT = Path(os.environ.get("POWER_PRICE_DATA", PROJECT_ROOT / "data"))
+
+
+def cache_dir(name):
+    """返回 .cache/<name>/，不存在则创建。"""
+    path = CACHE_ROOT / name
+    path.mkdir(parents=True, exist_ok=True)
+    return path
+
+
+def data_path(name):
+    """返回 data/<name>，并确保 data/ 存在。"""
+    DATA_ROOT.mkdir(parents=True, exist_ok=True)
+    return DATA_ROOT / name
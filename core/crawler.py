@@ -0,0 +1,435 @@
+# -*- coding: utf-8 -*-
+# core/crawler.py
+"""
+代理购电价格 PDF 自动发现：从配置的列表页出发，找出每个省最新一期的「代理购电价格」PDF，
+只把没抓过的新文档交给解析流水线。
+
+    列表页        每行一个（data/crawl_listings.txt，可在 URL 后面空格加省份名作为提示）
+    详情页        列表里标题含「代理购电」但不是 PDF 的链接，再进去找一层 PDF（详情页只抓一次）
+    增量          列表页记下 ETag / Last-Modified，重跑时发条件请求，304 或内容没变就直接用上次的链接
+    去重          URL 抓过的跳过；新 URL 下载后内容哈希和已入库的文档相同也跳过
+    限速          同一主机两次请求至少间隔 min_interval 秒（列表页和 PDF 下载共用一个限速器）
+
+状态存在 data/crawl_state.sqlite。
+
+用法：
+    crawler = TariffCrawler()
+    found = crawler.discover(load_listings())     # DataFrame：省份 / 月份 / 标题 / URL / 状态
+    fresh = crawler.fetch_new(found, downloader)  # 下载新文档，按内容去重，返回要解析的 URL
+
+命令行：python -m core.crawler [列表页 URL ...] -o 输出目录/
+"""
+import argparse
+import hashlib
+import json
+import re
+import sqlite3
+import sys
+import time
+from contextlib import closing
+from html.parser import HTMLParser
+from urllib.parse import urljoin, urldefrag, urlsplit
+
+import pandas as pd
+
+from core.config import data_path
+from core.fetch import (
+    DEFAULT_PER_HOST,
+    DEFAULT_TIMEOUT,
+    DEFAULT_WORKERS,
+    HostRateLimiter,
+    PdfDownloader,
+    make_session,
+)
+from core.pdf_cache import get_pdf_cache
+
+KEYWORD = "代理购电"
+DEFAULT_MIN_INTERVAL = 1.0       # 同一主机两次请求的最小间隔（秒）
+MAX_DETAIL_PAGES = 60            # 每次最多进多少个详情页
+
+# 与 pdf_parser.detect_province_from_text 输出一致的省份写法（「国网XX电力有限公司」里的 XX）
+PROVINCES = [
+    "北京市", "天津市", "河北省", "冀北", "山西省", "山东省", "上海市", "江苏省", "浙江省",
+    "安徽省", "福建省", "湖北省", "湖南省", "河南省", "江西省", "四川省", "重庆市", "辽宁省",
+    "吉林省", "黑龙江省", "蒙东", "陕西省", "甘肃省", "青海省", "宁夏", "新疆", "西藏",
+]
+_PROVINCE_SHORT = {re.sub(r"[省市]$", "", p): p for p in PROVINCES}
+
+MONTH_PATTERNS = [
+    re.compile(r"(20\d{2})\s*年\s*(\d{1,2})\s*月"),
+    re.compile(r"(20\d{2})[-_/.]?(0[1-9]|1[0-2])(?!\d)"),
+]
+
+STATUS_NEW = "新文档"
+STATUS_KNOWN = "已抓取"
+STATUS_DUP = "内容重复"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS pages (
+    url           TEXT PRIMARY KEY,
+    etag          TEXT,
+    last_modified TEXT,
+    body_sha      TEXT,
+    links         TEXT NOT NULL,          -- JSON：[[绝对链接, 链接文字], ...]
+    fetched_at    REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS docs (
+    url        TEXT PRIMARY KEY,
+    province   TEXT,
+    month      TEXT,
+    title      TEXT,
+    sha256     TEXT,
+    status     TEXT,
+    first_seen REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_docs_sha ON docs(sha256);
+"""
+
+
+# ==========================
+# 列表页配置
+# ==========================
+def parse_listing_lines(text):
+    """「URL [省份]」逐行 → [(url, 省份提示或 None)]；空行和 # 注释跳过。"""
+    out = []
+    for line in str(text).splitlines():
+        line = line.strip()
+        if not line or line.startswith("#"):
+            continue
+        parts = line.split(None, 1)
+        out.append((parts[0], normalize_province(parts[1]) if len(parts) > 1 else None))
+    return out
+
+
+def load_listings(path=None):
+    path = path or data_path("crawl_listings.txt")
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return f.read()
+    except FileNotFoundError:
+        return ""
+
+
+def save_listings(text, path=None):
+    path = path or data_path("crawl_listings.txt")
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(text.strip() + "\n")
+
+
+# ==========================
+# 文本识别
+# ==========================
+def normalize_province(text):
+    """从标题 / 提示文字里认省份，返回 PROVINCES 里的写法；认不出返回 None。"""
+    if not text:
+        return None
+    for p in PROVINCES:
+        if p in text:
+            return p
+    for short, full in _PROVINCE_SHORT.items():
+        if short in text:
+            return full
+    return None
+
+
+def detect_month(*texts):
+    """从标题 / 链接里认「2026年10月」「202610」等写法，返回 "YYYY-MM"；认不出返回 None。"""
+    for text in texts:
+        if not text:
+            continue
+        for pat in MONTH_PATTERNS:
+            m = pat.search(text)
+            if m and 1 <= int(m.group(2)) <= 12:
+                return f"{m.group(1)}-{int(m.group(2)):02d}"
+    return None
+
+
+def is_pdf_link(url):
+    return urlsplit(url).path.lower().endswith(".pdf")
+
+
+class _LinkParser(HTMLParser):
+    """收集页面里所有 <a href> 及其文字（含 title 属性）。"""
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.links = []
+        self._href = None
+        self._text = []
+
+    def handle_starttag(self, tag, attrs):
+        if tag == "a":
+            attrs = dict(attrs)
+            self._href = attrs.get("href")
+            self._text = [attrs.get("title") or ""]
+
+    def handle_data(self, data):
+        if self._href is not None:
+            self._text.append(data)
+
+    def handle_endtag(self, tag):
+        if tag == "a" and self._href is not None:
+            self.links.append((self._href, re.sub(r"\s+", "", "".join(self._text))))
+            self._href = None
+
+
+def extract_links(html, base_url):
+    parser = _LinkParser()
+    parser.feed(html)
+    out = []
+    for href, text in parser.links:
+        href = (href or "").strip()
+        if not href or href.startswith(("javascript:", "mailto:", "#")):
+            continue
+        out.append([urldefrag(urljoin(base_url, href))[0], text])
+    return out
+
+
+# ==========================
+# 爬虫
+# ==========================
+class TariffCrawler:
+
+    def __init__(self, state_path=None, session=None, rate_limiter=None,
+                 min_interval=DEFAULT_MIN_INTERVAL, timeout=DEFAULT_TIMEOUT, max_detail_pages=MAX_DETAIL_PAGES):
+        self.state_path = str(state_path or data_path("crawl_state.sqlite"))
+        self.session = session or make_session()
+        self.rate_limiter = rate_limiter or HostRateLimiter(min_interval)
+        self.timeout = timeout
+        self.max_detail_pages = max_detail_pages
+        self.page_log = []          # 本次运行每个页面的获取结果：(url, "304" / "未变" / "已更新" / "已缓存" / 错误)
+        with closing(self._connect()) as db:
+            db.executescript(_SCHEMA)
+            db.commit()
+
+    def _connect(self):
+        return sqlite3.connect(self.state_path, timeout=30)
+
+    # ---------------------------
+    # 页面（条件请求）
+    # ---------------------------
+    def fetch_links(self, url, revalidate=True):
+        """
+        取一个页面里的链接。抓过的页面发条件请求，304 / 内容没变时直接用上次存下的链接。
+        revalidate=False 时抓过的页面不再发请求（详情页一般不会变）。
+        """
+        with closing(self._connect()) as db:
+            row = db.execute(
+                "SELECT etag, last_modified, body_sha, links FROM pages WHERE url = ?", (url,)
+            ).fetchone()
+
+        if row is not None and not revalidate:
+            self.page_log.append((url, "已缓存"))
+            return json.loads(row[3])
+
+        headers = {"Accept": "text/html,application/xhtml+xml"}
+        if row is not None:
+            if row[0]:
+                headers["If-None-Match"] = row[0]
+            if row[1]:
+                headers["If-Modified-Since"] = row[1]
+
+        self.rate_limiter.wait(url)
+        resp = self.session.get(url, headers=headers, timeout=self.timeout)
+        now = time.time()
+
+        if resp.status_code == 304 and row is not None:
+            with closing(self._connect()) as db:
+                db.execute("UPDATE pages SET fetched_at = ? WHERE url = ?", (now, url))
+                db.commit()
+            self.page_log.append((url, "304"))
+            return json.loads(row[3])
+
+        resp.raise_for_status()
+        body_sha = hashlib.sha256(resp.content).hexdigest()
+        if row is not None and row[2] == body_sha:
+            links = json.loads(row[3])
+            self.page_log.append((url, "未变"))
+        else:
+            if not resp.encoding or resp.encoding.lower() == "iso-8859-1":
+                resp.encoding = resp.apparent_encoding    # 很多政府站点不在响应头里声明编码
+            links = extract_links(resp.text, resp.url or url)
+            self.page_log.append((url, "已更新"))
+
+        with closing(self._connect()) as db:
+            db.execute(
+                "INSERT OR REPLACE INTO pages(url, etag, last_modified, body_sha, links, fetched_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (url, resp.headers.get("ETag"), resp.headers.get("Last-Modified"), body_sha,
+                 json.dumps(links, ensure_ascii=False), now),
+            )
+            db.commit()
+        return links
+
+    # ---------------------------
+    # 发现
+    # ---------------------------
+    def _candidates(self, listing_url, hint):
+        """一个列表页 → 候选 PDF：[{省份, 月份, 标题, URL, 列表页, 序号}]"""
+        out = []
+        details = 0
+        for pos, (href, text) in enumerate(self.fetch_links(listing_url)):
+            if is_pdf_link(href):
+                if KEYWORD in text or KEYWORD in href:
+                    out.append(self._candidate(href, text, "", hint, listing_url, pos))
+                continue
+
+            # 标题含「代理购电」的详情页：进去找 PDF（同一主机，每次运行有上限）
+            if KEYWORD not in text or urlsplit(href).netloc != urlsplit(listing_url).netloc:
+                continue
+            if details >= self.max_detail_pages:
+                continue
+            details += 1
+            try:
+                inner = self.fetch_links(href, revalidate=False)
+            except Exception as e:
+                self.page_log.append((href, str(e)))
+                continue
+            for sub, (pdf_href, pdf_text) in enumerate(inner):
+                if is_pdf_link(pdf_href):
+                    out.append(self._candidate(pdf_href, pdf_text, text, hint, listing_url, pos + sub / 1000))
+        return out
+
+    @staticmethod
+    def _candidate(url, text, parent_text, hint, listing_url, pos):
+        title = text or parent_text
+        return {
+            "省份": normalize_province(text) or normalize_province(parent_text) or hint or "",
+            "月份": detect_month(text, parent_text, url) or "",
+            "标题": title,
+            "URL": url,
+            "列表页": listing_url,
+            "序号": pos,
+        }
+
+    def discover(self, listings, newest_only=True):
+        """
+        listings：[(列表页 URL, 省份提示或 None)]，或「URL [省份]」多行文本。
+        返回 DataFrame（省份 / 月份 / 标题 / URL / 列表页 / 状态）；newest_only 时每个省只留最新一期。
+        """
+        if isinstance(listings, str):
+            listings = parse_listing_lines(listings)
+
+        rows = []
+        for listing_url, hint in listings:
+            try:
+                rows.extend(self._candidates(listing_url, hint))
+            except Exception as e:
+                self.page_log.append((listing_url, str(e)))
+
+        cols = ["省份", "月份", "标题", "URL", "列表页", "状态"]
+        if not rows:
+            return pd.DataFrame(columns=cols)
+
+        df = pd.DataFrame(rows).drop_duplicates("URL")
+        if newest_only:
+            # 月份新的在前；同月份（或认不出月份）时以列表里靠前的为准（列表页一般按时间倒序）
+            df = df.sort_values(["月份", "序号"], ascending=[False, True], kind="stable")
+            named = df[df["省份"] != ""].drop_duplicates("省份", keep="first")
+            df = pd.concat([named, df[df["省份"] == ""]])     # 认不出省份的不合并，全部保留
+
+        known = self._known_urls(df["URL"].tolist())
+        df["状态"] = [STATUS_KNOWN if u in known else STATUS_NEW for u in df["URL"]]
+        return df[cols].sort_values(["省份", "月份"]).reset_index(drop=True)
+
+    # ---------------------------
+    # 去重 + 入库
+    # ---------------------------
+    def _known_urls(self, urls):
+        if not urls:
+            return set()
+        with closing(self._connect()) as db:
+            found = db.execute(
+                f"SELECT url FROM docs WHERE url IN ({', '.join('?' * len(urls))})", urls
+            ).fetchall()
+        return {r[0] for r in found}
+
+    def _known_sha(self, sha):
+        with closing(self._connect()) as db:
+            row = db.execute("SELECT url FROM docs WHERE sha256 = ? LIMIT 1", (sha,)).fetchone()
+        return row[0] if row else None
+
+    def record(self, url, sha=None, province=None, month=None, title=None, status=None):
+        with closing(self._connect()) as db:
+            db.execute(
+                "INSERT INTO docs(url, province, month, title, sha256, status, first_seen) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT(url) DO UPDATE SET sha256 = COALESCE(excluded.sha256, sha256), "
+                "status = excluded.status",
+                (url, province, month, title, sha, status, time.time()),
+            )
+            db.commit()
+
+    def fetch_new(self, found, downloader):
+        """
+        下载 discover 结果里状态为「新文档」的 PDF（写入 PDF 缓存，之后解析直接命中），
+        内容哈希和已入库文档相同的标记为「内容重复」并入库；
+        返回 {URL: sha256}——真正需要解析的新文档。
+        """
+        new = found[found["状态"] == STATUS_NEW]
+        if new.empty:
+            return {}
+        meta = new.set_index("URL")
+        fresh = {}
+        for res in downloader.iter_fetch(new["URL"].tolist()):
+            if res.error is not None:
+                self.page_log.append((res.url, str(res.error)))
+                continue
+            m = meta.loc[res.url]
+            dup_of = self._known_sha(res.sha256)
+            if dup_of is not None or res.sha256 in fresh.values():
+                found.loc[found["URL"] == res.url, "状态"] = STATUS_DUP
+                self.record(res.url, res.sha256, m["省份"], m["月份"], m["标题"], STATUS_DUP)
+            else:
+                fresh[res.url] = res.sha256
+        return fresh
+
+    def mark_parsed(self, found, fresh, errors=()):
+        """解析完成后入库；解析失败的不入库，下次运行会再试。"""
+        failed = {url for url, _ in errors}
+        meta = found.set_index("URL")
+        for url, sha in fresh.items():
+            if url in failed:
+                continue
+            m = meta.loc[url]
+            self.record(url, sha, m["省份"], m["月份"], m["标题"], "已解析")
+
+
+# ==========================
+# 命令行：发现 → 下载 → 解析 → 写结果
+# ==========================
+def main(argv=None):
+    from core.batch import FORMATS, run   # 命令行才需要，避免 Streamlit 页面导入时多拉模块
+
+    ap = argparse.ArgumentParser(prog="python -m core.crawler", description="自动发现并解析各省最新代理购电价格 PDF")
+    ap.add_argument("listings", nargs="*", help="列表页 URL（可写成 'URL 省份'），不传则读 data/crawl_listings.txt")
+    ap.add_argument("-o", "--out", default="自动发现结果", help="输出目录")
+    ap.add_argument("--min-interval", type=float, default=DEFAULT_MIN_INTERVAL, help="同一主机请求最小间隔（秒）")
+    ap.add_argument("--workers", type=int, default=1, help="解析进程数")
+    ap.add_argument("--dry-run", action="store_true", help="只列出发现结果，不下载解析")
+    args = ap.parse_args(argv)
+
+    listings = parse_listing_lines("\n".join(args.listings) if args.listings else load_listings())
+    if not listings:
+        ap.error("没有列表页：请传入 URL 或编辑 data/crawl_listings.txt")
+
+    crawler = TariffCrawler(min_interval=args.min_interval)
+    found = crawler.discover(listings)
+    print(found.to_string(index=False), file=sys.stderr)
+    if args.dry_run:
+        return 0
+
+    with PdfDownloader(max_workers=DEFAULT_WORKERS, per_host=DEFAULT_PER_HOST, cache=get_pdf_cache(),
+                       rate_limiter=crawler.rate_limiter) as downloader:
+        fresh = crawler.fetch_new(found, downloader)
+    if not fresh:
+        print("没有新文档。", file=sys.stderr)
+        return 0
+
+    df_price, errors = run(list(fresh), args.out, formats=FORMATS, parse_workers=args.workers)
+    crawler.mark_parsed(found, fresh, errors)
+    return 0 if not df_price.empty else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
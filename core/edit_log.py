@@ -0,0 +1,263 @@
+# -*- coding: utf-8 -*-
+# core/edit_log.py
+"""
+Page2 电价表的增量编辑：只记录改动过的单元格（增量日志），不再每次整表复制 / 整表替换。
+
+编辑会话（放在 st.session_state["price_edit"] 里的一个字典）：
+    base      载入时清洗好的基准表（只 cast 一次；行号 0..n-1 即行 ID，之后不再变）
+    steps     增量日志，每次在表格里提交一次修改 = 一步：
+                  {"set": [(行ID, 列, 原值, 新值), ...], "add": [(行ID, {列: 值}), ...], "delete": [行ID, ...]}
+    cursor    当前生效到第几步（撤销 = cursor - 1，重做 = cursor + 1，撤销后再改会丢掉后面的步）
+    current   base + steps[:cursor] 的结果（缓存；新的一步只在它上面增量应用）
+    version   每变一次 +1，页面用它给 data_editor 换 key，让表格按新的 current 重新显示
+
+应用增量时先把多步合并成「每列 {行ID: 最终值}」，再按列一次性 .loc 赋值、一次 drop、一次 concat，
+代价只和改动的格子数有关；撤销从 base 重放日志（同样是按列向量化的几次赋值），重做只应用下一步。
+"""
+import pandas as pd
+
+from core.schema import content_token
+
+PRICE_COLS = ["不分时电价", "尖", "峰", "平", "谷", "深"]
+
+FILTER_COLS = ["省份", "制度"]     # 编辑区可按这些列筛选，只把筛出来的行交给 data_editor
+
+
+def cast_price_cols(df):
+    """把所有价钱列统一转成 float，避免 object 混在一起导致奇怪的复制行为。"""
+    df = df.copy()
+    for col in PRICE_COLS:
+        if col in df.columns:
+            df[col] = pd.to_numeric(df[col], errors="coerce")
+    return df
+
+
+def source_key(kind, obj=None, *extra):
+    """
+    数据来源的标识：来源变了才新建编辑会话（重新 cast 基准表、清空日志）。
+    obj 为 session_state 里常驻的 DataFrame 时按内容指纹区分是不是同一份（见 schema.content_token）。
+    """
+    if obj is None:
+        return (kind, *extra)
+    return (kind, content_token(obj), *extra)
+
+
+def state_source_key(state, kind, df):
+    """
+    session_state 里常驻表的 source_key，同一个表对象只算一次内容指纹（每次重跑都重新哈希整张全国表太慢）。
+    缓存里留着表对象本身，对象还在就不会有别的表拿到同一个 id，按 is 判断是不是同一张表即可。
+    """
+    slot = f"price_edit_source_{kind}"
+    hit = state.get(slot)
+    if hit is None or hit[0] is not df:
+        hit = state[slot] = (df, source_key(kind, df))
+    return hit[1]
+
+
+# ==========================
+# 会话
+# ==========================
+def new_session(df, source):
+    base = cast_price_cols(df).reset_index(drop=True)
+    return {
+        "source": source,
+        "base": base,
+        "steps": [],
+        "cursor": 0,
+        "current": base.copy(),
+        "next_id": len(base),
+        "version": 0,
+    }
+
+
+def ensure_session(state, source, load, key="price_edit"):
+    """
+    state 里已有同一来源的会话就沿用（保留日志和撤销历史），否则调用 load() 取表新建。
+    load 只在新建时才调用（上传的 Excel 不用每次重跑页面都重新读）。
+    """
+    session = state.get(key)
+    if session is None or session["source"] != source:
+        session = new_session(load(), source)
+        state[key] = session
+    return session
+
+
+def current_frame(session):
+    return session["current"]
+
+
+def saved_frame(session):
+    """保存 / 下载用：当前结果，行号重新从 0 开始。"""
+    return session["current"].reset_index(drop=True)
+
+
+# ==========================
+# 增量的合并与应用
+# ==========================
+def compose(steps):
+    """
+    多步合并成一个净增量：
+        {"set": {列: {行ID: 值}}, "add": {行ID: {列: 值}}, "delete": {行ID}}
+    同一格改多次取最后一次；改新增行直接并进新增行；先增后删的行直接消失。
+    """
+    sets = {}
+    added = {}
+    deleted = set()
+    for step in steps:
+        for rid, col, _old, new in step["set"]:
+            if rid in added:
+                added[rid][col] = new
+            else:
+                sets.setdefault(col, {})[rid] = new
+        for rid, values in step["add"]:
+            added[rid] = dict(values)
+        for rid in step["delete"]:
+            if added.pop(rid, None) is None:
+                deleted.add(rid)
+    return {"set": sets, "add": added, "delete": deleted}
+
+
+def apply_delta(frame, delta):
+    """把净增量应用到 frame 上（frame 会被就地修改赋值部分），返回新的表。"""
+    for col, cells in delta["set"].items():
+        ids = [rid for rid in cells if rid in frame.index]
+        if not ids or col not in frame.columns:
+            continue
+        values = pd.Series([cells[rid] for rid in ids], index=ids, dtype=object)
+        if col in PRICE_COLS:
+            values = pd.to_numeric(values, errors="coerce")
+        frame.loc[ids, col] = values
+
+    if delta["delete"]:
+        frame = frame.drop(index=[rid for rid in delta["delete"] if rid in frame.index])
+
+    if delta["add"]:
+        added = pd.DataFrame.from_dict(delta["add"], orient="index").reindex(columns=frame.columns)
+        frame = pd.concat([frame, cast_price_cols(added).astype(frame.dtypes.to_dict(), errors="ignore")])
+    return frame
+
+
+def replay(session):
+    """从基准表重放 steps[:cursor]（撤销 / 重做用）。"""
+    session["current"] = apply_delta(session["base"].copy(), compose(session["steps"][:session["cursor"]]))
+    session["version"] += 1
+
+
+# ==========================
+# 记录 / 撤销 / 重做
+# ==========================
+def _plain(v):
+    return None if v is None or (not isinstance(v, str) and pd.isna(v)) else v
+
+
+def editor_step(session, view_index, widget_state):
+    """
+    data_editor 的编辑状态（edited_rows / added_rows / deleted_rows，行号是显示出来的那几行的位置）
+    → 一步增量（按行ID记）；没有实际改动时返回 None。
+    """
+    current = session["current"]
+    columns = list(current.columns)
+    step = {"set": [], "add": [], "delete": []}
+
+    for pos, changes in (widget_state.get("edited_rows") or {}).items():
+        rid = view_index[int(pos)]
+        for col, new in changes.items():
+            if col not in columns:
+                continue
+            old = _plain(current.at[rid, col])
+            if old != _plain(new):
+                step["set"].append((rid, col, old, new))
+
+    for values in widget_state.get("added_rows") or []:
+        rid = session["next_id"]
+        session["next_id"] += 1
+        step["add"].append((rid, {c: v for c, v in values.items() if c in columns}))
+
+    for pos in widget_state.get("deleted_rows") or []:
+        step["delete"].append(view_index[int(pos)])
+
+    if not (step["set"] or step["add"] or step["delete"]):
+        return None
+    return step
+
+
+def record(session, view_index, widget_state):
+    """data_editor 提交一次修改：生成一步增量，丢掉可重做的步，追加并增量应用到 current。"""
+    step = editor_step(session, view_index, widget_state)
+    if step is None:
+        return False
+    del session["steps"][session["cursor"]:]
+    session["steps"].append(step)
+    session["cursor"] += 1
+    session["current"] = apply_delta(session["current"], compose([step]))
+    session["version"] += 1
+    return True
+
+
+def can_undo(session):
+    return session["cursor"] > 0
+
+
+def can_redo(session):
+    return session["cursor"] < len(session["steps"])
+
+
+def undo(session):
+    if can_undo(session):
+        session["cursor"] -= 1
+        replay(session)
+
+
+def redo(session):
+    """重做只需把下一步增量应用到 current 上，不用从头重放。"""
+    if can_redo(session):
+        step = session["steps"][session["cursor"]]
+        session["cursor"] += 1
+        session["current"] = apply_delta(session["current"], compose([step]))
+        session["version"] += 1
+
+
+def reset(session):
+    """放弃全部修改，回到载入时的基准表。"""
+    session["steps"] = []
+    session["cursor"] = 0
+    replay(session)
+
+
+# ==========================
+# 筛选 / 展示
+# ==========================
+def filter_view(frame, filters):
+    """filters：{列: [允许的值]}，空列表表示不筛；返回的视图保留行ID作为行号。"""
+    mask = pd.Series(True, index=frame.index)
+    for col, values in filters.items():
+        if values and col in frame.columns:
+            mask &= frame[col].isin(values)
+    return frame if mask.all() else frame[mask]
+
+
+def filter_options(frame, col):
+    if col not in frame.columns:
+        return []
+    return sorted(frame[col].dropna().astype(str).unique())
+
+
+def changes_frame(session):
+    """当前生效的修改明细（第几步 / 操作 / 行 / 列 / 原值 / 新值），用于在页面上展示。"""
+    def show(v):
+        return "" if v is None else str(v)
+
+    records = []
+    for n, step in enumerate(session["steps"][:session["cursor"]], start=1):
+        for rid, col, old, new in step["set"]:
+            records.append([n, "修改", rid, col, show(old), show(new)])
+        for rid, values in step["add"]:
+            records.append([n, "新增", rid, "", "", show(values)])
+        for rid in step["delete"]:
+            records.append([n, "删除", rid, "", "", ""])
+    return pd.DataFrame(records, columns=["步骤", "操作", "行", "列", "原值", "新值"])
+
+
+def change_count(session):
+    steps = session["steps"][:session["cursor"]]
+    return sum(len(s["set"]) + len(s["add"]) + len(s["delete"]) for s in steps)
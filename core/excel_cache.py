@@ -0,0 +1,221 @@
+# -*- coding: utf-8 -*-
+# core/excel_cache.py
+"""
+上传 Excel 的读取缓存（内容寻址）：同一份文件不管在哪个页面上传、点几次按钮，openpyxl 只解析一次。
+
+    key     文件内容 SHA-256 + 读取参数（sheet_name / header 等）
+    内存    进程内 LRU（默认最多 32 张表、共 512 MB），命中直接返回
+    磁盘    .cache/excel/<版本>/<sha256>-<参数>.parquet —— 列式存储，读回来类型不变；
+            列名不全是文字、或有数字文字混排的 object 列（如「站点编号」）时 Parquet 存不下原样，改存 .pkl；
+            总大小超过上限（默认 512 MB）时按最近使用时间淘汰（每次命中刷新文件的修改时间）
+版本目录里带着 pandas 主版本号：升级 pandas 后 read_excel 推出来的类型可能不同，旧缓存自动不再命中。
+
+返回的都是副本（pandas 写时复制，几乎不花时间），调用方随意改列不会污染缓存。
+每次只缓存一张工作表：sheet_name 为 None / 列表（read_excel 返回 {表名: DataFrame}）时抛 ValueError。
+"""
+import hashlib
+import os
+import pickle
+import tempfile
+import threading
+from collections import OrderedDict
+from io import BytesIO
+
+import pandas as pd
+
+from core.config import cache_dir
+
+CACHE_VERSION = 1
+DEFAULT_MAX_ITEMS = 32
+DEFAULT_MAX_MEMORY = 512 * 1024 * 1024     # 512 MB
+DEFAULT_MAX_DISK = 512 * 1024 * 1024       # 512 MB
+
+HIT_MEMORY = "内存命中"
+HIT_DISK = "磁盘命中"
+PARSED = "解析"
+
+
+def _content(file):
+    """上传对象（UploadedFile / BytesIO）或路径 → 文件字节。"""
+    if hasattr(file, "getvalue"):
+        return file.getvalue()
+    if hasattr(file, "read"):
+        pos = file.tell()
+        data = file.read()
+        file.seek(pos)
+        return data
+    with open(file, "rb") as f:
+        return f.read()
+
+
+def _parquet_safe(df):
+    """Parquet 能原样存取：列名都是文字、默认行号、没有混合类型的 object 列。"""
+    return (
+        all(isinstance(c, str) for c in df.columns)
+        and isinstance(df.index, pd.RangeIndex)
+        and not any(dtype == object for dtype in df.dtypes)
+    )
+
+
+class ExcelCache:
+
+    def __init__(self, root=None, max_items=DEFAULT_MAX_ITEMS, max_memory=DEFAULT_MAX_MEMORY, max_disk=DEFAULT_MAX_DISK):
+        version = f"v{CACHE_VERSION}-pd{pd.__version__.split('.')[0]}"
+        self.root = os.path.join(root or cache_dir("excel"), version)
+        os.makedirs(self.root, exist_ok=True)
+        self.max_items = max_items
+        self.max_memory = max_memory
+        self.max_disk = max_disk
+
+        self._lock = threading.Lock()
+        self._memory = OrderedDict()        # key → (DataFrame, 字节数)，最近用的在后面
+        self._memory_bytes = 0
+        self.stats = {HIT_MEMORY: 0, HIT_DISK: 0, PARSED: 0}
+
+    @staticmethod
+    def key(content, kwargs=None):
+        sha = hashlib.sha256(content).hexdigest()
+        if not kwargs:
+            return sha
+        params = hashlib.sha1(repr(sorted(kwargs.items())).encode("utf-8")).hexdigest()[:12]
+        return f"{sha}-{params}"
+
+    # ---------------------------
+    # 读取
+    # ---------------------------
+    def read(self, file, **kwargs):
+        """等同于 pd.read_excel(file, **kwargs)，相同内容 + 相同参数只解析一次；sheet_name 只能是一张表的名称或序号。"""
+        sheet = kwargs.get("sheet_name", 0)
+        if sheet is None or isinstance(sheet, (list, tuple)):
+            raise ValueError(f"Excel 缓存每次只读一张工作表，sheet_name 不能是 {sheet!r}")
+        content = _content(file)
+        key = self.key(content, kwargs)
+
+        with self._lock:
+            hit = self._memory.get(key)
+            if hit is not None:
+                self._memory.move_to_end(key)
+                self.stats[HIT_MEMORY] += 1
+                return hit[0].copy()
+
+        df = self._load(key)
+        if df is not None:
+            kind = HIT_DISK
+        else:
+            df = pd.read_excel(BytesIO(content), **kwargs)
+            self._save(key, df)
+            kind = PARSED
+
+        with self._lock:
+            self.stats[kind] += 1
+            self._remember(key, df)
+        return df.copy()
+
+    def _remember(self, key, df):
+        size = int(df.memory_usage(deep=True).sum())
+        if key in self._memory:
+            self._memory_bytes -= self._memory.pop(key)[1]
+        self._memory[key] = (df, size)
+        self._memory_bytes += size
+        while self._memory and (len(self._memory) > self.max_items or self._memory_bytes > self.max_memory):
+            _, (_, dropped) = self._memory.popitem(last=False)
+            self._memory_bytes -= dropped
+
+    # ---------------------------
+    # 磁盘
+    # ---------------------------
+    def _paths(self, key):
+        base = os.path.join(self.root, key)
+        return base + ".parquet", base + ".pkl"
+
+    def _load(self, key):
+        parquet, pkl = self._paths(key)
+        try:
+            if os.path.exists(parquet):
+                df = pd.read_parquet(parquet, engine="pyarrow")
+                os.utime(parquet)
+                return df
+            if os.path.exists(pkl):
+                with open(pkl, "rb") as f:
+                    df = pickle.load(f)
+                os.utime(pkl)
+                return df
+        except (OSError, EOFError, pickle.UnpicklingError, ValueError):
+            return None     # 写了一半 / 损坏的缓存当作没有，重新解析后覆盖
+        return None
+
+    def _save(self, key, df):
+        parquet, pkl = self._paths(key)
+        path = parquet if _parquet_safe(df) else pkl
+        fd, tmp = tempfile.mkstemp(dir=self.root, suffix=".part")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                if path == parquet:
+                    df.to_parquet(f, index=False, engine="pyarrow")
+                else:
+                    pickle.dump(df, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp, path)
+        except Exception:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            return
+        self.evict()
+
+    def evict(self):
+        """磁盘缓存总大小超过 max_disk 时，按修改时间（最近使用）从旧到新删。返回删掉的文件数。"""
+        if not self.max_disk:
+            return 0
+        files = []
+        for name in os.listdir(self.root):
+            if name.endswith((".parquet", ".pkl")):
+                info = os.stat(os.path.join(self.root, name))
+                files.append((info.st_mtime, info.st_size, name))
+        total = sum(size for _, size, _ in files)
+        removed = 0
+        for _, size, name in sorted(files):
+            if total <= self.max_disk:
+                break
+            try:
+                os.remove(os.path.join(self.root, name))
+            except FileNotFoundError:
+                pass
+            total -= size
+            removed += 1
+        return removed
+
+    # ---------------------------
+    # 其他
+    # ---------------------------
+    def clear(self):
+        """清空内存和磁盘缓存；.part 是别的线程 / 进程正在写的临时文件，不动。"""
+        with self._lock:
+            self._memory.clear()
+            self._memory_bytes = 0
+        for name in os.listdir(self.root):
+            if name.endswith(".part"):
+                continue
+            try:
+                os.remove(os.path.join(self.root, name))
+            except FileNotFoundError:
+                pass
+
+    def format_stats(self):
+        return "Excel 读取：" + "，".join(f"{k} {v} 次" for k, v in self.stats.items())
+
+
+_default_cache = None
+_default_lock = threading.Lock()
+
+
+def get_excel_cache():
+    """进程内共享的 Excel 读取缓存（所有页面、所有会话共用）。"""
+    global _default_cache
+    with _default_lock:
+        if _default_cache is None:
+            _default_cache = ExcelCache()
+        return _default_cache
+
+
+def read_excel(file, **kwargs):
+    """各页面读上传文件用它代替 pd.read_excel。"""
+    return get_excel_cache().read(file, **kwargs)
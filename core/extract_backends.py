@@ -0,0 +1,283 @@
+# -*- coding: utf-8 -*-
+# core/extract_backends.py
+"""
+抽表引擎：页面（或预筛裁剪后的区域）→ 表格行。
+
+    pdfplumber   原来的 page.extract_tables()：找线 → 求交点 → 拼单元格 → 每个单元格单独抽文字，最稳但最慢
+    geometry     只用表格线坐标 + 字坐标重建表格：横线 / 竖线聚成网格，每个字按中心点落进格子，
+                 合并单元格按「缺边」处理（和 pdfplumber 一样文字放在左上格，被盖住的格子为 None）
+
+两种引擎输出同样格式的行（list[list[str | None]]，多个表按出现顺序拼接），后面的识别规则完全共用。
+按省份选择引擎：data/extract_backends.json 里 {"省份": "geometry"}，没配置的省用 DEFAULT_BACKEND；
+compare_backends 对同一份 PDF 用各引擎各跑一遍，报告耗时和最终电价行是否一致，确认一致后再给该省切换。
+"""
+import json
+import os
+import tempfile
+import threading
+import time
+from bisect import bisect_right
+
+from core.config import data_path
+
+DEFAULT_BACKEND = "pdfplumber"
+AUTO = "auto"                 # 按省份配置选择
+
+SNAP_TOLERANCE = 3.0          # 坐标相差这么多以内的线视为同一条（与 pdfplumber 默认值一致）
+EDGE_MIN_LENGTH = 3.0
+TEXT_TOLERANCE = 3.0          # 字拼词 / 拼行的容差（与 pdfplumber extract_text 默认值一致）
+
+
+# ==========================
+# pdfplumber
+# ==========================
+def pdfplumber_tables(region):
+    return region.extract_tables()
+
+
+# ==========================
+# geometry：线坐标 + 字坐标
+# ==========================
+def _cluster(values, tol=SNAP_TOLERANCE):
+    """一维坐标聚类，返回各簇的均值（升序）。"""
+    out = []
+    group = []
+    for v in sorted(values):
+        if group and v - group[-1] > tol:
+            out.append(sum(group) / len(group))
+            group = []
+        group.append(v)
+    if group:
+        out.append(sum(group) / len(group))
+    return out
+
+
+def _snap(v, grid):
+    """坐标 → 最近网格线下标（grid 升序）。"""
+    i = bisect_right(grid, v)
+    if i == 0:
+        return 0
+    if i == len(grid):
+        return len(grid) - 1
+    return i if grid[i] - v < v - grid[i - 1] else i - 1
+
+
+def _merge_segments(segs, tol=SNAP_TOLERANCE):
+    """同一条线上的多段合并（首尾相距 tol 以内视为连上）。"""
+    out = []
+    for a, b in sorted(segs):
+        if out and a <= out[-1][1] + tol:
+            out[-1][1] = max(out[-1][1], b)
+        else:
+            out.append([a, b])
+    return out
+
+
+def _covers(segs, a, b, tol=SNAP_TOLERANCE):
+    return any(s <= a + tol and e >= b - tol for s, e in segs)
+
+
+def _cell_text(chars):
+    """
+    格子里的字 → 文本（与 pdfplumber 的单元格文字一致）：
+    top 相近的字归为一行；行内按 x 排序，间距超过容差或遇到空白字符就断词，词之间用空格、行之间用换行。
+    """
+    if not chars:
+        return ""
+    chars = sorted(chars, key=lambda ch: ch["top"])
+    lines = [[chars[0]]]
+    for ch in chars[1:]:
+        if ch["top"] - lines[-1][-1]["top"] <= TEXT_TOLERANCE:
+            lines[-1].append(ch)
+        else:
+            lines.append([ch])
+
+    out = []
+    for line in lines:
+        words = []
+        prev = None
+        for ch in sorted(line, key=lambda c: c["x0"]):
+            if ch["text"].isspace():
+                prev = None
+                continue
+            if prev is None or ch["x0"] > prev["x1"] + TEXT_TOLERANCE:
+                words.append(ch["text"])
+            else:
+                words[-1] += ch["text"]
+            prev = ch
+        if words:
+            out.append(" ".join(words))
+    return "\n".join(out)
+
+
+def geometry_tables(region):
+    """
+    用线和词的坐标重建表格，返回与 extract_tables 相同结构的 [table[row[cell]]]。
+    没有表格线（无框表）时返回 []，与 pdfplumber 默认的 lines 策略一致。
+    """
+    h_edges = [e for e in region.edges if e["orientation"] == "h" and e["x1"] - e["x0"] >= EDGE_MIN_LENGTH]
+    v_edges = [e for e in region.edges if e["orientation"] == "v" and e["bottom"] - e["top"] >= EDGE_MIN_LENGTH]
+    if not h_edges or not v_edges:
+        return []
+
+    ys = _cluster([e["top"] for e in h_edges])
+    xs = _cluster([e["x0"] for e in v_edges])
+    if len(ys) < 2 or len(xs) < 2:
+        return []
+
+    h_segs = {}
+    for e in h_edges:
+        h_segs.setdefault(_snap(e["top"], ys), []).append((e["x0"], e["x1"]))
+    v_segs = {}
+    for e in v_edges:
+        v_segs.setdefault(_snap(e["x0"], xs), []).append((e["top"], e["bottom"]))
+    h_segs = {k: _merge_segments(v) for k, v in h_segs.items()}
+    v_segs = {k: _merge_segments(v) for k, v in v_segs.items()}
+
+    def has_h(r, c0, c1):
+        return _covers(h_segs.get(r, ()), xs[c0], xs[c1])
+
+    def has_v(c, r0, r1):
+        return _covers(v_segs.get(c, ()), ys[r0], ys[r1])
+
+    # 字按中心点落到 (行带, 列带)；按字而不是按词分，超出格子宽度的长文字不会和隔壁格子粘在一起
+    buckets = {}
+    for ch in region.chars:
+        cy = (ch["top"] + ch["bottom"]) / 2
+        cx = (ch["x0"] + ch["x1"]) / 2
+        if not (ys[0] <= cy <= ys[-1] and xs[0] <= cx <= xs[-1]):
+            continue    # 表格外的文字（标题、注释）不要
+        r = min(bisect_right(ys, cy) - 1, len(ys) - 2)
+        c = min(bisect_right(xs, cx) - 1, len(xs) - 2)
+        buckets.setdefault((r, c), []).append(ch)
+
+    tables = []
+    table = None
+    above = {}          # 上一行带里各格子的 (owner 格子, 左列, 右列)
+    for r in range(len(ys) - 1):
+        # 本行带里的竖线 → 格子边界
+        bounds = [c for c in range(len(xs)) if has_v(c, r, r + 1)]
+        if len(bounds) < 2:
+            # 这一带没有竖线：前一张表结束
+            if table:
+                tables.append(table)
+            table, above = None, {}
+            continue
+        if table is None:
+            table = {"cells": {}, "order": []}
+
+        current = {}
+        for c0, c1 in zip(bounds, bounds[1:]):
+            prev = above.get(c0)
+            if not has_h(r, c0, c1):
+                # 上边没有横线：和上面的格子是同一个（纵向合并）；
+                # 上面没有宽度相同的格子（比如预筛裁剪正好切在合并单元格中间）就不成格，与 pdfplumber 一样记 None
+                owner = prev[0] if prev is not None and prev[2] == c1 else None
+            else:
+                owner = (r, c0)
+                table["cells"][owner] = []
+                table["order"].append(owner)
+            if owner is not None:
+                for c in range(c0, c1):
+                    table["cells"][owner].extend(buckets.get((r, c), []))
+            current[c0] = (owner, c0, c1)
+        above = current
+    if table:
+        tables.append(table)
+
+    out = []
+    for t in tables:
+        cols = sorted({c for _, c in t["order"]})
+        col_pos = {c: i for i, c in enumerate(cols)}
+        rows = {}
+        for (r, c) in t["order"]:
+            rows.setdefault(r, [None] * len(cols))[col_pos[c]] = _cell_text(t["cells"][(r, c)])
+        out.append([rows[r] for r in sorted(rows)])
+    return out
+
+
+BACKENDS = {
+    "pdfplumber": pdfplumber_tables,
+    "geometry": geometry_tables,
+}
+
+
+def get_backend(name):
+    try:
+        return BACKENDS[name]
+    except KeyError:
+        raise ValueError(f"未知抽表引擎：{name}（可选：{', '.join(BACKENDS)}）")
+
+
+# ==========================
+# 按省份选择
+# ==========================
+_config_lock = threading.Lock()
+
+
+def _config_path():
+    return data_path("extract_backends.json")
+
+
+def load_province_backends():
+    """{省份: 引擎名}；没配置过时返回空字典。"""
+    try:
+        with open(_config_path(), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+
+def save_province_backends(mapping):
+    for name in mapping.values():
+        get_backend(name)
+    with _config_lock:
+        path = _config_path()
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".part")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(dict(mapping), f, ensure_ascii=False, indent=1)
+        os.replace(tmp, path)
+
+
+def resolve_backend(name, province=None):
+    """name="auto" 时按省份配置选，没配置的用 DEFAULT_BACKEND；其他值原样校验后返回。"""
+    if name in (None, AUTO):
+        name = load_province_backends().get(province or "", DEFAULT_BACKEND)
+    get_backend(name)
+    return name
+
+
+# ==========================
+# 对比模式
+# ==========================
+def compare_backends(source, backends=tuple(BACKENDS), prefilter=True):
+    """
+    同一份 PDF 用各引擎各解析一遍（不走任何缓存），返回每个引擎一行：
+        引擎 / 省份 / 抽表耗时(ms) / 表格行数 / 电价行数 / 与 pdfplumber 一致
+    「一致」比较的是最终电价行（省份、制度、各档价格），不是中间的表格行。
+    """
+    from core.pdf_parser import extract_raw, replay_stages   # 避免循环导入
+    from core.page_filter import new_stats
+
+    results = []
+    baseline = None
+    for name in backends:
+        if hasattr(source, "seek"):
+            source.seek(0)
+        stats = new_stats()
+        t0 = time.perf_counter()
+        raw = extract_raw(source, prefilter=prefilter, stats=stats, backend=name)
+        total_ms = (time.perf_counter() - t0) * 1000
+        df, _ = replay_stages(raw)
+        if baseline is None:
+            baseline = df
+        results.append({
+            "引擎": name,
+            "省份": raw["province"],
+            "抽表耗时(ms)": round(stats["extract_ms"], 1),
+            "总耗时(ms)": round(total_ms, 1),
+            "表格行数": len(raw["rows"]),
+            "电价行数": len(df),
+            f"与{backends[0]}一致": df.reset_index(drop=True).equals(baseline.reset_index(drop=True)),
+        })
+    return results
@@ -0,0 +1,382 @@
+# -*- coding: utf-8 -*-
+# core/fetch.py
+"""
+PDF 下载层：共享 keep-alive 连接池 + 有界并发 + 单主机并发上限 + 退避重试。
+
+- 响应体按块流式读入 SpooledTemporaryFile（小文件在内存，大文件自动落到临时文件），边读边算哈希，超过大小上限直接中止；
+- 缓存过了新鲜期的 URL 发条件请求（If-None-Match / If-Modified-Since），304 直接用本地那份，不传输也不用重新解析；
+- 读响应体时断开：已收到的部分留下来，用 Range + If-Range 续传（本次重试和下次运行都能续）。
+
+用法：
+    downloader = PdfDownloader(max_workers=8, per_host=4, cache=get_pdf_cache())
+    for res in downloader.iter_fetch(urls):
+        ...   # 每个 PDF 下载完成就立刻产出，调用方可以边下边解析
+"""
+import hashlib
+import tempfile
+import threading
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.exceptions import HTTPError as Urllib3HTTPError
+from urllib3.util.retry import Retry
+
+
+HEADERS = {
+    "User-Agent": "Mozilla/5.0",
+    "Referer": "https://www.95598.cn/",
+    "Accept": "application/pdf",
+}
+
+DEFAULT_WORKERS = 8        # 总并发下载数
+DEFAULT_PER_HOST = 4       # 同一主机最多同时几个连接（95598 对并发比较敏感）
+DEFAULT_RETRIES = 3        # 连接失败 / 5xx / 429 的重试次数
+DEFAULT_BACKOFF = 0.5      # 退避系数：0.5s, 1s, 2s ...
+DEFAULT_TIMEOUT = 30
+
+RETRY_STATUS = (429, 500, 502, 503, 504)
+
+DEFAULT_FRESH_SECONDS = 6 * 3600           # 缓存在这段时间内直接用，不发请求；过了就发条件请求确认
+DEFAULT_MAX_PDF_BYTES = 64 * 1024 * 1024   # 单个 PDF 的大小上限（国网电价表一般几百 KB）
+DEFAULT_SPOOL_BYTES = 4 * 1024 * 1024      # 响应体超过这个大小就从内存转存到临时文件
+DEFAULT_BODY_RETRIES = 2                   # 读响应体时断开，续传重试几次
+CHUNK_BYTES = 64 * 1024
+
+# 读响应体过程中可能出现的网络错误（连接阶段的错误由 urllib3 Retry 处理）
+BODY_ERRORS = (requests.exceptions.RequestException, Urllib3HTTPError, OSError)
+
+# iter_fetch 的产出：
+#   idx / url     —— 输入中的位置与链接
+#   content       —— PDF 字节（失败时为 None）
+#   error         —— 异常对象（成功时为 None）
+#   sha256        —— 内容哈希（相同字节的文件只需解析一次）
+#   from_cache    —— True 表示内容来自本地缓存（新鲜期内没发请求，或服务器回了 304）
+#   how           —— cached / not_modified / downloaded / resumed（本地文件批处理时为 local）
+FetchResult = namedtuple(
+    "FetchResult",
+    ["idx", "url", "content", "error", "sha256", "from_cache", "how"],
+    defaults=(None,),
+)
+
+FETCH_HOW_LABELS = {
+    "cached": "本地缓存",
+    "not_modified": "未修改(304)",
+    "downloaded": "下载",
+    "resumed": "续传",
+    "local": "本地文件",
+}
+
+
+class HostRateLimiter:
+    """
+    单主机请求频率限制：同一 host 两次请求至少间隔 min_interval 秒（跨线程生效）。
+    PdfDownloader 和列表页爬虫共用一个实例，保证对同一站点的总请求频率受控。
+    """
+
+    def __init__(self, min_interval=1.0):
+        self.min_interval = float(min_interval)
+        self._next = {}
+        self._lock = threading.Lock()
+
+    def wait(self, url):
+        if self.min_interval <= 0:
+            return
+        host = urlsplit(url).netloc.lower()
+        with self._lock:
+            now = time.monotonic()
+            at = max(now, self._next.get(host, now))
+            self._next[host] = at + self.min_interval
+        if at > now:
+            time.sleep(at - now)
+
+
+class _Partial:
+    """下载了一半的响应体：spool 里是已收到的字节，etag / last_modified 用来续传时确认文件没换。"""
+
+    def __init__(self, spool, size, digest, etag, last_modified):
+        self.spool = spool
+        self.size = size
+        self.digest = digest
+        self.etag = etag
+        self.last_modified = last_modified
+
+    @property
+    def validator(self):
+        return self.etag or self.last_modified
+
+
+class _Interrupted(Exception):
+    """读响应体时断开；partial 带着已收到的内容，供下一次 Range 续传。"""
+
+    def __init__(self, cause, partial):
+        super().__init__(str(cause))
+        self.cause = cause
+        self.partial = partial
+
+
+def make_session(pool_size=DEFAULT_WORKERS, retries=DEFAULT_RETRIES, backoff=DEFAULT_BACKOFF):
+    """
+    构造一个带连接池和自动重试的 requests.Session。
+    所有下载线程共用这一个 Session，TCP/TLS 连接会被复用。
+    """
+    retry = Retry(
+        total=retries,
+        connect=retries,
+        read=retries,
+        status=retries,
+        backoff_factor=backoff,
+        status_forcelist=RETRY_STATUS,
+        allowed_methods=frozenset(["GET", "HEAD"]),
+        respect_retry_after_header=True,
+        raise_on_status=False,   # 重试用尽后把最后一次响应交回来，由 raise_for_status 报错
+    )
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+
+    session = requests.Session()
+    session.headers.update(HEADERS)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+class PdfDownloader:
+    """
+    有界并发的 PDF 下载器。
+
+    - max_workers：线程池大小（总并发）
+    - per_host：同一 host 的并发上限
+    - retries / backoff：交给 urllib3 Retry 做指数退避
+    - cache：可选的 PdfCache；新鲜期内的 URL 不再发请求，过期的发条件请求，新下载的内容写入缓存
+    - fresh_seconds：缓存的新鲜期；0 表示每次都向服务器确认
+    - max_pdf_bytes：单个文件的大小上限；spool_bytes：响应体在内存里最多放多少
+    - body_retries：读响应体断开后用 Range 续传的次数
+    - rate_limiter：可选的 HostRateLimiter，限制对同一主机的请求频率
+    """
+
+    def __init__(
+        self,
+        max_workers=DEFAULT_WORKERS,
+        per_host=DEFAULT_PER_HOST,
+        retries=DEFAULT_RETRIES,
+        backoff=DEFAULT_BACKOFF,
+        timeout=DEFAULT_TIMEOUT,
+        session=None,
+        cache=None,
+        fresh_seconds=DEFAULT_FRESH_SECONDS,
+        max_pdf_bytes=DEFAULT_MAX_PDF_BYTES,
+        spool_bytes=DEFAULT_SPOOL_BYTES,
+        body_retries=DEFAULT_BODY_RETRIES,
+        rate_limiter=None,
+    ):
+        self.max_workers = max(1, int(max_workers))
+        self.per_host = max(1, int(per_host))
+        self.timeout = timeout
+        self.session = session or make_session(self.max_workers, retries, backoff)
+        self.cache = cache
+        self.fresh_seconds = fresh_seconds
+        self.max_pdf_bytes = max_pdf_bytes
+        self.spool_bytes = spool_bytes
+        self.body_retries = max(0, int(body_retries))
+        self.rate_limiter = rate_limiter
+
+        self._host_slots = {}
+        self._lock = threading.Lock()
+
+    def _host_slot(self, url):
+        host = urlsplit(url).netloc.lower()
+        with self._lock:
+            slot = self._host_slots.get(host)
+            if slot is None:
+                slot = threading.BoundedSemaphore(self.per_host)
+                self._host_slots[host] = slot
+        return slot
+
+    def fetch(self, url):
+        """下载单个 URL，返回 bytes；HTTP 错误直接抛出。"""
+        content, _, _ = self._fetch_and_store(url)
+        return content
+
+    # ---------------------------
+    # 单个 URL：条件请求 + 流式读取 + 续传
+    # ---------------------------
+    def _fetch_and_store(self, url):
+        """返回 (content, sha256, how)。"""
+        known = self.cache.validators(url) if self.cache is not None else None
+        partial = self._load_partial(url)
+
+        for attempt in range(self.body_retries + 1):
+            try:
+                return self._get(url, known, partial)
+            except _Interrupted as e:
+                partial = e.partial
+                if self.cache is not None and partial is not None:
+                    self.cache.save_partial(url, partial.spool, partial.etag, partial.last_modified)
+                if attempt == self.body_retries:
+                    raise e.cause
+
+    def _load_partial(self, url):
+        """上次运行留下的半截内容 → _Partial；没有则 None。"""
+        if self.cache is None:
+            return None
+        found = self.cache.load_partial(url)
+        if found is None:
+            return None
+        path, info = found
+        spool = tempfile.SpooledTemporaryFile(max_size=self.spool_bytes)
+        digest = hashlib.sha256()
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(CHUNK_BYTES), b""):
+                spool.write(chunk)
+                digest.update(chunk)
+        return _Partial(spool, info["size"], digest, info.get("etag"), info.get("last_modified"))
+
+    def _get(self, url, known, partial):
+        headers = {}
+        if known is not None:
+            if known.get("etag"):
+                headers["If-None-Match"] = known["etag"]
+            if known.get("last_modified"):
+                headers["If-Modified-Since"] = known["last_modified"]
+        if partial is not None and partial.validator:
+            headers["Range"] = f"bytes={partial.size}-"
+            headers["If-Range"] = partial.validator
+
+        with self._host_slot(url):
+            if self.rate_limiter is not None:
+                self.rate_limiter.wait(url)
+            resp = self.session.get(url, headers=headers, timeout=self.timeout, stream=True)
+            try:
+                if resp.status_code == 304:
+                    if known is None:
+                        # 没发条件请求却回 304（代理 / 服务器异常）：没有本地内容可用，不能当成空文件存下来
+                        raise requests.HTTPError(f"服务器返回 304，但本地没有这份文件的缓存：{url}", response=resp)
+                    content = self._read_cached(known["sha256"])
+                    if content is not None:
+                        self.cache.refresh(url, resp.headers.get("ETag"), resp.headers.get("Last-Modified"))
+                        return content, known["sha256"], "not_modified"
+                elif not (resp.status_code == 416 and partial is not None):
+                    resp.raise_for_status()
+                    return self._read_body(url, resp, partial)
+            finally:
+                resp.close()
+
+        if resp.status_code == 304:
+            # 发请求期间缓存文件被淘汰了：出了 host 槽位，不带条件头重新下载
+            return self._get(url, None, partial)
+
+        # 416：服务器不认这个 Range（文件变短了之类）。丢掉半截内容，出了 host 槽位再从头下
+        self._discard(url, partial)
+        return self._get(url, known, None)
+
+    def _read_cached(self, sha):
+        """读缓存里的文件；已被淘汰（或别的会话删掉）时返回 None。"""
+        try:
+            return self.cache.read(sha)
+        except FileNotFoundError:
+            return None
+
+    def _read_body(self, url, resp, partial):
+        etag = resp.headers.get("ETag")
+        last_modified = resp.headers.get("Last-Modified")
+
+        if resp.status_code == 206 and partial is not None:
+            spool, size, digest, how = partial.spool, partial.size, partial.digest, "resumed"
+            spool.seek(0, 2)
+            etag = etag or partial.etag
+            last_modified = last_modified or partial.last_modified
+        else:
+            if partial is not None:
+                self._discard(url, partial)     # 服务器给了完整内容（If-Range 不匹配），半截的作废
+            spool = tempfile.SpooledTemporaryFile(max_size=self.spool_bytes)
+            size, digest, how = 0, hashlib.sha256(), "downloaded"
+
+        declared = resp.headers.get("Content-Length")
+        if declared and declared.isdigit() and size + int(declared) > self.max_pdf_bytes:
+            spool.close()
+            raise ValueError(f"PDF 超过大小上限（{self.max_pdf_bytes} 字节）：{url}")
+
+        try:
+            for chunk in resp.iter_content(CHUNK_BYTES):
+                size += len(chunk)
+                if size > self.max_pdf_bytes:
+                    spool.close()
+                    raise ValueError(f"PDF 超过大小上限（{self.max_pdf_bytes} 字节）：{url}")
+                spool.write(chunk)
+                digest.update(chunk)
+        except BODY_ERRORS as e:
+            spool.flush()
+            raise _Interrupted(e, _Partial(spool, spool.tell(), digest, etag, last_modified) if (etag or last_modified) else None)
+
+        spool.seek(0)
+        content = spool.read()
+        spool.close()
+        sha = digest.hexdigest()
+        if self.cache is not None:
+            self.cache.put(url, content, sha=sha, etag=etag, last_modified=last_modified)
+        return content, sha, how
+
+    def _discard(self, url, partial):
+        partial.spool.close()
+        if self.cache is not None:
+            self.cache.drop_partial(url)
+
+    def _is_fresh(self, url):
+        """新鲜期内的缓存 → sha256，直接用；否则 None（需要发请求确认）。"""
+        if self.cache is None:
+            return None
+        sha = self.cache.lookup(url)
+        if sha is None:
+            return None
+        known = self.cache.validators(url)
+        if known is None or time.time() - known["fetched_at"] >= self.fresh_seconds:
+            return None
+        return sha
+
+    def iter_fetch(self, urls):
+        """
+        并发下载一批 URL，按【完成顺序】逐个产出 FetchResult。
+        新鲜期内的缓存先产出（此时其余请求已在后台进行），不会发出任何网络请求；
+        过了新鲜期的发条件请求，304 时 content 取自本地缓存；缓存文件中途被淘汰的，不带条件头重新下载。
+        """
+        urls = list(urls)
+        if not urls:
+            return
+
+        hits = {}
+        for i, url in enumerate(urls):
+            sha = self._is_fresh(url)
+            if sha is not None:
+                hits[i] = sha
+        missing = [(i, url) for i, url in enumerate(urls) if i not in hits]
+
+        with ThreadPoolExecutor(max_workers=max(1, min(self.max_workers, len(missing)))) as pool:
+            futures = {pool.submit(self._fetch_and_store, url): (i, url) for i, url in missing}
+
+            for i, sha in hits.items():
+                content = self._read_cached(sha)
+                if content is None:
+                    # 查完新鲜期到读文件之间被淘汰了：当作没缓存，重新下载
+                    futures[pool.submit(self._fetch_and_store, urls[i])] = (i, urls[i])
+                    continue
+                yield FetchResult(i, urls[i], content, None, sha, True, "cached")
+
+            for fut in as_completed(futures):
+                i, url = futures[fut]
+                try:
+                    content, sha, how = fut.result()
+                    yield FetchResult(i, url, content, None, sha, how == "not_modified", how)
+                except Exception as e:
+                    yield FetchResult(i, url, None, e, None, False)
+
+    def close(self):
+        self.session.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,252 @@
+# -*- coding: utf-8 -*-
+# core/history.py
+"""
+电价历史库（SQLite）：把 Page1 解析结果（raw）和 Page2 矫正结果（fixed）按生效月份存下来。
+
+主键：省份 + 城市 + 制度 + 电压等级 + 生效月份 + 来源，另有 (月份, 来源) 和 (省份, 制度, 电压等级) 索引，
+支持：
+    - load_month("2026-10")                     某月全国电价（某省某电压等级有矫正版就只用矫正版，没有再用解析版）
+    - latest("浙江省", scheme="单一制")          某省最近一次已知电价
+    - months()                                   库里有哪些月份
+    - voltages("2026-10")                        某月有哪些电压等级（Page1 存的是全电压矩阵）
+Page2 / Page3 可以直接从这里加载，不用再重新解析 PDF。
+月份一律存成 YYYY-MM（normalize_month），latest(before=) 按文字比较大小才不会出错。
+"""
+import re
+import sqlite3
+import time
+from contextlib import closing
+
+import pandas as pd
+
+from core.config import data_path
+from core.price_matrix import voltage_sort_key
+
+# 页面里的列名 → 库里的列名
+KEY_COLS = {"省份": "province", "城市": "city", "制度": "scheme", "电压等级": "voltage"}
+PRICE_COLS = {"不分时电价": "non_time", "尖": "jian", "峰": "feng", "平": "ping", "谷": "gu", "深": "shen"}
+
+SOURCES = ("raw", "fixed")       # raw = Page1 解析；fixed = Page2 矫正
+SOURCE_LABELS = {"raw": "Page1 解析版", "fixed": "Page2 矫正版"}
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS tariffs (
+    province   TEXT NOT NULL,
+    city       TEXT NOT NULL DEFAULT '',
+    scheme     TEXT NOT NULL,
+    voltage    TEXT NOT NULL,
+    month      TEXT NOT NULL,          -- 生效月份 YYYY-MM
+    source     TEXT NOT NULL,          -- raw / fixed
+    non_time   REAL,
+    jian       REAL,
+    feng       REAL,
+    ping       REAL,
+    gu         REAL,
+    shen       REAL,
+    updated_at REAL NOT NULL,
+    PRIMARY KEY (province, city, scheme, voltage, month, source)
+);
+CREATE INDEX IF NOT EXISTS idx_tariffs_month ON tariffs(month, source);
+CREATE INDEX IF NOT EXISTS idx_tariffs_key ON tariffs(province, scheme, voltage, month);
+"""
+
+
+def _clean_text(v):
+    if v is None or (isinstance(v, float) and pd.isna(v)):
+        return ""
+    return str(v).strip()
+
+
+_MONTH_PATTERN = re.compile(r"^(\d{4})[-/]?(\d{1,2})$")
+
+
+def normalize_month(month):
+    """
+    '2026-10' / '2026-1' / '2026/10' / '202610' → '2026-10'；认不出的抛 ValueError。
+    年和月都必须写出来：只有年份的「2026」不当作 1 月。
+    """
+    m = _MONTH_PATTERN.match(str(month).strip())
+    if m is None or not 1 <= int(m[2]) <= 12:
+        raise ValueError(f"生效月份格式不对：{month!r}（应为 YYYY-MM）")
+    return f"{m[1]}-{int(m[2]):02d}"
+
+
+def _clean_price(v):
+    v = pd.to_numeric(v, errors="coerce")
+    return None if pd.isna(v) else float(v)
+
+
+# 矫正版是某月某省某电压等级的完整结果：存过矫正版的，同月的解析版整组不用
+_FIXED_FIRST = """(t.source = 'fixed' OR NOT EXISTS (
+    SELECT 1 FROM tariffs f
+    WHERE f.source = 'fixed' AND f.month = t.month AND f.province = t.province AND f.voltage = t.voltage
+))"""
+
+
+class TariffHistory:
+
+    def __init__(self, path=None):
+        self.path = str(path or data_path("tariff_history.sqlite"))
+        with closing(self._connect()) as db:
+            db.executescript(_SCHEMA)
+            db.commit()
+
+    def _connect(self):
+        return sqlite3.connect(self.path, timeout=30)
+
+    # ---------------------------
+    # 写入
+    # ---------------------------
+    def save(self, df, month, source="raw", replace_month=False):
+        """
+        存一张电价表（Page1 / Page2 的列格式）。
+        - 同一主键的旧记录会被覆盖；
+        - replace_month=True 时先清掉该月该来源、表里出现过的电压等级的全部记录
+          （Page2 保存整张矫正表时用，删掉的行也会同步删除；没在表里的电压等级不动）。
+        month 先按 normalize_month 统一成 YYYY-MM，认不出时抛 ValueError。
+        返回写入的行数。
+        """
+        if source not in SOURCES:
+            raise ValueError(f"未知来源：{source}")
+        month = normalize_month(month)
+        if df is None or df.empty:
+            return 0
+
+        now = time.time()
+        records = []
+        for r in df.to_dict("records"):
+            if not _clean_text(r.get("省份")):
+                continue
+            records.append(
+                [_clean_text(r.get(c)) for c in KEY_COLS]
+                + [month, source]
+                + [_clean_price(r.get(c)) for c in PRICE_COLS]
+                + [now]
+            )
+
+        cols = list(KEY_COLS.values()) + ["month", "source"] + list(PRICE_COLS.values()) + ["updated_at"]
+        sql = f"INSERT OR REPLACE INTO tariffs({', '.join(cols)}) VALUES ({', '.join('?' * len(cols))})"
+
+        with closing(self._connect()) as db:
+            voltages = sorted({r[3] for r in records})
+            if replace_month and voltages:
+                db.execute(
+                    "DELETE FROM tariffs WHERE month = ? AND source = ? "
+                    f"AND voltage IN ({', '.join('?' * len(voltages))})",
+                    (month, source, *voltages),
+                )
+            db.executemany(sql, records)
+            db.commit()
+        return len(records)
+
+    # ---------------------------
+    # 查询
+    # ---------------------------
+    def _query(self, sql, params=()):
+        with closing(self._connect()) as db:
+            df = pd.read_sql_query(sql, db, params=params)
+        return _to_page_frame(df)
+
+    def months(self, source=None):
+        """库里有哪些月份（新 → 旧）。"""
+        sql = "SELECT DISTINCT month FROM tariffs"
+        params = ()
+        if source:
+            sql += " WHERE source = ?"
+            params = (source,)
+        with closing(self._connect()) as db:
+            return [r[0] for r in db.execute(sql + " ORDER BY month DESC", params)]
+
+    def voltages(self, month=None):
+        """库里（某月）有哪些电压等级，从低到高。"""
+        sql = "SELECT DISTINCT voltage FROM tariffs"
+        params = ()
+        if month:
+            sql += " WHERE month = ?"
+            params = (normalize_month(month),)
+        with closing(self._connect()) as db:
+            return sorted((r[0] for r in db.execute(sql, params)), key=voltage_sort_key)
+
+    def load_month(self, month, source=None, provinces=None, voltage=None):
+        """
+        某月的全国电价表。
+        source=None 时某省某电压等级只要存过矫正版（fixed），就只用矫正版——Page2 编辑时删掉的行不会被解析版补回来；
+        该省该电压等级从没矫正过的，用解析版（raw）。
+        voltage 只取某个电压等级（None = 全部）。
+        """
+        where = ["month = ?"]
+        params = [normalize_month(month)]
+        if source:
+            where.append("source = ?")
+            params.append(source)
+        else:
+            where.append(_FIXED_FIRST)
+        if voltage:
+            where.append("voltage = ?")
+            params.append(voltage)
+        if provinces:
+            where.append(f"province IN ({', '.join('?' * len(provinces))})")
+            params.extend(provinces)
+
+        sql = f"""
+            SELECT * FROM tariffs t WHERE {' AND '.join(where)}
+            ORDER BY province, city, scheme, voltage
+        """
+        return self._query(sql, params)
+
+    def latest(self, province=None, scheme=None, voltage=None, city=None, before=None):
+        """
+        每个 省份/城市/制度/电压等级 最近一次已知的电价（同月按 load_month 的规则：有矫正版的省份 / 电压等级只看矫正版）。
+        before="2026-10" 时只看该月及以前。结果带「生效月份」「来源」列。
+        """
+        where = [_FIXED_FIRST]
+        params = []
+        for col, val in (("province", province), ("scheme", scheme), ("voltage", voltage), ("city", city)):
+            if val is not None:
+                where.append(f"{col} = ?")
+                params.append(val)
+        if before:
+            where.append("month <= ?")
+            params.append(normalize_month(before))
+
+        sql = f"""
+            SELECT * FROM (
+                SELECT *, ROW_NUMBER() OVER (
+                    PARTITION BY province, city, scheme, voltage
+                    ORDER BY month DESC, CASE source WHEN 'fixed' THEN 0 ELSE 1 END
+                ) AS rn
+                FROM tariffs t WHERE {' AND '.join(where)}
+            ) WHERE rn = 1
+            ORDER BY province, city, scheme, voltage
+        """
+        return self._query(sql, params)
+
+    def summary(self):
+        """每个月 / 来源各有多少省份、多少行，给页面展示用。"""
+        with closing(self._connect()) as db:
+            df = pd.read_sql_query(
+                "SELECT month AS 生效月份, source AS 来源, COUNT(DISTINCT province) AS 省份数, "
+                "COUNT(*) AS 行数, MAX(updated_at) AS 更新时间 "
+                "FROM tariffs GROUP BY month, source ORDER BY month DESC, source",
+                db,
+            )
+        df["来源"] = df["来源"].map(SOURCE_LABELS).fillna(df["来源"])
+        df["更新时间"] = pd.to_datetime(df["更新时间"], unit="s").dt.strftime("%Y-%m-%d %H:%M")
+        return df
+
+
+def _to_page_frame(df):
+    """库里的列 → Page1 / Page2 的列格式；附带 生效月份 / 来源 两列。"""
+    rename = {v: k for k, v in {**KEY_COLS, **PRICE_COLS}.items()}
+    rename.update({"month": "生效月份", "source": "来源"})
+    out = df.rename(columns=rename)
+    for c in PRICE_COLS:
+        if c in out.columns:
+            out[c] = pd.to_numeric(out[c], errors="coerce").astype(float)   # 整列为空时 SQLite 读回来是 None
+    cols = list(KEY_COLS) + list(PRICE_COLS) + ["生效月份", "来源"]
+    return out[[c for c in cols if c in out.columns]].reset_index(drop=True)
+
+
+def page_columns(df):
+    """去掉 生效月份 / 来源，只保留页面电价表的列。"""
+    return df[[c for c in list(KEY_COLS) + list(PRICE_COLS) if c in df.columns]].copy()
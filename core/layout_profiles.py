@@ -0,0 +1,188 @@
+# -*- coding: utf-8 -*-
+# core/layout_profiles.py
+"""
+各省电价表的「版式档案」：同一个省每个月的 PDF 版式基本不变，识别过一次就记下来，
+下个月直接套用已知的列布局和 1-10kV 行，不再跑 detect_layout。
+
+命中档案只省掉布局识别这一步（合成语料上每个文档约 1 ms）：全电压矩阵（build_price_matrix）
+仍然要建 TableIndex、逐行找电压等级——新的一期可能多出 / 少了某个电压等级的行，档案里没有记录这些行，
+只有整表扫描才能保证矩阵与完整识别一致。PDF 解析的大头在抽表（raw 阶段），那一步靠阶段缓存省。
+
+    key      省份 + 指纹（表头几行的文字去掉数字后的哈希 + 列数，月份 / 日期变化不影响）
+    profile  detect_layout 的结果 + 选中行的文字特征 + 各取价单元格是否为数字
+
+命中指纹后先校验：选中行还在、行文字（去掉数字）没变、各单元格的「是否数字」与学习时一致。
+校验不过就回退到完整识别，并用新结果覆盖档案。
+
+档案存成 data/layout_profiles.json（人可读，必要时可以手工删掉某个省重新学习）。
+"""
+import hashlib
+import json
+import os
+import re
+import tempfile
+import threading
+import time
+
+from core.config import data_path
+
+HEADER_ROWS = 4               # 指纹取表格前几行（表头）
+_DIGITS = re.compile(r"[\d.．]+")
+_SPACES = re.compile(r"\s+")
+
+
+def _shape_text(text):
+    """去掉数字和空白，只留版式相关的文字。"""
+    return _SPACES.sub("", _DIGITS.sub("", text))
+
+
+def row_text(row):
+    return "".join(str(c) for c in row)
+
+
+def fingerprint(frame):
+    """表头指纹：前 HEADER_ROWS 行的文字（去掉数字 / 空白）+ 列数。"""
+    head = "|".join(_shape_text(row_text(frame.iloc[i].values)) for i in range(min(HEADER_ROWS, len(frame))))
+    h = hashlib.sha1(f"{frame.shape[1]}#{head}".encode("utf-8")).hexdigest()
+    return h[:16]
+
+
+def _cells(layout):
+    """档案里需要取价的列号（非分时列 + 各分时列）。"""
+    cols = []
+    if layout.get("non_time_col") is not None:
+        cols.append(layout["non_time_col"])
+    cols.extend(sorted(layout.get("period_cols", {}).values()))
+    return cols
+
+
+def _is_number(v):
+    if v is None:
+        return False
+    try:
+        float(str(v).replace(",", "").strip())
+        return True
+    except ValueError:
+        return False
+
+
+def describe(frame, layout):
+    """
+    对识别好的布局拍一张「快照」，供下次校验：
+        row_shapes   每个选中行去掉数字后的文字
+        numeric      每个选中行在各取价列上是否为数字
+    """
+    row_shapes = []
+    numeric = []
+    for idx in layout["row_indices"]:
+        row = frame.iloc[idx].values
+        row_shapes.append(_shape_text(row_text(row)))
+        numeric.append([c < len(row) and _is_number(row[c]) for c in _cells(layout)])
+    return {"ncols": int(frame.shape[1]), "row_shapes": row_shapes, "numeric": numeric}
+
+
+def validate(frame, profile):
+    """档案的布局放到这张表上是否仍然成立。"""
+    layout = profile["layout"]
+    snap = profile["snapshot"]
+    if frame.shape[1] != snap["ncols"]:
+        return False
+    if any(idx >= len(frame) for idx in layout["row_indices"]):
+        return False
+    return describe(frame, layout) == snap
+
+
+class LayoutProfiles:
+    """JSON 存储：{省份: {指纹: {"layout", "snapshot", "hits", "updated_at"}}}。线程安全，写入是原子替换。"""
+
+    def __init__(self, path=None):
+        self.path = str(path or data_path("layout_profiles.json"))
+        self._lock = threading.Lock()
+        self._data = self._load()
+
+    def _load(self):
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return {}
+
+    def _save(self):
+        folder = os.path.dirname(self.path) or "."
+        fd, tmp = tempfile.mkstemp(dir=folder, suffix=".part")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(self._data, f, ensure_ascii=False, indent=1)
+        os.replace(tmp, self.path)
+
+    def get(self, province, fp):
+        with self._lock:
+            return self._data.get(province, {}).get(fp)
+
+    def put(self, province, fp, frame, layout):
+        with self._lock:
+            self._data.setdefault(province, {})[fp] = {
+                "layout": _jsonable(layout),
+                "snapshot": describe(frame, layout),
+                "hits": 0,
+                "updated_at": time.time(),
+            }
+            self._save()
+
+    def hit(self, province, fp):
+        with self._lock:
+            prof = self._data.get(province, {}).get(fp)
+            if prof is not None:
+                prof["hits"] = prof.get("hits", 0) + 1
+                self._save()
+
+    def forget(self, province=None):
+        with self._lock:
+            if province is None:
+                self._data = {}
+            else:
+                self._data.pop(province, None)
+            self._save()
+
+    def resolve(self, frame, province, detect):
+        """
+        返回 (layout, 来源)：
+            来源 = "命中"      档案校验通过，直接用已知单元格
+                   "重新识别"  有档案但校验失败，完整识别后覆盖档案
+                   "新建"      没有档案，完整识别后记下来
+        detect() 做完整识别（返回 None 表示表里没有 1-10kV 行，此时不建档）。
+        """
+        fp = fingerprint(frame)
+        prof = self.get(province, fp)
+        if prof is not None and validate(frame, prof):
+            self.hit(province, fp)
+            return dict(prof["layout"]), "命中"
+
+        layout = detect()
+        if layout is not None:
+            self.put(province, fp, frame, layout)
+        return layout, ("新建" if prof is None else "重新识别")
+
+
+def _jsonable(layout):
+    """numpy 整数 / 元组转成 JSON 能存的 int / list。"""
+    out = dict(layout)
+    out["period_cols"] = {k: int(v) for k, v in (layout.get("period_cols") or {}).items()}
+    out["row_indices"] = [int(i) for i in layout["row_indices"]]
+    if out.get("non_time_col") is not None:
+        out["non_time_col"] = int(out["non_time_col"])
+    if out.get("period_order") is not None:
+        out["period_order"] = list(out["period_order"])
+    return out
+
+
+_default_profiles = None
+_default_lock = threading.Lock()
+
+
+def get_layout_profiles():
+    """进程内共享的版式档案。"""
+    global _default_profiles
+    with _default_lock:
+        if _default_profiles is None:
+            _default_profiles = LayoutProfiles()
+        return _default_profiles
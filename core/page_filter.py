@@ -0,0 +1,139 @@
+# -*- coding: utf-8 -*-
+# core/page_filter.py
+"""
+页面预筛：先用文字层（page.chars，抽表本来就要解析它）快速找出含「千伏 / kV」或分时表头关键字的页面
+和它们所在的纵向区域，再只对这块裁剪区域跑 extract_tables。
+
+- 没有任何候选字的页面直接跳过，不做表格识别；
+- 候选字与 core/table_index.py 的电压写法共用同一组正则（VOLTAGE_1_10_PATTERN / VOLTAGE_UNITS），
+  抽表能认出来的 1-10kV 写法（包括省掉「伏」的「1-10千」），预筛同样认作候选字；
+- 候选区域向外对齐到最近的横向表格线，保证被选中的表格行是完整的一整行；
+- 每页的耗时 / 裁剪面积累计到 stats，供 Page1 按文档报告加速效果。
+"""
+import re
+import time
+
+from core.table_index import VOLTAGE_1_10_PATTERN, VOLTAGE_UNITS
+
+# 1-10kV 行的写法（含「1-10千」）+ 电压单位（千伏 / kV）+ 分时表头 + 非分时列头 —— 只要出现其中之一，
+# 这一块就可能是我们要的表。不单独认「千」：说明文字里到处是「元/千瓦时」，单个「千」会让这些页都进抽表
+CANDIDATE_PATTERN = re.compile(VOLTAGE_1_10_PATTERN + "|" + VOLTAGE_UNITS + "|尖|峰|平|谷|深|非分时")
+
+EDGE_TOLERANCE = 1.0   # 候选字离表格线在这个距离内，视为压在线上
+CROP_PADDING = 1.0     # 裁剪框再向外留一点，保证边界上的表格线本身被包含
+
+
+def new_stats():
+    return {
+        "pages_total": 0,
+        "pages_scanned": 0,
+        "area_total": 0.0,
+        "area_scanned": 0.0,
+        "prefilter_ms": 0.0,
+        "extract_ms": 0.0,
+    }
+
+
+def candidate_bbox(page):
+    """
+    返回页面上需要抽表的区域 (x0, top, x1, bottom)；整页都没有候选字时返回 None。
+    区域取全页宽度（含画出页面的部分），纵向覆盖所有候选字，并向外扩到最近的横线。
+    """
+    chars = page.chars
+    texts = []
+    owner = []          # 文本位置 → 字符下标（个别字符的 text 不止一个字）
+    for i, c in enumerate(chars):
+        texts.append(c["text"])
+        owner.extend([i] * len(c["text"]))
+    text = "".join(texts)
+
+    top = bottom = None
+    for m in CANDIDATE_PATTERN.finditer(text):
+        for i in {owner[k] for k in range(m.start(), m.end())}:
+            c = chars[i]
+            top = c["top"] if top is None else min(top, c["top"])
+            bottom = c["bottom"] if bottom is None else max(bottom, c["bottom"])
+
+    if top is None:
+        return None
+
+    x0, page_top, x1, page_bottom = page.bbox
+    # 横向不裁：取整页宽度，个别表格画出了页面边界也一并包含
+    h_edges = page.horizontal_edges
+    x0 = min([x0] + [c["x0"] for c in chars] + [e["x0"] for e in h_edges])
+    x1 = max([x1] + [c["x1"] for c in chars] + [e["x1"] for e in h_edges])
+
+    ys = sorted({e["top"] for e in h_edges})
+    above = [y for y in ys if y <= top + EDGE_TOLERANCE]
+    below = [y for y in ys if y >= bottom - EDGE_TOLERANCE]
+
+    top = above[-1] if above else page_top
+    bottom = below[0] if below else page_bottom
+    return (
+        x0,
+        max(page_top, top - CROP_PADDING),
+        x1,
+        min(page_bottom, bottom + CROP_PADDING),
+    )
+
+
+def _area(bbox):
+    return max(0.0, bbox[2] - bbox[0]) * max(0.0, bbox[3] - bbox[1])
+
+
+def iter_table_regions(pages, prefilter=True, stats=None):
+    """
+    逐页产出需要跑 extract_tables 的对象：整页，或裁剪后的 CroppedPage。
+    prefilter=False 时原样产出每一页（等同于以前的全量抽表）。
+    """
+    for page in pages:
+        t0 = time.perf_counter()
+        if prefilter:
+            bbox = candidate_bbox(page)
+            region = None if bbox is None else page.crop(bbox, strict=False)
+        else:
+            bbox = page.bbox
+            region = page
+
+        if stats is not None:
+            stats["pages_total"] += 1
+            stats["area_total"] += _area(page.bbox)
+            stats["prefilter_ms"] += (time.perf_counter() - t0) * 1000
+            if region is not None:
+                stats["pages_scanned"] += 1
+                stats["area_scanned"] += min(_area(bbox), _area(page.bbox))
+
+        if region is not None:
+            yield region
+
+
+def merge_stats(parts):
+    """多进程按页切分时，把各段的统计加总。"""
+    total = new_stats()
+    for part in parts:
+        if not part:
+            continue
+        for k, v in part.items():
+            total[k] = total.get(k, 0.0) + v
+    return total
+
+
+def summarize_stats(stats):
+    """给 UI 展示用的一行摘要：跳过页数、裁剪后面积占比、耗时、阶段缓存命中、加速比（若测了全量）。"""
+    out = {
+        "总页数": stats.get("pages_total", 0),
+        "抽表页数": stats.get("pages_scanned", 0),
+        "抽表面积占比": (
+            round(stats["area_scanned"] / stats["area_total"], 3) if stats.get("area_total") else None
+        ),
+        "预筛耗时(ms)": round(stats.get("prefilter_ms", 0.0), 1),
+        "抽表耗时(ms)": round(stats.get("extract_ms", 0.0), 1),
+        "缓存命中阶段": stats.get("stage_hit") or "",
+        "版式档案": stats.get("layout_profile") or "",
+        "抽表引擎": stats.get("backend") or "",
+    }
+    if stats.get("full_extract_ms"):
+        filtered = stats.get("prefilter_ms", 0.0) + stats.get("extract_ms", 0.0)
+        out["全量抽表耗时(ms)"] = round(stats["full_extract_ms"], 1)
+        out["加速比"] = round(stats["full_extract_ms"] / filtered, 2) if filtered else None
+    return out
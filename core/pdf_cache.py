@@ -0,0 +1,282 @@
+# -*- coding: utf-8 -*-
+# core/pdf_cache.py
+"""
+PDF 本地缓存（内容寻址）：
+
+    .cache/pdf/blobs/<sha 前两位>/<sha256>.pdf   —— 文件内容，按 SHA-256 命名，相同内容只存一份
+    .cache/pdf/index.sqlite                       —— URL → SHA-256 映射 + 每个 blob 的大小 / 使用时间
+
+- 同一个 URL 再次解析时直接读本地文件，不发网络请求；
+- 两个 URL 返回相同字节时只落盘一份，调用方可据 sha256 只解析一次；
+- 按「最长保存天数」+「总容量上限（LRU）」淘汰；
+- 每个 URL 记下服务器给的 ETag / Last-Modified，过了新鲜期用条件请求确认（304 就不再传输）；
+- 下载到一半断开的内容存在 .cache/pdf/partial/，下次用 Range 请求续传。
+"""
+import hashlib
+import json
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+
+from core.config import cache_dir
+
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024    # 512 MB
+DEFAULT_MAX_AGE_DAYS = 60
+
+
+def sha256_bytes(content):
+    return hashlib.sha256(content).hexdigest()
+
+
+class PdfCache:
+
+    def __init__(self, root=None, max_bytes=DEFAULT_MAX_BYTES, max_age_days=DEFAULT_MAX_AGE_DAYS):
+        self.root = root or cache_dir("pdf")
+        self.blob_dir = os.path.join(self.root, "blobs")
+        os.makedirs(self.blob_dir, exist_ok=True)
+
+        self.max_bytes = max_bytes
+        self.max_age = max_age_days * 86400 if max_age_days else None
+
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(
+            os.path.join(self.root, "index.sqlite"),
+            check_same_thread=False,
+            timeout=30,
+        )
+        self._db.executescript("""
+            CREATE TABLE IF NOT EXISTS urls (
+                url           TEXT PRIMARY KEY,
+                sha256        TEXT NOT NULL,
+                fetched_at    REAL NOT NULL,
+                etag          TEXT,
+                last_modified TEXT
+            );
+            CREATE INDEX IF NOT EXISTS idx_urls_sha ON urls(sha256);
+            CREATE TABLE IF NOT EXISTS blobs (
+                sha256     TEXT PRIMARY KEY,
+                size       INTEGER NOT NULL,
+                fetched_at REAL NOT NULL,
+                last_used  REAL NOT NULL
+            );
+        """)
+        # 旧版索引没有校验字段，补上
+        cols = {r[1] for r in self._db.execute("PRAGMA table_info(urls)")}
+        for col in ("etag", "last_modified"):
+            if col not in cols:
+                self._db.execute(f"ALTER TABLE urls ADD COLUMN {col} TEXT")
+        self._db.commit()
+
+        self.partial_dir = os.path.join(self.root, "partial")
+        os.makedirs(self.partial_dir, exist_ok=True)
+
+    # ---------------------------
+    # 路径
+    # ---------------------------
+    def blob_path(self, sha):
+        return os.path.join(self.blob_dir, sha[:2], f"{sha}.pdf")
+
+    # ---------------------------
+    # 查询
+    # ---------------------------
+    def lookup(self, url):
+        """URL 命中且文件仍在、未过期 → 返回 sha256；否则 None。"""
+        with self._lock:
+            row = self._db.execute(
+                "SELECT sha256, fetched_at FROM urls WHERE url = ?", (url,)
+            ).fetchone()
+        if row is None:
+            return None
+
+        sha, fetched_at = row
+        if self.max_age is not None and time.time() - fetched_at > self.max_age:
+            return None
+        if not os.path.exists(self.blob_path(sha)):
+            return None
+
+        self.touch(sha)
+        return sha
+
+    def validators(self, url):
+        """
+        不管是否过了新鲜期，只要 blob 还在就返回
+        {"sha256", "fetched_at", "etag", "last_modified"}，用于发条件请求；否则 None。
+        """
+        with self._lock:
+            row = self._db.execute(
+                "SELECT sha256, fetched_at, etag, last_modified FROM urls WHERE url = ?", (url,)
+            ).fetchone()
+        if row is None or not os.path.exists(self.blob_path(row[0])):
+            return None
+        return dict(zip(("sha256", "fetched_at", "etag", "last_modified"), row))
+
+    def read(self, sha):
+        with open(self.blob_path(sha), "rb") as f:
+            return f.read()
+
+    def touch(self, sha):
+        with self._lock:
+            self._db.execute("UPDATE blobs SET last_used = ? WHERE sha256 = ?", (time.time(), sha))
+            self._db.commit()
+
+    # ---------------------------
+    # 写入
+    # ---------------------------
+    def put(self, url, content, sha=None, etag=None, last_modified=None):
+        """写入一份下载结果，返回 sha256。相同内容的文件只落盘一次；sha 已算好时可以直接传进来。"""
+        sha = sha or sha256_bytes(content)
+        path = self.blob_path(sha)
+        now = time.time()
+
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            # 先写临时文件再原子替换，多个会话同时写同一份内容也不会读到半截文件
+            fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".part")
+            with os.fdopen(fd, "wb") as f:
+                f.write(content)
+            os.replace(tmp, path)
+
+        with self._lock:
+            self._db.execute(
+                "INSERT INTO blobs(sha256, size, fetched_at, last_used) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT(sha256) DO UPDATE SET fetched_at = excluded.fetched_at, "
+                "last_used = excluded.last_used",
+                (sha, len(content), now, now),
+            )
+            self._db.execute(
+                "INSERT INTO urls(url, sha256, fetched_at, etag, last_modified) VALUES (?, ?, ?, ?, ?) "
+                "ON CONFLICT(url) DO UPDATE SET sha256 = excluded.sha256, fetched_at = excluded.fetched_at, "
+                "etag = excluded.etag, last_modified = excluded.last_modified",
+                (url, sha, now, etag, last_modified),
+            )
+            self._db.commit()
+
+        self.drop_partial(url)
+        self.evict(keep=sha)
+        return sha
+
+    def refresh(self, url, etag=None, last_modified=None):
+        """条件请求得到 304：内容没变，只刷新获取时间（服务器给了新的校验值就一并更新）。"""
+        now = time.time()
+        with self._lock:
+            self._db.execute(
+                "UPDATE urls SET fetched_at = ?, etag = COALESCE(?, etag), "
+                "last_modified = COALESCE(?, last_modified) WHERE url = ?",
+                (now, etag, last_modified, url),
+            )
+            self._db.execute(
+                "UPDATE blobs SET fetched_at = ?, last_used = ? "
+                "WHERE sha256 = (SELECT sha256 FROM urls WHERE url = ?)",
+                (now, now, url),
+            )
+            self._db.commit()
+
+    # ---------------------------
+    # 断点续传
+    # ---------------------------
+    def _partial_paths(self, url):
+        key = hashlib.sha1(url.encode("utf-8")).hexdigest()
+        base = os.path.join(self.partial_dir, key)
+        return base + ".part", base + ".json"
+
+    def save_partial(self, url, fileobj, etag=None, last_modified=None):
+        """
+        保存下载了一半的内容（fileobj 从头读到尾）。
+        只有服务器给了 ETag / Last-Modified 才值得保存：续传时要用 If-Range 确认文件没换过。
+        """
+        if not (etag or last_modified):
+            return 0
+        part, meta = self._partial_paths(url)
+        fileobj.seek(0)
+        size = 0
+        with open(part, "wb") as f:
+            while True:
+                chunk = fileobj.read(1024 * 1024)
+                if not chunk:
+                    break
+                f.write(chunk)
+                size += len(chunk)
+        with open(meta, "w", encoding="utf-8") as f:
+            json.dump({"url": url, "etag": etag, "last_modified": last_modified, "size": size}, f)
+        return size
+
+    def load_partial(self, url):
+        """返回 (partial 文件路径, {"etag", "last_modified", "size"})；没有可续传的内容时返回 None。"""
+        part, meta = self._partial_paths(url)
+        try:
+            with open(meta, "r", encoding="utf-8") as f:
+                info = json.load(f)
+            if os.path.getsize(part) != info["size"] or not info["size"]:
+                raise ValueError("partial 文件大小不符")
+        except (FileNotFoundError, ValueError, KeyError, json.JSONDecodeError):
+            self.drop_partial(url)
+            return None
+        return part, info
+
+    def drop_partial(self, url):
+        for path in self._partial_paths(url):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+    # ---------------------------
+    # 淘汰
+    # ---------------------------
+    def evict(self, keep=None):
+        """
+        先删过期的，再按 last_used 从旧到新删，直到总大小不超过 max_bytes。
+        keep 为刚写入的 sha256：它本身比 max_bytes 还大时也不删（调用方马上要用），只删别的。
+        """
+        now = time.time()
+        doomed = []
+
+        with self._lock:
+            if self.max_age is not None:
+                doomed += [r[0] for r in self._db.execute(
+                    "SELECT sha256 FROM blobs WHERE fetched_at < ?", (now - self.max_age,)
+                )]
+
+            if self.max_bytes:
+                rows = self._db.execute(
+                    "SELECT sha256, size FROM blobs ORDER BY last_used DESC"
+                ).fetchall()
+                total = 0
+                for sha, size in rows:
+                    total += size
+                    if total > self.max_bytes and sha != keep and sha not in doomed:
+                        doomed.append(sha)
+
+            for sha in doomed:
+                self._db.execute("DELETE FROM blobs WHERE sha256 = ?", (sha,))
+                self._db.execute("DELETE FROM urls WHERE sha256 = ?", (sha,))
+            if doomed:
+                self._db.commit()
+
+        for sha in doomed:
+            try:
+                os.remove(self.blob_path(sha))
+            except FileNotFoundError:
+                pass
+        return len(doomed)
+
+    def stats(self):
+        with self._lock:
+            n, size = self._db.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM blobs").fetchone()
+            n_urls = self._db.execute("SELECT COUNT(*) FROM urls").fetchone()[0]
+        return {"blobs": n, "bytes": size, "urls": n_urls}
+
+
+_default_cache = None
+_default_lock = threading.Lock()
+
+
+def get_pdf_cache():
+    """进程内共享一个 PdfCache（Streamlit 多个会话共用同一份索引连接）。"""
+    global _default_cache
+    with _default_lock:
+        if _default_cache is None:
+            _default_cache = PdfCache()
+        return _default_cache
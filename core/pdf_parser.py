@@ -0,0 +1,982 @@
+# -*- coding: utf-8 -*-
+# core/pdf_parser.py
+"""
+国网 95598 代理购电价格 PDF 解析：PDF → 1-10（20）千伏 单一制 / 两部制 电价行。
+
+由 Page1 的页面脚本中拆出，便于多进程 / 命令行复用。
+"""
+import hashlib
+import multiprocessing
+import os
+import re
+import threading
+import time
+from concurrent.futures import Future, ProcessPoolExecutor
+from io import BytesIO
+from multiprocessing.shared_memory import SharedMemory
+
+import pandas as pd
+import pdfplumber
+
+from core.extract_backends import AUTO, DEFAULT_BACKEND, get_backend, load_province_backends, resolve_backend
+from core.page_filter import iter_table_regions, merge_stats, new_stats
+from core.price_matrix import (
+    PRICE_FIELDS,
+    VOLTAGE_1_10_LABEL,
+    new_matrix,
+    normalize_voltage,
+    scheme_name,
+    set_price,
+)
+from core.table_index import (
+    TableIndex,
+    as_index,
+    PERIOD_COLUMN_KWS,
+    PEAK_OVERRIDE_KWS,
+    NON_TIME_KWS,
+    HEADER_KW_TO_PERIOD,
+)
+
+DEFAULT_PREFILTER = True   # 默认先用文字层预筛页面 / 区域，再抽表
+
+# 各解析阶段的代码版本（见 core/stage_cache.py）。改了哪一步的逻辑就把哪一步 +1，
+# 该阶段及下游的缓存自动失效，上游（尤其是最慢的 raw 抽表）继续命中。
+STAGE_VERSIONS = {
+    "raw": 3,      # extract_table_rows / 页面预筛 / 省份识别 / 抽表引擎（引擎名在缓存 variant 里区分）
+    "frame": 1,    # rows_to_frame
+    "layout": 1,   # detect_columns / 表头顺序 / 1-10kV 行 + 浙江、江苏行顺序
+    "rows": 3,     # build_price_rows：取价、浙江政府性基金列修正、输出格式；attrs 里的全电压矩阵
+}
+
+
+def open_pdf(source):
+    """
+    统一打开入口：source 可以是文件路径、bytes / bytearray，或 BytesIO 等文件对象。
+    传 bytes 时全程在内存里解析，不落盘。
+    """
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        source = BytesIO(source)
+    return pdfplumber.open(source)
+
+
+def first_page_text(pdf):
+    return pdf.pages[0].extract_text() or ""
+
+
+def detect_province_from_pdf(pdf_path):
+    with open_pdf(pdf_path) as pdf:
+        text = first_page_text(pdf)
+    return detect_province_from_text(text)
+
+
+def detect_province_from_text(text):
+    """根据第 1 页文字里的「国网XX电力（有限）公司」识别省份。"""
+    # 去掉所有空白，避免“电力\n公司”这种被断行的情况
+    text_clean = re.sub(r"\s+", "", text)
+
+    start = text_clean.find("国网")
+    if start != -1:
+        end = text_clean.find("电力有限公司", start)
+        if end == -1:
+            end = text_clean.find("电力公司", start)
+        if end != -1:
+            company = text_clean[start + len("国网") : end]
+            province = company.strip()
+        else:
+            province = "未知省份"
+    else:
+        province = "未知省份"
+
+    # 小修正：重庆 → 重庆市
+    if province == "重庆":
+        province = "重庆市"
+    if province == "未知省份":
+        province = "上海市"
+    return province
+
+# ==========================
+# 基础小函数
+# ==========================
+def safe_float(x):
+    try:
+        return float(str(x).replace(",", ""))
+    except Exception:
+        return None
+
+def detect_columns(table):
+    """
+    返回：
+        period_cols: {'尖': col_idx, '峰': col_idx, ...} （只包含存在的档位）
+        non_time_col: 非分时电度电价所在列号（找不到则为 None）
+    table 可以是 TableIndex，也可以是 DataFrame（临时建索引）。
+    """
+    index = as_index(table)
+    return index.memo("columns", _detect_columns)
+
+
+def _detect_columns(index):
+    period_cols = {}
+    non_time_col = None
+
+    # ⚠ 不要再提前 break，整张表都扫一遍，后面的行可以覆盖前面的误判
+    #    没有任何关键字命中的单元格不影响结果，索引里只记录了有命中的单元格
+    for label in index.labels:
+        for col_idx, kws in index.cell_kws[label]:
+
+            # 1）非分时电价列
+            if any(kw in kws for kw in NON_TIME_KWS):
+                non_time_col = col_idx
+
+            # 2）分时档位列
+            # 🔹 先专门处理“尖峰时段 / 尖峰” —— 强制认为只有“尖”
+            if any(w in kws for w in PEAK_OVERRIDE_KWS):
+                matched_shorts = ["尖"]
+            else:
+                matched_shorts = []
+                for short, short_kws in PERIOD_COLUMN_KWS.items():
+                    if any(kw in kws for kw in short_kws):
+                        matched_shorts.append(short)
+
+            # 只在“只命中一个档位”的单元格里认列号
+            if len(matched_shorts) == 1:
+                short = matched_shorts[0]
+                period_cols[short] = col_idx
+    return period_cols, non_time_col
+
+
+# ---------- 修复四川：更稳健地识别表头 ----------
+def get_header_time_labels(table):
+    """
+    在整张表里扫描，找到包含分时档关键字的一行，用这行判断分时档位的顺序，
+    映射为 ['尖','峰','平','谷','深'] 中的一部分。
+    优先选择「包含尖峰」的行，若没有再退而求其次。
+    """
+    index = as_index(table)
+    return list(index.memo("header_labels", _get_header_time_labels))
+
+
+def _get_header_time_labels(index):
+    def periods_in(label):
+        return {HEADER_KW_TO_PERIOD[kw] for kw in index.row_kw_pos[label] if kw in HEADER_KW_TO_PERIOD}
+
+    # ---------- 第 1 轮：优先找包含“尖峰”的表头行 ----------
+    header = None
+    for label in index.labels:
+        if "尖峰" in index.row_kw_pos[label] and len(periods_in(label)) >= 2:
+            header = label
+            break
+
+    # ---------- 第 2 轮：如果没有尖峰，再退而求其次 ----------
+    if header is None:
+        # 再找任意包含两个以上时段关键字的行
+        for label in index.labels:
+            if len(periods_in(label)) >= 2:
+                header = label
+                break
+
+    if header is None:
+        # 没识别到，说明这个省可能完全没有分时电价
+        return []
+
+    # 每个关键字在表头行里首次出现的位置（等价于 header_text.find(raw)）
+    kw_pos = index.row_kw_pos[header]
+    positions = []
+    for raw, short in HEADER_KW_TO_PERIOD.items():
+        if raw in kw_pos:
+            positions.append((kw_pos[raw], short))
+
+    positions.sort(key=lambda x: x[0])
+
+    ordered = []
+    for _, short in positions:
+        if short not in ordered:
+            ordered.append(short)
+
+    return ordered
+
+def get_time_cluster_from_row(row):
+    values = list(row)
+    cluster_rev = []
+    started = False
+    count = 0
+
+    # 从右向左，最多抓 5 个“像电价的数字”
+    for cell in reversed(values):
+        v = safe_float(cell)
+        if v is not None and 0.05 <= v <= 10:
+            if not started:
+                started = True
+            if count < 5:
+                cluster_rev.append(v)
+                count += 1
+            else:
+                break
+        else:
+            if started:
+                break
+            else:
+                continue
+
+    return list(reversed(cluster_rev))
+
+def map_cluster_to_periods(cluster, period_order):
+    """
+    将分时电价簇（cluster）右对齐映射到 period_order 里。
+    返回：{'尖':None,'峰':x,'平':y,'谷':z,'深':None}
+    """
+    result = {p: None for p in ["尖", "峰", "平", "谷", "深"]}
+    if not period_order or not cluster:
+        return result
+
+    n = len(period_order)
+    m = len(cluster)
+
+    if m == n:
+        # 1 对 1 对齐
+        for i, p in enumerate(period_order):
+            result[p] = cluster[i]
+    else:
+        # 默认右对齐（缺尖时），兼容福建这类情况
+        offset = n - m
+        for i, p in enumerate(period_order):
+            j = i - offset
+            if 0 <= j < m:
+                result[p] = cluster[j]
+
+    return result
+
+
+def extract_row_prices(row, period_order):
+    """
+    从一行中抽取：非分时电价 + 分时电价（按 period_order 映射）
+    """
+    # 非分时电价 = 这一行第一个 0.1~2 之间的数
+    non_time = None
+    for cell in row:
+        v = safe_float(cell)
+        if v is not None and 0.1 <= v <= 2:
+            non_time = v
+            break
+
+    cluster = get_time_cluster_from_row(row)
+    period_vals = map_cluster_to_periods(cluster, period_order)
+
+    result = {"non_time": non_time}
+    result.update(period_vals)
+    return result
+
+# ---------- 修复上海：更通用的电压匹配 ----------
+def find_voltage_rows_1_10kv(table):
+    """
+    在整张表中找到“1-10（20）千伏 / 1-10千伏 / 10千伏”等行。
+    优先匹配 1-10（20）千伏，如果没有，再匹配 10千伏。
+    """
+    index = as_index(table)
+
+    # 1) 先找 1-10（20）千伏 / 1-10千伏 / 1~10千伏
+    if index.rows_1_10kv:
+        return list(index.rows_1_10kv)
+
+    # 2) 如果完全没有 1-10 这种写法，退化为找 “10千伏”
+    return list(index.rows_10kv)
+
+
+def extract_row_prices_fallback(row, period_order):
+    # 非分时电价：这一行第一个 0.1~2 的数字
+    non_time = None
+    for cell in row:
+        v = safe_float(cell)
+        if v is not None and 0.1 <= v <= 2:
+            non_time = v
+            break
+
+    cluster = get_time_cluster_from_row(row)
+    period_vals = map_cluster_to_periods(cluster, period_order)
+
+    result = {"non_time": non_time}
+    result.update(period_vals)
+    return result
+
+# ==========================
+# 解析单个 PDF → 返回该省的 1-10kV 结果
+# ==========================
+def extract_table_rows(pdf_path, page_range=None, prefilter=DEFAULT_PREFILTER, stats=None,
+                       backend=DEFAULT_BACKEND):
+    """
+    PDF → 表格行列表（只保留非空行）。
+    page_range=(start, stop) 时只处理这几页（左闭右开），供多进程按页切分使用。
+    """
+    with open_pdf(pdf_path) as pdf:
+        pages = pdf.pages if page_range is None else pdf.pages[page_range[0]:page_range[1]]
+        return rows_from_pages(pages, prefilter=prefilter, stats=stats, backend=backend)
+
+
+def rows_from_pages(pages, prefilter=DEFAULT_PREFILTER, stats=None, backend=DEFAULT_BACKEND):
+    """
+    prefilter=True 时先用文字层预筛：没有「千伏 / 分时表头」的页面整页跳过，
+    其余页面只在裁剪出来的候选区域里抽表（见 core/page_filter.py）。
+    backend 为抽表引擎名（见 core/extract_backends.py）。
+    """
+    extract_tables = get_backend(backend)
+    rows = []
+    for region in iter_table_regions(pages, prefilter=prefilter, stats=stats):
+        t0 = time.perf_counter()
+        tables = extract_tables(region)
+        if stats is not None:
+            stats["extract_ms"] += (time.perf_counter() - t0) * 1000
+
+        for table in tables:
+            for row in table:
+                clean = [c.strip() if isinstance(c, str) else c for c in row]
+                if any(clean):
+                    rows.append(clean)
+    return rows
+
+
+def measure_full_extract_ms(source, page_range=None):
+    """重新打开文档、不做预筛完整抽一遍表，只计时（用于报告预筛的加速比）。"""
+    if hasattr(source, "seek"):
+        source.seek(0)
+    t0 = time.perf_counter()
+    extract_table_rows(source, page_range, prefilter=False)
+    return (time.perf_counter() - t0) * 1000
+
+
+def rows_to_frame(rows):
+    """表格行 → 清洗后的 DataFrame（去掉全空的行 / 列）。"""
+    df = pd.DataFrame(rows)
+    df.replace("", None, inplace=True)
+    df.dropna(how="all", axis=1, inplace=True)
+    df.dropna(how="all", axis=0, inplace=True)
+    df.reset_index(drop=True, inplace=True)
+    return df
+
+
+def parse_single_pdf(pdf_path, prefilter=DEFAULT_PREFILTER, measure_full=False, backend=AUTO):
+    """
+    解析一个 PDF。pdf_path 也可以直接传 bytes / BytesIO（见 parse_pdf_bytes）。
+    整个文档只打开一次：第 1 页抽完文字识别省份后，同一个 page 对象继续用来抽表格。
+    backend="auto" 时按识别出的省份选抽表引擎。
+
+    返回的 DataFrame 的 attrs["parse_stats"] 里记录了预筛 / 抽表耗时；
+    measure_full=True 时再完整抽一遍表做对比，额外记录 full_extract_ms。
+    """
+    stats = new_stats()
+    raw = extract_raw(pdf_path, prefilter=prefilter, stats=stats, backend=backend)
+    if measure_full:
+        stats["full_extract_ms"] = measure_full_extract_ms(pdf_path)
+
+    df = parse_table_rows(raw["rows"], raw["province"])
+    df.attrs["parse_stats"] = stats
+    return df
+
+
+def extract_raw(source, page_range=None, prefilter=DEFAULT_PREFILTER, stats=None, backend=AUTO):
+    """
+    raw 阶段：打开一次文档，返回 {"province": 省份或 None, "rows": 表格行}。
+    只有包含第 1 页时才识别省份；backend="auto" 时按省份选引擎（识别不到省份用默认引擎）。
+    """
+    province = None
+    with open_pdf(source) as pdf:
+        pages = pdf.pages if page_range is None else pdf.pages[page_range[0]:page_range[1]]
+        if page_range is None or page_range[0] == 0:
+            province = detect_province_from_text(first_page_text(pdf))
+        backend = resolve_backend(backend, province)
+        rows = rows_from_pages(pages, prefilter=prefilter, stats=stats, backend=backend)
+    return {"province": province, "rows": rows}
+
+
+def parse_pdf_bytes(data, prefilter=DEFAULT_PREFILTER, measure_full=False, backend=AUTO):
+    """内存解析入口：data 为 bytes 或 BytesIO，不读写任何文件。"""
+    return parse_single_pdf(data, prefilter=prefilter, measure_full=measure_full, backend=backend)
+
+
+def parse_table_rows(rows, province):
+    """已抽取的表格行 → 该省的 1-10kV 结果（纯 CPU，不再碰 PDF）。"""
+    df, _ = replay_stages({"province": province, "rows": rows})
+    return df
+
+
+def raw_variant(prefilter, backend=DEFAULT_BACKEND):
+    """raw 阶段的结果取决于是否预筛和抽表引擎，各种抽法分开缓存（默认引擎沿用原来的缓存目录）。"""
+    variant = "pf" if prefilter else "full"
+    return variant if backend == DEFAULT_BACKEND else f"{variant}-{backend}"
+
+
+def replay_stages(raw, sha=None, cache=None, variant="", profiles=None, stats=None):
+    """
+    从 raw 阶段的结果往下跑 frame → layout → rows。
+    传了 cache + sha 时逐级查缓存、算完回写；返回 (DataFrame, 命中缓存的最深阶段或 None)。
+    传了 profiles（core/layout_profiles.py）时，layout 阶段先按省份 + 表头指纹套用已知版式，
+    校验不过再完整识别；结果来源记在 stats["layout_profile"]。
+    命中版式只跳过 detect_layout，全电压矩阵照样整表建索引扫一遍（见 layout_profiles 的说明）。
+    """
+    use_cache = cache is not None and bool(sha)
+    if use_cache:
+        df = cache.get(sha, "rows", variant)
+        if df is not None:
+            return df, "rows"
+
+    province = raw["province"]
+    hit = None
+
+    # 1. PDF → DataFrame
+    if not raw["rows"]:
+        print(f"[{province}] 没有解析到任何表格。")
+        df = pd.DataFrame()
+    else:
+        frame = cache.get(sha, "frame", variant) if use_cache else None
+        if frame is None:
+            frame = rows_to_frame(raw["rows"])
+            if use_cache:
+                cache.put(sha, "frame", frame, variant)
+        else:
+            hit = "frame"
+
+        index = None
+
+        def table_index():
+            # 整张表只扫描一次，后面的识别（含全电压矩阵）都读索引
+            nonlocal index
+            if index is None:
+                index = TableIndex(frame)
+            return index
+
+        cached_layout = cache.get(sha, "layout", variant) if use_cache else None
+        if cached_layout is None:
+            detect = lambda: detect_layout(table_index(), province)
+            if profiles is not None:
+                layout, source = profiles.resolve(frame, province, detect)
+                if source == "命中":
+                    print(f"[{province}] 命中版式档案：", layout["period_cols"], " 非分时列 =", layout["non_time_col"])
+                if stats is not None:
+                    stats["layout_profile"] = source
+            else:
+                layout = detect()
+            if use_cache:
+                cache.put(sha, "layout", {"layout": layout}, variant)
+        else:
+            layout = cached_layout["layout"]
+            hit = "layout"
+
+        df = pd.DataFrame() if layout is None else build_price_rows(frame, province, layout)
+        df.attrs["price_matrix"] = build_price_matrix(table_index(), province, layout, df)
+
+    if use_cache:
+        cache.put(sha, "rows", df, variant)
+    return df, hit
+
+
+def detect_layout(index, province):
+    """
+    识别表格布局：分时档位列、非分时列、要取的 1-10kV 行（已按省份规则选好顺序）。
+    找不到 1-10kV 行时返回 None。返回值只含基本类型，可直接缓存。
+    """
+    # 2. 识别分时档顺序
+    period_cols, non_time_col = detect_columns(index)
+    print(f"[{province}] 检测到列：", period_cols, " 非分时列 =", non_time_col)
+
+    row_indices = find_voltage_rows_1_10kv(index)
+
+    if not row_indices:
+        print(f"[{province}] 未找到 1-10（20）千伏 / 10千伏 行，跳过。")
+        return None
+
+    return dict(column_layout(index), row_indices=order_scheme_rows(row_indices, province))
+
+
+def order_scheme_rows(row_indices, province):
+    """
+    同一电压等级的各行（表内顺序）→ 按省份规则排好的 [单一制行, 两部制行]。
+    浙江、江苏的表里行的顺序和别的省不一样；1-10kV 行和全电压矩阵的其他电压行共用这套规则。
+    """
+    if "浙江" in province:
+        # 浙江取第 2、3 条
+        if len(row_indices) >= 3:
+            row_indices = row_indices[1:3]
+            row_indices = [row_indices[1], row_indices[0]]
+        else:
+            row_indices = row_indices[:2]
+            row_indices = [row_indices[1], row_indices[0]]
+
+    elif "江苏" in province:
+        # 江苏 PDF 里是 先两部制 后单一制，需要反过来
+        row_indices = row_indices[:2]
+        if len(row_indices) == 2:
+            row_indices = [row_indices[1], row_indices[0]]
+
+    else:
+        # 其他省份：默认取前两条（单一制 + 两部制）
+        row_indices = row_indices[:2]
+
+    return row_indices
+
+
+def column_layout(index):
+    """只含列信息的布局（分时列 / 非分时列 / 兜底用的表头顺序），任意一行都能按它取价。"""
+    period_cols, non_time_col = detect_columns(index)
+    return {
+        "period_cols": period_cols,
+        "non_time_col": non_time_col,
+        # 没认出分时列时，按表头顺序 + 数字簇右对齐兜底
+        "period_order": get_header_time_labels(index) if not period_cols else None,
+    }
+
+
+def province_city(province):
+    return province if province == "重庆市" else ""   # 目前国网表里没有城市这一层，就先留空
+
+
+def build_price_rows(df, province, layout):
+    """按识别好的布局从表格里取价，套用省份修正，输出最终电价行。"""
+    city = province_city(province)
+    voltage_label = VOLTAGE_1_10_LABEL  # 只是最终输出的展示文字
+    rows_out = []
+
+    for pos, idx in enumerate(layout["row_indices"]):
+        price_info = row_price_info(df.iloc[idx], province, layout)
+
+        # 6. 行标签：单一制 / 两部制 / 方案3...
+        scheme = scheme_name(pos)
+
+        rows_out.append(
+            {
+                "省份": province,
+                "城市": city,
+                "制度": scheme,
+                "电压等级": voltage_label,
+                "不分时电价": price_info["non_time"],
+                "尖": price_info["尖"],
+                "峰": price_info["峰"],
+                "平": price_info["平"],
+                "谷": price_info["谷"],
+                "深": price_info["深"],
+            }
+        )
+
+    return pd.DataFrame(rows_out)
+
+
+def row_price_info(row, province, layout):
+    """按布局从一行里取 不分时 + 各分时档价格（含浙江政府性基金列修正）。"""
+    period_cols = layout["period_cols"]
+    non_time_col = layout["non_time_col"]
+
+    # 5. 读取价格（你原来的逻辑）
+    if period_cols:
+        price_info = {"non_time": None, "尖": None, "峰": None, "平": None, "谷": None, "深": None}
+
+        # 非分时电价
+        if non_time_col is not None and non_time_col < len(row):
+            price_info["non_time"] = safe_float(row[non_time_col])
+        # 兜底再扫一遍
+        if price_info["non_time"] is None:
+            for cell in row:
+                v = safe_float(cell)
+                if v is not None and 0.1 <= v <= 2:
+                    price_info["non_time"] = v
+                    break
+
+        # 各分时段
+        for p, col_idx in period_cols.items():
+            if col_idx < len(row):
+                price_info[p] = safe_float(row[col_idx])
+
+    else:
+        price_info = extract_row_prices_fallback(row, layout["period_order"])
+
+    # ------------------------------------------------------------------
+    # 【新增】浙江省专用修正：去掉“政府性基金”那一列，只保留 尖/峰/平/谷
+    # ------------------------------------------------------------------
+    if "浙江" in province:
+        cluster = get_time_cluster_from_row(row)  # 例如 [0.0292, 1.3162, 1.0969, 0.6648, 0.2526]
+
+        # 如果前面有一个很小的数（通常是政府性基金），把它丢掉，只保留后 4 个
+        while len(cluster) > 4 and cluster[0] is not None and cluster[0] < 0.1:
+            cluster = cluster[1:]
+
+        if len(cluster) == 4:
+            # 保留原来算出来的 non_time（不分时电价）
+            non_time_val = price_info.get("non_time")
+
+            price_info = {
+                "non_time": non_time_val,
+                "尖": cluster[0],
+                "峰": cluster[1],
+                "平": cluster[2],
+                "谷": cluster[3],
+                "深": None,  # 浙江没有深谷
+            }
+    # ------------------------------------------------------------------
+
+    return price_info
+
+
+def build_price_matrix(index, province, layout, rows_df):
+    """
+    全电压矩阵（见 core/price_matrix.py）：一次扫表取出所有电压等级 × 制度的价格。
+        - 1-10（20）千伏 直接用 build_price_rows 的结果（含浙江 / 江苏的行顺序规则），两边保证一致；
+        - 其他电压行按同一套列布局取价；制度取该行或上方最近一次出现的「单一制 / 两部制」字样，
+          表里没有这两个字时按该电压第几次出现、套用与 1-10kV 相同的省份行顺序规则命名（见 _occurrence_schemes）；
+        - 同一 (制度, 电压等级) 出现多次时取第一行；一个价都取不到的行（说明文字等）不要。
+    """
+    matrix = new_matrix(province, province_city(province))
+    for r in rows_df.to_dict("records"):
+        set_price(matrix, r["制度"], r["电压等级"], [_plain(r[c]) for c in PRICE_FIELDS])
+
+    cols = layout if layout is not None else column_layout(index)
+    # 已经当作 1-10kV 取过的行（上海这类表里「10千伏」就是 1-10kV 档）不再重复取
+    skip = set(layout["row_indices"] if layout is not None else ())
+    skip.update(index.rows_1_10kv or index.rows_10kv)
+    scheme = None
+    found = []      # (表里写的制度或 None, 电压等级, 价格)，按表内顺序
+    for label in index.labels:
+        scheme = index.row_scheme.get(label, scheme)
+        raw_voltage = index.row_voltage.get(label)
+        if raw_voltage is None or label in skip:
+            continue
+        voltage = normalize_voltage(raw_voltage)
+        if voltage == VOLTAGE_1_10_LABEL:
+            continue
+
+        info = row_price_info(index.df.loc[label], province, cols)
+        values = (info["non_time"], info["尖"], info["峰"], info["平"], info["谷"], info["深"])
+        if all(v is None for v in values):
+            continue
+        found.append((scheme, voltage, [_plain(v) for v in values]))
+
+    counts = {}
+    for _, voltage, _ in found:
+        counts[voltage] = counts.get(voltage, 0) + 1
+    seen = {}
+    for scheme, voltage, values in found:
+        nth = seen.get(voltage, 0)
+        seen[voltage] = nth + 1
+        set_price(matrix, scheme or _occurrence_schemes(counts[voltage], province)[nth], voltage, values, overwrite=False)
+    return matrix
+
+
+def _occurrence_schemes(n, province):
+    """
+    某电压等级在表里出现 n 次、表里又没写制度时，第 0..n-1 次出现各叫什么：
+    用 order_scheme_rows 的省份规则挑出单一制 / 两部制行；规则没挑中的行，
+    普通省份（按出现顺序命名）沿用 scheme_name，浙江 / 江苏这类换过顺序的留空，不乱起名。
+    """
+    try:
+        ordered = order_scheme_rows(list(range(n)), province)
+    except IndexError:
+        return [""] * n     # 浙江只出现一次：规则排不出（1-10kV 行同样如此），制度留空
+    names = {occ: scheme_name(pos) for pos, occ in enumerate(ordered)}
+    in_order = ordered == list(range(len(ordered)))
+    return [names.get(i, scheme_name(i) if in_order else "") for i in range(n)]
+
+
+def _plain(v):
+    """NaN / numpy 数字 → None / float，矩阵里只放基本类型。"""
+    return None if v is None or pd.isna(v) else float(v)
+
+
+# ==========================
+# 多进程解析：跨文档 + 大文档按页切分
+# ==========================
+DEFAULT_PARSE_WORKERS = os.cpu_count() or 1
+SPLIT_MIN_PAGES = 8        # 页数达到这个数的 PDF 才按页切分
+PAGES_PER_CHUNK = 4        # 每个子任务处理的页数
+
+
+def source_sha256(source):
+    """PDF 内容的 SHA-256（路径 / bytes / 文件对象都可以），作为阶段缓存的 key。"""
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        data = bytes(source)
+    elif hasattr(source, "read"):
+        source.seek(0)
+        data = source.read()
+        source.seek(0)
+    else:
+        with open(source, "rb") as f:
+            data = f.read()
+    return hashlib.sha256(data).hexdigest()
+
+
+class _SharedBytes:
+    """
+    放进共享内存的 PDF 字节。交给子进程时只 pickle 共享内存的名字和长度，
+    子进程反序列化时直接拿到 bytes（见 _read_shared）——切成多段的大文档不再每段都传一份全文。
+    主进程在这份文档的所有子任务结束后调用 release。
+    """
+
+    def __init__(self, data):
+        self._shm = SharedMemory(create=True, size=max(1, len(data)))
+        self._shm.buf[:len(data)] = data
+        self.name = self._shm.name
+        self.size = len(data)
+
+    def __reduce__(self):
+        return _read_shared, (self.name, self.size)
+
+    def release(self):
+        if self._shm is not None:
+            self._shm.close()
+            self._shm.unlink()
+            self._shm = None
+
+
+def _read_shared(name, size):
+    shm = SharedMemory(name=name)
+    try:
+        return bytes(shm.buf[:size])
+    finally:
+        shm.close()
+
+
+def _share(source):
+    """bytes / 文件对象 → _SharedBytes；文件路径原样返回（子进程自己读）。"""
+    if hasattr(source, "read"):
+        source.seek(0)
+        source = source.read()
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        return _SharedBytes(source)
+    return source
+
+
+def _release(shared):
+    if isinstance(shared, _SharedBytes):
+        shared.release()
+
+
+def _extract_document(source, prefilter=DEFAULT_PREFILTER, measure_full=False, backend=DEFAULT_BACKEND,
+                      province_backends=None, split_min_pages=0, pages_per_chunk=PAGES_PER_CHUNK):
+    """
+    子进程任务：文档只在这里打开一次，数页数、读第 1 页识别省份、选引擎、抽表都用同一个 pdf 对象。
+    province_backends 不为 None 时按识别出的省份从中选引擎（没配的省份用 backend）。
+    split_min_pages > 0 且页数达到它时只抽第一段页，其余页由主进程按返回的页数切分派发。
+    返回 (省份, 引擎, 页数, 表格行, stats)。
+    """
+    stats = new_stats()
+    with open_pdf(source) as pdf:
+        n_pages = len(pdf.pages)
+        province = detect_province_from_text(first_page_text(pdf))
+        if province_backends is not None:
+            backend = province_backends.get(province, backend)
+        page_range = (0, pages_per_chunk) if _should_split(n_pages, split_min_pages) else None
+        pages = pdf.pages if page_range is None else pdf.pages[:pages_per_chunk]
+        rows = rows_from_pages(pages, prefilter=prefilter, stats=stats, backend=backend)
+    if measure_full:
+        stats["full_extract_ms"] = measure_full_extract_ms(source, page_range)
+    return province, backend, n_pages, rows, stats
+
+
+def _extract_chunk(source, page_range, prefilter=DEFAULT_PREFILTER, measure_full=False, backend=DEFAULT_BACKEND):
+    """子进程任务：抽取大文档第一段之后的一段页（省份和引擎已由 _extract_document 定好）。"""
+    stats = new_stats()
+    rows = extract_table_rows(source, page_range, prefilter=prefilter, stats=stats, backend=backend)
+    if measure_full:
+        stats["full_extract_ms"] = measure_full_extract_ms(source, page_range)
+    return None, rows, stats
+
+
+def _should_split(n_pages, split_min_pages):
+    return bool(split_min_pages) and n_pages >= split_min_pages
+
+
+def _page_chunks(n_pages, per_chunk):
+    return [(i, min(i + per_chunk, n_pages)) for i in range(0, n_pages, per_chunk)]
+
+
+class ParsePool:
+    """
+    用进程池并行解析 PDF，结果与 parse_single_pdf 串行解析完全一致。
+
+    - 每个文档一个任务：子进程打开一次文档，数页数、识别省份、选引擎后直接抽表；
+      页数 ≥ split_min_pages 的大文档这个任务只抽第一段，其余页按 pages_per_chunk 切段并行抽取，
+      再按页序拼回表格行，最后在主进程里跑（很快的）启发式规则。主进程自己从不打开 PDF；
+    - workers <= 1 时不起进程，直接串行，方便调试；
+    - submit 既可传文件路径，也可传 PDF 的 bytes（放进共享内存，子进程在内存里解析，不落盘）；
+    - 传了 stage_cache 时按阶段查缓存：最终结果命中直接返回，raw 命中则跳过 pdfplumber 只重放规则；
+    - 传了 profiles 时布局识别先套各省的版式档案（见 core/layout_profiles.py）；
+    - backend 选抽表引擎，"auto" 按各省配置（见 core/extract_backends.py）；
+      有省份配了非默认引擎时，查缓存前不知道省份，逐个引擎查 raw 缓存，用里面记的省份确认引擎对得上。
+
+    用法：
+        with ParsePool(workers=4, stage_cache=get_stage_cache()) as pool:
+            fut = pool.submit(pdf_bytes, sha=sha256)   # 返回 concurrent.futures.Future[DataFrame]
+            df = fut.result()
+    """
+
+    def __init__(self, workers=DEFAULT_PARSE_WORKERS, split_min_pages=SPLIT_MIN_PAGES,
+                 pages_per_chunk=PAGES_PER_CHUNK, prefilter=DEFAULT_PREFILTER, measure_full=False,
+                 stage_cache=None, profiles=None, backend=AUTO):
+        self.workers = max(1, int(workers))
+        self.prefilter = prefilter
+        self.measure_full = measure_full
+        self.stage_cache = stage_cache
+        self.profiles = profiles
+        self.backend = backend
+        self._province_backends = None
+        if backend == AUTO:
+            # 一批任务内按同一份配置选引擎
+            self._province_backends = {
+                k: v for k, v in load_province_backends().items() if v != DEFAULT_BACKEND
+            }
+        else:
+            get_backend(backend)
+        self.split_min_pages = split_min_pages
+        self.pages_per_chunk = max(1, int(pages_per_chunk))
+        self._executor = None
+        if self.workers > 1:
+            # spawn：Streamlit 进程里有多个线程，fork 不安全
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+
+    def backend_for_province(self, province):
+        """该省用哪个抽表引擎（已解析好的引擎名，不会是 "auto"）。"""
+        if self._province_backends is None:
+            return self.backend
+        return self._province_backends.get(province, DEFAULT_BACKEND)
+
+    def _backend_args(self):
+        """传给 _extract_document 的 (backend, province_backends)。"""
+        if self._province_backends is None:
+            return self.backend, None
+        return DEFAULT_BACKEND, self._province_backends
+
+    def _finish(self, result, raw, sha, stats, backend):
+        """raw 到手后（抽出来的或缓存里的）跑后续阶段，写回缓存。"""
+        variant = raw_variant(self.prefilter, backend)
+        df, hit = replay_stages(raw, sha, self.stage_cache, variant, profiles=self.profiles, stats=stats)
+        stats["stage_hit"] = hit or stats.get("stage_hit")
+        stats["backend"] = backend
+        df.attrs["parse_stats"] = stats
+        result.set_result(df)
+
+    def _from_cache(self, result, sha):
+        """按阶段查缓存，命中时填好 result 并返回 True。"""
+        backends = [self.backend] if self._province_backends is None else list(
+            dict.fromkeys([DEFAULT_BACKEND, *self._province_backends.values()])
+        )
+        for backend in backends:
+            variant = raw_variant(self.prefilter, backend)
+            raw = None
+            if len(backends) > 1:
+                # 不知道省份：raw 里记着省份，确认该省确实用这个引擎，才用这份缓存
+                raw = self.stage_cache.get(sha, "raw", variant)
+                if raw is None or self.backend_for_province(raw["province"]) != backend:
+                    continue
+
+            cached = self.stage_cache.get(sha, "rows", variant)
+            if cached is not None:
+                cached.attrs["parse_stats"] = dict(new_stats(), stage_hit="rows", backend=backend)
+                result.set_result(cached)
+                return True
+
+            if raw is None:
+                raw = self.stage_cache.get(sha, "raw", variant)
+            if raw is not None:
+                self._finish(result, raw, sha, dict(new_stats(), stage_hit="raw"), backend)
+                return True
+        return False
+
+    def submit(self, source, sha=None):
+        result = Future()
+
+        try:
+            if self.stage_cache is not None:
+                sha = sha or source_sha256(source)
+                if self._from_cache(result, sha):
+                    return result
+
+            if self._executor is None:
+                province, backend, _, rows, stats = _extract_document(
+                    source, self.prefilter, self.measure_full, *self._backend_args()
+                )
+                self._done(result, sha, backend, [(province, rows, stats)])
+                return result
+
+            shared = _share(source)
+            try:
+                first = self._executor.submit(
+                    _extract_document, shared, self.prefilter, self.measure_full,
+                    *self._backend_args(), self.split_min_pages, self.pages_per_chunk,
+                )
+            except Exception:
+                _release(shared)
+                raise
+        except Exception as e:
+            result.set_exception(e)
+            return result
+
+        def _on_first_done(fut):
+            try:
+                province, backend, n_pages, rows, stats = fut.result()
+                ranges = _page_chunks(n_pages, self.pages_per_chunk)[1:] if _should_split(n_pages, self.split_min_pages) else []
+                parts = [
+                    self._executor.submit(_extract_chunk, shared, r, self.prefilter, self.measure_full, backend)
+                    for r in ranges
+                ]
+            except Exception as e:
+                _release(shared)
+                result.set_exception(e)
+                return
+            if not parts:
+                _release(shared)
+                self._done(result, sha, backend, [(province, rows, stats)])
+                return
+
+            pending = [len(parts)]
+            lock = threading.Lock()
+
+            def _on_part_done(_):
+                with lock:
+                    pending[0] -= 1
+                    if pending[0]:
+                        return
+                _release(shared)
+                try:
+                    outs = [(province, rows, stats)] + [f.result() for f in parts]      # 按页序合并
+                except Exception as e:
+                    result.set_exception(e)
+                    return
+                self._done(result, sha, backend, outs)
+
+            for f in parts:
+                f.add_done_callback(_on_part_done)
+
+        first.add_done_callback(_on_first_done)
+        return result
+
+    def _done(self, result, sha, backend, outs):
+        """各段 (省份, 表格行, stats) 按页序拼成 raw，写缓存后跑后续阶段。"""
+        try:
+            raw = {
+                "province": outs[0][0],
+                "rows": [row for _, chunk_rows, _ in outs for row in chunk_rows],
+            }
+            if self.stage_cache is not None:
+                self.stage_cache.put(sha, "raw", raw, raw_variant(self.prefilter, backend))
+            self._finish(result, raw, sha, merge_stats(chunk_stats for _, _, chunk_stats in outs), backend)
+        except Exception as e:
+            result.set_exception(e)
+
+    def map(self, sources):
+        """按输入顺序返回 [(df, error), ...]。"""
+        futures = [self.submit(p) for p in sources]
+        out = []
+        for f in futures:
+            try:
+                out.append((f.result(), None))
+            except Exception as e:
+                out.append((None, e))
+        return out
+
+    def close(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=True, cancel_futures=True)
+            self._executor = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,268 @@
+# -*- coding: utf-8 -*-
+# core/pipeline.py
+"""
+PDF 下载 + 解析调度：URL 列表 → 电价表。
+
+    iter_parse_urls(urls)   每个文档一完成（成功 / 失败）就产出一个 DocResult（完成顺序）
+    iter_parse_sources(xs)  同上，输入可以混着 URL 和本地 PDF 路径（命令行批处理用）
+    collect(events)         把 DocResult 按输入顺序拼成 (df_final, errors)，和以前一次性解析的结果完全一致
+    parse_price_from_urls   = collect(iter_parse_urls(...))
+    ParseJob                在后台线程里跑 iter_parse_urls，页面脚本线程只负责轮询刷新进度
+
+下载在线程池里进行、解析在 ParsePool 里进行，二者都通过回调把完成事件放进同一个队列，
+慢的 PDF 不会挡住已经完成的文档。
+"""
+import queue
+import threading
+import time
+from collections import namedtuple
+
+import pandas as pd
+
+from core.extract_backends import AUTO
+from core.fetch import FetchResult, PdfDownloader, DEFAULT_WORKERS, DEFAULT_PER_HOST, FETCH_HOW_LABELS
+from core.layout_profiles import get_layout_profiles
+from core.page_filter import summarize_stats
+from core.pdf_cache import get_pdf_cache, sha256_bytes
+from core.pdf_parser import ParsePool
+from core.stage_cache import get_stage_cache
+
+# 每个文档的完成事件：
+#   idx / url      —— 输入中的位置与链接
+#   df             —— 该文档的电价行（失败时为 None）
+#   error          —— 错误信息字符串（成功时为 None）
+#   stats          —— summarize_stats 的摘要 + 下载 / 解析耗时（没走到解析时只有耗时）
+DocResult = namedtuple("DocResult", ["idx", "url", "df", "error", "stats"])
+
+
+def _elapsed_ms(t0, t1):
+    return round((t1 - t0) * 1000, 1)
+
+
+def iter_parse_urls(url_list, max_workers=DEFAULT_WORKERS, per_host=DEFAULT_PER_HOST, parse_workers=1,
+                    prefilter=True, measure_full=False, stop_event=None, backend=AUTO):
+    """
+    并发下载 + 边下边解析，按【完成顺序】逐个产出 DocResult，总数等于 len(url_list)。
+    - PDF 存在本地内容寻址缓存里，链接没变的再次解析不会发网络请求；
+    - 不同链接返回相同字节时只解析一次，结果复用；
+    - 解析结果按阶段缓存，parse_workers > 1 时交给进程池；
+    - stop_event 被 set 后不再提交新的解析，已产出的结果不受影响；
+    - backend 选抽表引擎（"auto" = 按省份配置，见 core/extract_backends.py）。
+    """
+    def fetch_all(urls):
+        with PdfDownloader(max_workers=max_workers, per_host=per_host, cache=get_pdf_cache()) as downloader:
+            yield from downloader.iter_fetch(urls)
+
+    return _iter_parse(url_list, fetch_all, parse_workers, prefilter, measure_full, stop_event, backend)
+
+
+def is_url(item):
+    return str(item).lower().startswith(("http://", "https://"))
+
+
+def iter_local_files(paths):
+    """按顺序读本地 PDF，产出与 PdfDownloader.iter_fetch 相同的 FetchResult。"""
+    for i, path in enumerate(paths):
+        try:
+            with open(path, "rb") as f:
+                content = f.read()
+            yield FetchResult(i, str(path), content, None, sha256_bytes(content), True, "local")
+        except Exception as e:
+            yield FetchResult(i, str(path), None, e, None, True, "local")
+
+
+def iter_parse_sources(items, max_workers=DEFAULT_WORKERS, per_host=DEFAULT_PER_HOST, parse_workers=1,
+                       prefilter=True, measure_full=False, stop_event=None, backend=AUTO):
+    """
+    iter_parse_urls 的通用版：items 里可以混着 URL 和本地 PDF 路径（命令行批处理用）。
+    本地文件先读（不占下载并发），URL 照常走下载缓存；DocResult.url 是原始的链接 / 路径。
+    """
+    items = [str(x) for x in items]
+
+    def fetch_all(_):
+        urls = [(i, x) for i, x in enumerate(items) if is_url(x)]
+        files = [(i, x) for i, x in enumerate(items) if not is_url(x)]
+        for res in iter_local_files([x for _, x in files]):
+            yield res._replace(idx=files[res.idx][0])
+        if urls:
+            with PdfDownloader(max_workers=max_workers, per_host=per_host, cache=get_pdf_cache()) as downloader:
+                for res in downloader.iter_fetch([x for _, x in urls]):
+                    yield res._replace(idx=urls[res.idx][0])
+
+    return _iter_parse(items, fetch_all, parse_workers, prefilter, measure_full, stop_event, backend)
+
+
+def _iter_parse(url_list, fetch_all, parse_workers, prefilter, measure_full, stop_event, backend=AUTO):
+    """fetch_all(url_list) 按完成顺序产出 FetchResult；本函数负责解析调度和事件汇总。"""
+    url_list = list(url_list)
+    if not url_list:
+        return
+
+    events = queue.Queue()
+    t_start = time.perf_counter()
+
+    def _timing(fetched_at, done_at, how=None):
+        return {
+            "获取方式": FETCH_HOW_LABELS.get(how, ""),
+            "下载耗时(ms)": _elapsed_ms(t_start, fetched_at),
+            "解析耗时(ms)": _elapsed_ms(fetched_at, done_at),
+            "完成时刻(s)": round(done_at - t_start, 2),
+        }
+
+    def _on_parsed(idx, url, fetched_at, how, fut):
+        # 回调里的异常会被 Future 吞掉；不管哪一步出错都要给这个文档放一个事件，否则主循环永远等不齐
+        stats = {}
+        try:
+            stats = _timing(fetched_at, time.perf_counter(), how)
+            df_one = fut.result()
+            if "parse_stats" in df_one.attrs:
+                stats.update(summarize_stats(df_one.attrs["parse_stats"]))
+            if df_one.empty:
+                ev = DocResult(idx, url, None, "未能识别有效电价行", stats)
+            else:
+                ev = DocResult(idx, url, df_one, None, stats)
+        except Exception as e:
+            ev = DocResult(idx, url, None, str(e) or type(e).__name__, stats)
+        events.put(ev)
+
+    def _feed(pool):
+        parsing = {}   # sha256 → Future[DataFrame]
+        try:
+            for res in fetch_all(url_list):
+                fetched_at = time.perf_counter()
+                if res.error is not None:
+                    events.put(DocResult(res.idx, res.url, None, str(res.error), _timing(fetched_at, fetched_at)))
+                    continue
+                if stop_event is not None and stop_event.is_set():
+                    events.put(DocResult(res.idx, res.url, None, "已取消", _timing(fetched_at, fetched_at)))
+                    continue
+
+                if res.sha256 not in parsing:
+                    parsing[res.sha256] = pool.submit(res.content, sha=res.sha256)   # 直接在内存里解析
+                parsing[res.sha256].add_done_callback(
+                    lambda fut, i=res.idx, u=res.url, t=fetched_at, h=res.how: _on_parsed(i, u, t, h, fut)
+                )
+        except Exception as e:
+            # 下载 / 读文件层整体出错（极少见）：给还没产出的文档一个兜底事件，保证总数不少
+            events.put(e)
+
+    with ParsePool(
+        workers=parse_workers,
+        prefilter=prefilter,
+        measure_full=measure_full,
+        stage_cache=get_stage_cache(),
+        profiles=get_layout_profiles(),
+        backend=backend,
+    ) as pool:
+        feeder = threading.Thread(target=_feed, args=(pool,), daemon=True)
+        feeder.start()
+
+        seen = set()
+        while len(seen) < len(url_list):
+            ev = events.get()
+            if isinstance(ev, Exception):
+                now = time.perf_counter()
+                for i, url in enumerate(url_list):
+                    if i not in seen:
+                        seen.add(i)
+                        yield DocResult(i, url, None, str(ev), _timing(now, now))
+                break
+            if ev.idx in seen:
+                continue
+            seen.add(ev.idx)
+            yield ev
+
+        feeder.join()
+
+
+def collect(events):
+    """
+    把 DocResult 拼成 (df_final, errors)：结果 / 错误都按输入链接顺序；每个文档的统计放在 attrs["parse_stats"]，
+    全电压矩阵按同样顺序放在 attrs["price_matrix"]（列表，用 core.price_matrix.matrix_frame 展开）。
+    """
+    results = {}
+    errors = {}
+    stats = {}
+    for ev in events:
+        stats[ev.idx] = {"URL": ev.url, **ev.stats}
+        if ev.error is not None:
+            errors[ev.idx] = (ev.url, ev.error)
+        else:
+            results[ev.idx] = ev.df
+
+    if results:
+        df_final = pd.concat([results[i] for i in sorted(results)], ignore_index=True)
+    else:
+        df_final = pd.DataFrame()
+    df_final.attrs["parse_stats"] = [stats[i] for i in sorted(stats)]
+    df_final.attrs["price_matrix"] = [
+        results[i].attrs["price_matrix"] for i in sorted(results) if "price_matrix" in results[i].attrs
+    ]
+
+    return df_final, [errors[i] for i in sorted(errors)]
+
+
+def parse_price_from_urls(url_list, **kwargs):
+    """一次性解析一批链接，返回 (df_final, errors)，参数同 iter_parse_urls。"""
+    return collect(iter_parse_urls(url_list, **kwargs))
+
+
+class ParseJob:
+    """
+    后台线程里跑一批解析，页面脚本线程轮询：
+
+        job = ParseJob(urls, parse_workers=4).start()
+        while not job.done:
+            for ev in job.drain():
+                ...            # 刷新进度条 / 结果表
+            time.sleep(0.2)
+        df_final, errors = job.result()
+    """
+
+    def __init__(self, url_list, **kwargs):
+        self.url_list = list(url_list)
+        self.kwargs = kwargs
+        self.total = len(self.url_list)
+        self.events = []                 # 已产出的全部 DocResult（完成顺序）
+        self.error = None                # 调度本身出错时的异常
+        self._queue = queue.Queue()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        try:
+            for ev in iter_parse_urls(self.url_list, stop_event=self._stop, **self.kwargs):
+                self._queue.put(ev)
+        except Exception as e:
+            self.error = e
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    @property
+    def done(self):
+        return not self._thread.is_alive() and self._queue.empty()
+
+    def drain(self, timeout=None):
+        """取出自上次调用以来新完成的文档；timeout 秒内没有新事件则返回空列表。"""
+        out = []
+        try:
+            out.append(self._queue.get(timeout=timeout) if timeout else self._queue.get_nowait())
+            while True:
+                out.append(self._queue.get_nowait())
+        except queue.Empty:
+            pass
+        self.events.extend(out)
+        return out
+
+    def cancel(self):
+        self._stop.set()
+
+    def result(self):
+        """等后台线程结束，返回 (df_final, errors)，与 parse_price_from_urls 相同。"""
+        self._thread.join()
+        self.drain()
+        if self.error is not None:
+            raise self.error
+        return collect(self.events)
@@ -0,0 +1,116 @@
+# -*- coding: utf-8 -*-
+# core/price_index.py
+"""
+站点 → 电价行的哈希索引：电价表只扫一遍建好字典，之后每个站点 O(1) 查找。
+
+以前 process_station_prices 对每个站点都做 1~3 次整表布尔筛选（省份 + 制度，广东再按城市筛、筛空了回退），
+站点数 × 电价行数。现在：
+    by_city     {(省份, 制度, 城市): 第一行的位置}
+    by_scheme   {(省份, 制度): 第一行的位置}
+匹配规则与原来一致：
+    - 广东（CITY_LEVEL_PROVINCES）先按 省份 + 制度 + 城市 精确匹配，没有再回退 省份 + 制度；
+    - 其他省只按 省份 + 制度；
+    - 同一个键有多行时取表里的第一行（等价于原来的 match.iloc[0]）。
+查找结果和命中统计（按城市 / 回退到省份 / 未匹配）都记在索引上，其他页面也可以直接复用。
+"""
+import numpy as np
+import pandas as pd
+
+from core import schema
+
+CITY_LEVEL_PROVINCES = ("广东",)    # 这些省的电价按城市区分
+
+HIT_CITY = "按城市命中"
+HIT_SCHEME = "按省份+制度命中"
+MISS = "未匹配"
+
+
+def _valid(*values):
+    return all(not (v is None or (not isinstance(v, str) and pd.isna(v))) for v in values)
+
+
+def is_city_level(province):
+    return any(p in str(province) for p in CITY_LEVEL_PROVINCES)
+
+
+class PriceIndex:
+    """
+    对一张电价表（最好是 schema.compact 过的）建索引。
+
+    属性：
+        df          原电价表
+        by_city     {(省份, 制度, 城市): 行位置}（电价表没有「城市」列时为空）
+        by_scheme   {(省份, 制度): 行位置}
+        stats       {按城市命中 / 按省份+制度命中 / 未匹配: 次数}
+    """
+
+    def __init__(self, df_price):
+        self.df = df_price
+        self.by_city = {}
+        self.by_scheme = {}
+        self.stats = {HIT_CITY: 0, HIT_SCHEME: 0, MISS: 0}
+        self._rows = {}
+
+        provinces = df_price["省份"].tolist()
+        schemes = df_price["制度"].tolist()
+        cities = df_price["城市"].tolist() if "城市" in df_price.columns else None
+
+        for pos, (prov, scheme) in enumerate(zip(provinces, schemes)):
+            if not _valid(prov, scheme):
+                continue    # 空值和任何值都不相等（与原来的 == 筛选一致）
+            self.by_scheme.setdefault((prov, scheme), pos)
+            if cities is not None and _valid(cities[pos]):
+                self.by_city.setdefault((prov, scheme, cities[pos]), pos)
+
+    def _resolve(self, province, scheme, city):
+        """→ (行位置或 None, 命中类型)，不计统计。"""
+        if is_city_level(province):
+            pos = self.by_city.get((province, scheme, str(city).strip()))
+            if pos is not None:
+                return pos, HIT_CITY
+
+        pos = self.by_scheme.get((province, scheme))
+        return pos, (HIT_SCHEME if pos is not None else MISS)
+
+    def lookup(self, province, scheme, city=""):
+        """返回匹配到的行位置（没有则 None），并计入命中统计。"""
+        pos, kind = self._resolve(province, scheme, city)
+        self.stats[kind] += 1
+        return pos
+
+    def lookup_many(self, provinces, schemes, cities):
+        """
+        批量查找：三个等长序列 → 行位置数组（int64，没匹配到为 -1）。
+        相同的 (省份, 制度, 城市) 只查一次；命中统计按站点数累计，与逐个 lookup 相同。
+        """
+        keys = pd.DataFrame({"省份": provinces, "制度": schemes, "城市": cities}, dtype=object)
+        if keys.empty:
+            return np.empty(0, dtype=np.int64)
+        codes = keys.groupby(list(keys.columns), sort=False, dropna=False).ngroup().to_numpy()
+        _, first = np.unique(codes, return_index=True)
+
+        found = np.empty(len(first), dtype=np.int64)
+        counts = np.bincount(codes, minlength=len(first))
+        for code, i in enumerate(first):
+            pos, kind = self._resolve(*keys.iloc[i])
+            found[code] = -1 if pos is None else pos
+            self.stats[kind] += int(counts[code])
+        return found[codes]
+
+    def row(self, pos):
+        """行位置 → {列: 值}（定点价格还原成 float），同一行只还原一次。"""
+        if pos not in self._rows:
+            self._rows[pos] = schema.row_values(self.df, pos)
+        return self._rows[pos]
+
+    def match(self, province, scheme, city=""):
+        """查找并取出整行；没匹配到返回 None。"""
+        pos = self.lookup(province, scheme, city)
+        return None if pos is None else self.row(pos)
+
+    def reset_stats(self):
+        self.stats = {HIT_CITY: 0, HIT_SCHEME: 0, MISS: 0}
+
+    def format_stats(self):
+        total = sum(self.stats.values())
+        return f"共匹配 {total} 个站点：" + "，".join(f"{k} {v}" for k, v in self.stats.items())
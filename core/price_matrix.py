@@ -0,0 +1,109 @@
+# -*- coding: utf-8 -*-
+# core/price_matrix.py
+"""
+全电压等级电价矩阵：一次解析把表里【所有】电压等级 × 制度 × 分时档位的价格都取出来。
+
+以前只取 1-10（20）千伏 两行，要 不满1千伏 / 35千伏 / 110千伏 得重新解析 PDF。
+现在 rows 阶段顺带产出一份紧凑的矩阵，挂在结果的 attrs["price_matrix"] 上：
+
+    {"省份": "浙江省", "城市": "",
+     "prices": {"单一制": {"1-10（20）千伏": (不分时, 尖, 峰, 平, 谷, 深), "35千伏": (...)}, "两部制": {...}}}
+
+只含基本类型（可缓存、可比较、能随 attrs 写进 parquet 元数据），按 [制度][电压等级] 直接取价；
+需要表格时用 matrix_frame 展开成与 Page1 相同列格式的 DataFrame，再用 pick_voltage 选电压等级。
+"""
+import re
+
+import pandas as pd
+
+PRICE_FIELDS = ["不分时电价", "尖", "峰", "平", "谷", "深"]
+KEY_FIELDS = ["省份", "城市", "制度", "电压等级"]
+
+VOLTAGE_1_10_LABEL = "1-10（20）千伏"     # Page1 一直输出的电压等级写法
+SCHEME_NAMES = ["单一制", "两部制"]        # 第 3 个起叫 方案3、方案4……
+
+_SPACES = re.compile(r"\s+")
+_RANGE = re.compile(r"[~～至到—–]")
+_LESS_THAN = re.compile(r"^(?:小于|低于)")
+_KV = re.compile(r"kV|KV|kv", re.I)
+_1_10 = re.compile(r"1-10(?:（20）)?千伏")
+_NUMBER = re.compile(r"\d+(?:\.\d+)?")
+
+
+def scheme_name(pos):
+    """第 pos 个（从 0 开始）→ 单一制 / 两部制 / 方案N（与 build_price_rows 的命名一致）。"""
+    return SCHEME_NAMES[pos] if pos < len(SCHEME_NAMES) else f"方案{pos + 1}"
+
+
+def _scheme_order(scheme):
+    return (SCHEME_NAMES.index(scheme), scheme) if scheme in SCHEME_NAMES else (len(SCHEME_NAMES), scheme)
+
+
+def normalize_voltage(text):
+    """
+    表格里的电压写法 → 统一写法：去空白、kV → 千伏、~ / 至 → -、半角括号 → 全角、小于 → 不满；
+    1-10千伏 / 1~10（20）kV 等一律写成 1-10（20）千伏。
+    """
+    s = _SPACES.sub("", str(text))
+    s = _KV.sub("千伏", s)
+    s = _RANGE.sub("-", s)
+    s = s.replace("(", "（").replace(")", "）")
+    s = _LESS_THAN.sub("不满", s)
+    if _1_10.fullmatch(s):
+        return VOLTAGE_1_10_LABEL
+    return s
+
+
+def voltage_sort_key(label):
+    """按电压从低到高排序：不满1千伏 在最前，其余按第一个数字；认不出的放最后。"""
+    s = str(label)
+    m = _NUMBER.search(s)
+    if m is None:
+        return (2, 0.0, s)
+    v = float(m.group())
+    if s.startswith("不满"):
+        v -= 0.5
+    return (0, v, s)
+
+
+def new_matrix(province, city=""):
+    return {"省份": province, "城市": city, "prices": {}}
+
+
+def set_price(matrix, scheme, voltage, values, overwrite=True):
+    """写入一格；overwrite=False 时已有的不覆盖（同一格取第一次出现的行）。"""
+    by_voltage = matrix["prices"].setdefault(scheme, {})
+    if overwrite or voltage not in by_voltage:
+        by_voltage[voltage] = tuple(values)
+
+
+def matrix_frame(matrices):
+    """
+    一个或多个矩阵 → 与 Page1 相同列格式的 DataFrame（省份 / 城市 / 制度 / 电压等级 + 各档价格），
+    按输入顺序、每省内按电压从低到高排列；同一主键重复出现时保留第一个。
+    """
+    if isinstance(matrices, dict):
+        matrices = [matrices]
+    records = []
+    for m in matrices:
+        if not m:
+            continue
+        cells = [(s, v, p) for s, by_voltage in m["prices"].items() for v, p in by_voltage.items()]
+        for scheme, voltage, prices in sorted(cells, key=lambda c: (voltage_sort_key(c[1]), _scheme_order(c[0]))):
+            records.append([m["省份"], m["城市"], scheme, voltage, *prices])
+
+    df = pd.DataFrame(records, columns=KEY_FIELDS + PRICE_FIELDS)
+    df[PRICE_FIELDS] = df[PRICE_FIELDS].astype(float)
+    return df.drop_duplicates(KEY_FIELDS).reset_index(drop=True)
+
+
+def voltages(df):
+    """表里有哪些电压等级（从低到高）。"""
+    if df is None or df.empty or "电压等级" not in df.columns:
+        return []
+    return sorted(df["电压等级"].dropna().unique(), key=voltage_sort_key)
+
+
+def pick_voltage(df, voltage=VOLTAGE_1_10_LABEL):
+    """只保留某个电压等级的行（默认 1-10（20）千伏，即以前 Page1 的输出）。"""
+    return df[df["电压等级"] == voltage].reset_index(drop=True)
@@ -0,0 +1,185 @@
+# -*- coding: utf-8 -*-
+# core/schedule.py
+"""
+分时价格的列式表示：页面之间传「时段表」，不再传「谷 0:00 - 7:00 0.50元/度」这样的文字再各自用正则拆。
+
+    站点    站点名称
+    时段    尖 / 峰 / 平 / 谷 / 深，不分时为空
+    开始    开始时间，从 0 点起的分钟数
+    结束    结束时间（分钟，24:00 = 1440）
+    价格    元/度
+
+一个站点多行，按原文字的行序。来源：
+    - Page3 / Page4：计算时用算文字的同一批数值直接生成（station_fee.month_schedule、Page4 的时段行，
+      经 from_rows），和结果表一起放进 session_state（store），后面的页面用 cached 取；
+    - 上传的结果 Excel（或 session_state 里没有对应时段表的结果）：from_texts 把每种不同的文字只拆一次，
+      站点按文字编号展开；上传的 Parquet（to_parquet 导出的）直接读；
+    - Page5 的矫正结果（{站点: [{start, end, price}]}）：from_segments。
+文字只在展示 / 导出时用 render 按各页面自己的格式生成。
+拆不出「H:MM - H:MM … 数字」的行（如「无对应电价」「未匹配到价格」「一口价缺失」）不进时段表，
+与原来各页面解析时跳过的行一致。
+"""
+import re
+from io import BytesIO
+
+import numpy as np
+import pandas as pd
+
+from core.schema import content_token
+
+SCHEDULE_COLS = ["站点", "时段", "开始", "结束", "价格"]
+_DTYPES = {"开始": np.int16, "结束": np.int16, "价格": np.float64}
+
+TIERS = ("尖", "峰", "平", "谷", "深")
+DAY_MINUTES = 24 * 60                  # 0:00 - 24:00 的结束
+TIME_PATTERN = r"(\d{1,2}):(\d{2})"
+# 时段（可选，时间前面的文字）+ 开始 - 结束（连接符 - – ~ 至，Page6 原来的认法）+ 后面第一个数字为价格
+LINE_PATTERN = r"^(.*?)\s*(\d{1,2}):(\d{2})\s*[-–~至]\s*(\d{1,2}):(\d{2}).*?([0-9]+(?:\.[0-9]+)?)"
+# 同上，连接符只认「-」（Page5 原来的认法）
+HYPHEN_LINE_PATTERN = r"^(.*?)\s*(\d{1,2}):(\d{2})\s*-\s*(\d{1,2}):(\d{2}).*?([0-9]+(?:\.[0-9]+)?)"
+
+
+def to_minutes(t):
+    """'7:00' → 420；认不出返回 None。"""
+    m = re.search(TIME_PATTERN, "" if t is None else str(t))
+    return int(m[1]) * 60 + int(m[2]) if m else None
+
+
+def min_to_time(m):
+    """420 → '7:00'"""
+    m = int(m)
+    return f"{m // 60}:{m % 60:02d}"
+
+
+def empty():
+    return _typed(pd.DataFrame({c: [] for c in SCHEDULE_COLS}))
+
+
+def _typed(df):
+    df = df[SCHEDULE_COLS].copy()
+    df["站点"] = df["站点"].astype(object)
+    df["时段"] = df["时段"].fillna("").astype(str).astype(object)
+    for c, t in _DTYPES.items():
+        df[c] = df[c].astype(t)
+    return df.reset_index(drop=True)
+
+
+# ==========================
+# 文字 → 时段表
+# ==========================
+def parse_text(text, pattern=LINE_PATTERN):
+    """一段价格文字 → [(时段, 开始, 结束, 价格)]；空值和拆不出的行跳过。pattern 的分组同 LINE_PATTERN。"""
+    if text is None or (not isinstance(text, str) and pd.isna(text)):
+        return []
+    rows = []
+    for line in str(text).splitlines():
+        m = re.search(pattern, line.strip())
+        if not m:
+            continue
+        tier, h1, m1, h2, m2, price = m.groups()
+        rows.append((tier.strip(), int(h1) * 60 + int(m1), int(h2) * 60 + int(m2), float(price)))
+    return rows
+
+
+def from_texts(keys, texts, pattern=LINE_PATTERN):
+    """
+    站点 + 价格文字 → 时段表。同一个站点出现多次时取第一次（与各页面按站点取第一行一致）；
+    不同的文字只拆一次，站点按文字编号展开。pattern 见 parse_text。
+    """
+    frame = pd.DataFrame({"站点": list(keys), "文字": list(texts)}, dtype=object)
+    frame = frame[~frame["站点"].duplicated()]
+    if frame.empty:
+        return empty()
+    codes, uniques = pd.factorize(frame["文字"], use_na_sentinel=True)
+
+    parsed = [parse_text(t, pattern) for t in uniques]
+    lines = pd.DataFrame(
+        [(tid, *row) for tid, rows in enumerate(parsed) for row in rows],
+        columns=["编号", "时段", "开始", "结束", "价格"],
+    )
+    stations = pd.DataFrame({"站点": frame["站点"].to_numpy(), "编号": codes})
+    return _typed(stations.merge(lines, on="编号", how="inner", sort=False))
+
+
+def from_segments(segments):
+    """Page5 的矫正结果 {站点: [{start, end, price}]} → 时段表（时段为空）；时间认不出的段跳过。"""
+    rows = []
+    for station, segs in segments.items():
+        for s in segs:
+            start, end = to_minutes(s.get("start")), to_minutes(s.get("end"))
+            if start is None or end is None or pd.isna(s.get("price")):
+                continue
+            rows.append((station, "", start, end, float(s["price"])))
+    return from_rows(rows)
+
+
+def from_rows(rows):
+    """[(站点, 时段, 开始, 结束, 价格)] → 时段表。"""
+    return _typed(pd.DataFrame(rows, columns=SCHEDULE_COLS))
+
+
+def replace(schedule, other):
+    """other 里出现的站点整段换成 other 的时段，其他站点不变。"""
+    keep = ~schedule["站点"].isin(set(other["站点"]))
+    return _typed(pd.concat([schedule[keep], other], ignore_index=True))
+
+
+# ==========================
+# 取用
+# ==========================
+def segments(schedule):
+    """{站点: [(开始, 结束, 价格, 时段)]}，一次分组建好。"""
+    out = {}
+    cols = [schedule[c].tolist() for c in ("站点", "开始", "结束", "价格", "时段")]
+    for station, start, end, price, tier in zip(*cols):
+        out.setdefault(station, []).append((start, end, price, tier))
+    return out
+
+
+def text_line(tier, start, end, price):
+    """Page3 / Page4 的写法：「谷 0:00 - 7:00 0.5元/度」。"""
+    prefix = f"{tier} " if tier else ""
+    return f"{prefix}{min_to_time(start)} - {min_to_time(end)} {price}元/度"
+
+
+def render(schedule, keys, line=text_line, default=""):
+    """按 keys 的顺序生成每个站点的文字：每行 line(时段, 开始, 结束, 价格)，换行相连；没有时段的站点为 default。"""
+    texts = {
+        station: "\n".join(line(t, s, e, p) for s, e, p, t in segs)
+        for station, segs in segments(schedule).items()
+    }
+    return [texts.get(k, default) for k in keys]
+
+
+# ==========================
+# session_state / 文件
+# ==========================
+def store(state, key, df, schedule):
+    """和结果表一起保存：记下结果表的内容指纹（schema.content_token），cached 据此判断是不是同一张表。"""
+    state[key] = {"src": content_token(df), "schedule": schedule}
+    return schedule
+
+
+def cached(state, key, df, col):
+    """
+    结果表对应的时段表：Page3 / Page4 保存过（内容相同的表）就直接用，否则从 col 列的文字拆一次并缓存。
+    """
+    hit = state.get(key)
+    if hit is not None and hit["src"] == content_token(df):
+        return hit["schedule"]
+    return store(state, key, df, from_texts(df["站点名称"], df[col]))
+
+
+def to_parquet(schedule):
+    buf = BytesIO()
+    schedule.to_parquet(buf, index=False, engine="pyarrow")
+    return buf.getvalue()
+
+
+def read_parquet(file):
+    """读 to_parquet 导出的时段表；缺列时抛 ValueError。"""
+    df = pd.read_parquet(file, engine="pyarrow")
+    missing = [c for c in SCHEDULE_COLS if c not in df.columns]
+    if missing:
+        raise ValueError(f"时段表缺少列：{'、'.join(missing)}")
+    return _typed(df)
@@ -0,0 +1,230 @@
+# -*- coding: utf-8 -*-
+# core/schema.py
+"""
+电价表 / 站点表的紧凑类型：载入时转换一次，之后各页面在整数编码上匹配、分组。
+
+    分类列      省份 / 城市 / 制度 / 电压等级 / 配置 / 是否分时 / 所在省份 / 所属市区，
+                以及其他「不同取值不超过行数一半」的文字列 → pandas category（字典编码，每格 1~2 字节）
+    价格列      不分时电价 / 尖 / 峰 / 平 / 谷 / 深 / 一口价服务费 → 定点数（Int32，单位 1e-6 元）
+                只有能无损还原时才转（6 位小数以内）；否则保持 float64，报告里会列出来
+
+定点价格取出来用 price_values / row_values 还原成 float64（与原来的 float 完全相等），
+不要直接拿 Int32 的数参与计算。compact 同时返回一份内存报告（转换前后字节数、节省比例）。
+
+转换不改变取出来的值：row_values 对原来是数值列的定点列返回 numpy 标量、原来是 object 列的返回 Python float
+（两者的 round 口径不同，见 numpy_scalar）；含 None 的价格列不转——页面把 None 当「没有这一档」（无对应电价），
+NaN 照常参与计算，转成定点后两者就分不开了。
+"""
+import hashlib
+
+import numpy as np
+import pandas as pd
+
+from core.price_matrix import PRICE_FIELDS
+
+CATEGORY_COLS = ["省份", "城市", "制度", "电压等级", "配置", "是否分时", "所在省份", "所属市区"]
+PRICE_COLS = PRICE_FIELDS + ["一口价服务费"]
+
+PRICE_SCALE = 10 ** 6          # 定点：1 = 0.000001 元
+CATEGORY_RATIO = 0.5           # 其他文字列：不同取值 / 行数 不超过这个比例才字典编码
+_INT32_MAX = np.iinfo(np.int32).max
+
+
+def _is_text(s):
+    return s.dtype == object or pd.api.types.is_string_dtype(s.dtype)
+
+
+def _to_fixed(s):
+    """价格列 → 定点 Int32；不是纯数字、超出范围或还原不回原值时返回 None。"""
+    if not (pd.api.types.is_numeric_dtype(s.dtype) or _is_text(s)):
+        return None
+    if s.dtype == object and s.map(lambda v: v is None).any():
+        return None     # None 和 NaN 的含义不同（见模块说明），不动
+    x = pd.to_numeric(s, errors="coerce")
+    if x.notna().sum() != s.notna().sum():
+        return None     # 混着文字（如「一口价缺失」），不动
+    v = x.to_numpy(dtype=float)
+    ok = ~np.isnan(v)
+    scaled = np.round(v[ok] * PRICE_SCALE)
+    if len(scaled) and (np.abs(scaled).max() > _INT32_MAX or not np.array_equal(scaled / PRICE_SCALE, v[ok])):
+        return None
+    out = np.zeros(len(v), dtype=np.int32)
+    out[ok] = scaled.astype(np.int32)
+    return pd.Series(pd.arrays.IntegerArray(out, ~ok), index=s.index, name=s.name)
+
+
+def compact(df, name=""):
+    """
+    转换一张表，返回 (紧凑表, 报告)。已经转换过的表原样返回。
+    报告：{"表", "行数", "原内存(KB)", "压缩后(KB)", "节省(%)", "分类列", "定点价格列", "未转换价格列"}
+    """
+    before = int(df.memory_usage(deep=True).sum())
+    if is_compact(df):
+        return df, _report(name, df, before, before, [], [], [])
+
+    cols = {}
+    categorical, fixed, kept = [], [], []
+    n = len(df)
+    for col in df.columns:
+        s = df[col]
+        if col in PRICE_COLS:
+            f = _to_fixed(s)
+            if f is not None:
+                cols[col] = f
+                fixed.append(col)
+                continue
+            kept.append(col)
+        elif _is_text(s) and (col in CATEGORY_COLS or s.nunique(dropna=True) <= CATEGORY_RATIO * n):
+            cols[col] = s.astype("category")
+            categorical.append(col)
+            continue
+        cols[col] = s
+
+    out = pd.DataFrame(cols, index=df.index)
+    out.attrs = dict(df.attrs)
+    out.attrs["schema"] = {
+        "price_scale": PRICE_SCALE,
+        "fixed": fixed,
+        "numpy": [c for c in fixed if pd.api.types.is_numeric_dtype(df[c].dtype)],    # 原来是数值列的
+    }
+    after = int(out.memory_usage(deep=True).sum())
+    return out, _report(name, out, before, after, categorical, fixed, kept)
+
+
+def _report(name, df, before, after, categorical, fixed, kept):
+    return {
+        "表": name,
+        "行数": len(df),
+        "原内存(KB)": round(before / 1024, 1),
+        "压缩后(KB)": round(after / 1024, 1),
+        "节省(%)": round((1 - after / before) * 100, 1) if before else 0.0,
+        "分类列": categorical,
+        "定点价格列": fixed,
+        "未转换价格列": kept,
+    }
+
+
+def format_report(report):
+    text = (
+        f"{report['表']}：{report['行数']} 行，内存 {report['原内存(KB)']} KB → {report['压缩后(KB)']} KB"
+        f"（节省 {report['节省(%)']}%）"
+    )
+    if report["未转换价格列"]:
+        text += f"；价格列 {'、'.join(report['未转换价格列'])} 含文字、None 或超过 6 位小数，保持原样"
+    return text
+
+
+def content_token(df):
+    """
+    表内容的指纹（列名 + 逐行哈希）：session_state 里判断「还是不是同一份表」用。
+    不能用 id(df)——旧表被回收后新表可能拿到同一个 id。
+    """
+    h = hashlib.sha1(repr(list(df.columns)).encode("utf-8"))
+    h.update(pd.util.hash_pandas_object(df, index=True).to_numpy().tobytes())
+    return h.hexdigest()
+
+
+def is_compact(df):
+    return "schema" in df.attrs
+
+
+def cached_compact(state, key, df, name=""):
+    """
+    session_state 里按来源缓存紧凑表：内容相同的表（content_token 相同）只转换一次。
+    返回 (紧凑表, 报告)。
+    """
+    src = content_token(df)
+    hit = state.get(key)
+    if hit is not None and hit["src"] == src:
+        return hit["df"], hit["report"]
+    out, report = compact(df, name)
+    state[key] = {"src": src, "df": out, "report": report}
+    return out, report
+
+
+# ==========================
+# 取值（定点还原）
+# ==========================
+def fixed_columns(df):
+    """转成定点数的价格列（没 compact 过的表为空）。"""
+    return df.attrs.get("schema", {}).get("fixed", ())
+
+
+def numpy_scalar(df, col):
+    """该价格列逐格取出来是不是 numpy 标量（原来是数值列）：是的话 round 走 np.round，否则是 Python 的 round。"""
+    if col in fixed_columns(df):
+        return col in df.attrs["schema"].get("numpy", ())
+    return pd.api.types.is_numeric_dtype(df[col].dtype)
+
+
+def price_values(df, col):
+    """某个价格列 → float64 数组（定点列还原，空值为 NaN）。"""
+    s = df[col]
+    if col in fixed_columns(df):
+        return s.to_numpy(dtype="float64", na_value=np.nan) / PRICE_SCALE
+    return pd.to_numeric(s, errors="coerce").to_numpy(dtype=float)
+
+
+def row_values(df, pos):
+    """
+    第 pos 行（按位置）→ {列: 值}：定点价格还原成转换前的值（空值 NaN；原来是数值列的还原成 numpy 标量），
+    分类列取原文字。
+    """
+    row = df.iloc[pos]
+    fixed = fixed_columns(df)
+    out = {}
+    for col, v in row.items():
+        if col in fixed:
+            v = float("nan") if pd.isna(v) else int(v) / PRICE_SCALE
+            out[col] = np.float64(v) if numpy_scalar(df, col) else v
+        else:
+            out[col] = v
+    return out
+
+
+def expand(df):
+    """定点价格列还原成 float64（导出 / 展示用），分类列保持不变。"""
+    fixed = fixed_columns(df)
+    if not fixed:
+        return df
+    out = df.copy()
+    for col in fixed:
+        out[col] = price_values(df, col)
+    out.attrs.pop("schema", None)
+    return out
+
+
+# ==========================
+# 编码上的匹配
+# ==========================
+def unify_categories(frames, col):
+    """
+    几张表的同名列统一成同一套分类（取值并集），之后 == / isin / merge 都直接比较整数编码。
+    返回新的表列表（原表不动）；某张表没有该列时原样返回。
+    """
+    values = pd.Index([])
+    for f in frames:
+        if f is not None and col in f.columns:
+            s = f[col]
+            values = values.union(pd.Index(s.cat.categories if isinstance(s.dtype, pd.CategoricalDtype) else s.dropna().unique()))
+    dtype = pd.CategoricalDtype(values)
+    out = []
+    for f in frames:
+        if f is None or col not in f.columns:
+            out.append(f)
+            continue
+        f = f.copy(deep=False)
+        f[col] = f[col].astype(dtype)
+        out.append(f)
+    return out
+
+
+def first_positions(df, col):
+    """{取值: 第一次出现的行位置}，用于按站点名称等键一次性建查找表（代替逐个布尔筛选）。"""
+    s = df[col]
+    if not isinstance(s.dtype, pd.CategoricalDtype):
+        s = s.astype("category")
+    codes = s.cat.codes.to_numpy()
+    uniq, first = np.unique(codes, return_index=True)
+    cats = s.cat.categories
+    return {cats[c]: int(p) for c, p in zip(uniq, first) if c >= 0}
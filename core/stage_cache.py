@@ -0,0 +1,95 @@
+# -*- coding: utf-8 -*-
+# core/stage_cache.py
+"""
+PDF 解析的分阶段缓存：
+
+    raw      —— pdfplumber 抽出来的原始表格行 + 省份（最慢的一步）
+    frame    —— 清洗后的 DataFrame
+    layout   —— 识别出的分时列 / 非分时列 / 1-10kV 行
+    rows     —— 最终电价行
+
+每个阶段的 key = PDF 内容 SHA-256 + 「该阶段及其上游各阶段的代码版本」。
+只改了启发式规则（例如浙江 / 江苏行顺序、政府性基金列）时，把对应阶段的版本号 +1，
+下游阶段全部失效，但 raw 仍然命中，直接从缓存的原始表格重放，毫秒级完成。
+
+文件布局：.cache/stages/<阶段>/<版本链>/<sha256>.pkl
+"""
+import os
+import pickle
+import shutil
+import tempfile
+import threading
+
+from core.config import cache_dir
+from core.pdf_parser import STAGE_VERSIONS
+
+STAGES = ["raw", "frame", "layout", "rows"]
+
+
+class StageCache:
+
+    def __init__(self, versions, root=None):
+        """versions：{阶段名: 版本号}，一般传 pdf_parser.STAGE_VERSIONS。"""
+        self.versions = dict(versions)
+        self.root = root or cache_dir("stages")
+
+    def chain(self, stage, variant=""):
+        """该阶段的版本链，例如 layout → "r1.f1.l2"；variant 用于区分抽表参数（如是否预筛）。"""
+        upto = STAGES[: STAGES.index(stage) + 1]
+        key = ".".join(f"{s[0]}{self.versions.get(s, 0)}" for s in upto)
+        return f"{key}-{variant}" if variant else key
+
+    def _path(self, sha, stage, variant=""):
+        return os.path.join(self.root, stage, self.chain(stage, variant), f"{sha}.pkl")
+
+    def get(self, sha, stage, variant=""):
+        """命中返回缓存的对象，未命中返回 None。"""
+        if not sha:
+            return None
+        try:
+            with open(self._path(sha, stage, variant), "rb") as f:
+                return pickle.load(f)
+        except (FileNotFoundError, EOFError, pickle.UnpicklingError):
+            return None
+
+    def put(self, sha, stage, value, variant=""):
+        if not sha:
+            return
+        path = self._path(sha, stage, variant)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".part")
+        with os.fdopen(fd, "wb") as f:
+            pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, path)
+
+    def prune(self):
+        """删掉不是当前版本链的旧目录（代码版本升级后旧缓存永远不会再命中）。"""
+        removed = 0
+        for stage in STAGES:
+            stage_dir = os.path.join(self.root, stage)
+            if not os.path.isdir(stage_dir):
+                continue
+            current = self.chain(stage)
+            for name in os.listdir(stage_dir):
+                if name != current and not name.startswith(current + "-"):
+                    shutil.rmtree(os.path.join(stage_dir, name), ignore_errors=True)
+                    removed += 1
+        return removed
+
+    def clear(self, stage=None):
+        for s in ([stage] if stage else STAGES):
+            shutil.rmtree(os.path.join(self.root, s), ignore_errors=True)
+
+
+_default_cache = None
+_default_lock = threading.Lock()
+
+
+def get_stage_cache():
+    """进程内共享的阶段缓存，版本号取自 pdf_parser.STAGE_VERSIONS；首次创建时顺便清理旧版本。"""
+    global _default_cache
+    with _default_lock:
+        if _default_cache is None:
+            _default_cache = StageCache(STAGE_VERSIONS)
+            _default_cache.prune()
+        return _default_cache
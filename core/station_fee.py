@@ -0,0 +1,390 @@
+# -*- coding: utf-8 -*-
+# core/station_fee.py
+"""
+站点电费文本的批量计算（Page3「开始计算电费」）：整表一次算完，不逐站点 iterrows。
+
+结果与原来逐行的 process_station_prices 逐字节一致：
+    - 匹配：PriceIndex.lookup_many（广东按城市、查不到回退 省份 + 制度；相同的键只查一次）；
+    - 不分时（是否分时 = 否）：「0:00 - 24:00 {round(不分时电价 × 乘子, 2)}元/度」；
+    - 分时：电费-X月 的规则文本按行拆开，每行「时段 时间」或直接以时间开头（= 不分时电价），
+      尖 没有价格时用 峰，其他档没有价格时写「无对应电价」，各行用换行连起来；
+    - 没匹配到：「未匹配到价格」，并记入 errors。
+
+做法：
+    1. 时段文本由分时日历（core.tou_calendar）编译：每种不同的文本只拆一次成长表，站点只带规则编号；
+    2. 电价表按时段整理成价格列（尖 → 峰 的回退在整列上 np.where 完成）；
+    3. 站点按 (电价行, 乘子, 规则编号) 去重成组合，组合展开成 (组合, 规则行)，
+       价格 = 价格列[电价行] × 乘子 一次 NumPy 运算；
+    4. 金额文字按不同数值去重后格式化，再拼好每个组合的文本，按组合编号放回每个站点。
+       round 的口径跟原来一样随价格列原来的类型走（schema.numpy_scalar）：数值列的单元格是 numpy 标量，
+       原来实际走的是 np.round；object 列的是 Python float，用 Python 的 round（.5 附近可能差一分）。
+站点再多，逐个 Python 处理的也只有「不同规则文本」「不同金额」「不同组合」这几样，数量很小。
+站点本月的时段列为空时按日历补（没传日历时就是空，与原来一样）。
+需要时同时生成时段表（month_schedule）：用拼文本的同一批数值（规则行的开始 / 结束分钟、round 后的金额），
+与把文本拆回来的结果相同，只是负数金额保留符号。
+
+多个月（compute_months）：匹配、价格列、不分时站点的文本只算一次，各月只重算分时部分；
+分时站点的规则编号整月相同的月份（多数省份一年只有两三套时段）直接复用已算好的月份。
+"""
+from io import BytesIO
+
+import numpy as np
+import pandas as pd
+
+from core import schedule, schema
+from core.price_index import PriceIndex
+from core.tou_calendar import TouCalendar
+
+UNMATCHED = "未匹配到价格"
+NO_PRICE = "无对应电价"
+PLAIN_PRICE = "不分时电价"
+FALLBACK_TIERS = {"尖": "峰"}          # 尖 没有价格（无此列或为空）时用 峰
+
+OUTPUT_COLS = ["序号", "站点名称", "省份", "城市", "配置", "是否分时", "电费乘子", "电费"]
+
+
+# ==========================
+# 电价表 → 各时段的价格列
+# ==========================
+
+def _none_mask(df, col):
+    """单元格是不是 None（原来 row.get 取到 None → 无对应电价；NaN 则照常算成 nan）。"""
+    if df[col].dtype != object:
+        return np.zeros(len(df), dtype=bool)
+    return np.array([v is None for v in df[col].tolist()], dtype=bool)
+
+
+def tier_prices(df_price):
+    """
+    返回 (prices, numpy_round, absent)，都是 {时段: 按电价表行的数组}；时段 "" 对应 不分时电价。
+        prices        float64 价格（None 也是 NaN）
+        numpy_round   bool，这一格的价格原来是 numpy 标量（round 口径见模块说明）
+        absent        bool，这一格原来是 None，写「无对应电价」
+    尖 等回退档：本档为 None / NaN 时取回退档的这一格（没有本档列时整列用回退档；没有回退档列时算没有）。
+    """
+    n = len(df_price)
+    prices, numpy_round, absent = {}, {}, {}
+    for c in df_price.columns:
+        if c in schema.PRICE_COLS:
+            prices[c] = schema.price_values(df_price, c)
+            numpy_round[c] = np.full(n, schema.numpy_scalar(df_price, c))
+            absent[c] = _none_mask(df_price, c)
+    for tier, fallback in FALLBACK_TIERS.items():
+        if tier in prices:
+            empty = np.isnan(prices[tier])
+            if fallback in prices:
+                prices[tier] = np.where(empty, prices[fallback], prices[tier])
+                numpy_round[tier] = np.where(empty, numpy_round[fallback], numpy_round[tier])
+                absent[tier] = np.where(empty, absent[fallback], absent[tier])
+            else:
+                absent[tier] = empty
+        elif fallback in prices:
+            prices[tier] = prices[fallback]
+            numpy_round[tier] = numpy_round[fallback]
+            absent[tier] = absent[fallback]
+    if PLAIN_PRICE in prices:
+        prices[""] = prices[PLAIN_PRICE]
+        numpy_round[""] = numpy_round[PLAIN_PRICE]
+        absent[""] = absent[PLAIN_PRICE]
+    return prices, numpy_round, absent
+
+
+def _round_unique(values):
+    """等同于逐个 round(v, 2)；按数值的二进制去重（-0.0 与 0.0 分开），每个不同的金额只 round 一次。"""
+    bits, inverse = np.unique(values.view(np.int64), return_inverse=True)
+    return [round(float(v), 2) for v in bits.view(np.float64)], inverse.ravel()
+
+
+def round_amounts(values, numpy_round=None):
+    """
+    金额数组 → 两位小数的金额数组，即文字里写的那个数（文字 = str(金额)）。
+    numpy_round 为 True 的位置先 np.round 到两位（Python 的 round 对已经是两位小数的值不再改变，
+    结果与 np.round(v, 2) 相同）。
+    """
+    values = np.array(values, dtype=np.float64)
+    if not len(values):
+        return values
+    if numpy_round is not None and numpy_round.any():
+        values[numpy_round] = np.round(values[numpy_round], 2)
+    rounded, inverse = _round_unique(values)
+    return np.array(rounded, dtype=np.float64)[inverse]
+
+
+def format_amounts(values, numpy_round=None):
+    """金额数组 → 文字数组，等同于逐个 str(round(v, 2))（口径见 round_amounts）；每个不同的金额只格式化一次。"""
+    values = round_amounts(values, numpy_round)
+    if not len(values):
+        return np.empty(0, dtype=object)
+    rounded, inverse = _round_unique(values)
+    return np.array([str(v) for v in rounded], dtype=object)[inverse]
+
+
+# ==========================
+# 计算
+# ==========================
+def _column(df, col, default):
+    if col in df.columns:
+        return df[col].tolist()
+    return [default] * len(df)
+
+
+def _tou_lines(c_pos, c_mult, c_rule, rules, prices, numpy_round, absent):
+    """
+    分时组合 × 规则行 展开成一张表（每行是某个组合电费文本里的一行）：
+        组合 / 时段 / 时间 / 开始 / 结束   规则行的内容（开始、结束为分钟，时间里没有「H:MM - H:MM」为空）
+        缺价   写「无对应电价」
+        价格   round 后的金额，即文本里写的数
+    rules 为日历编译好的长表，规则编号 -1 为没有时段；没有任何行时返回 None。
+    """
+    if not len(c_pos) or rules.empty:
+        return None
+
+    # 组合 × 规则行 展开：每个组合重复它那条规则的行数，line 为长表里的行号
+    counts = np.bincount(rules["规则"].to_numpy(), minlength=int(c_rule.max()) + 1)
+    starts = np.concatenate([[0], np.cumsum(counts)[:-1]])
+    per_combo = np.where(c_rule >= 0, counts[c_rule], 0)
+    combo = np.repeat(np.arange(len(c_pos)), per_combo)
+    if not len(combo):
+        return None
+    offsets = np.arange(len(combo)) - np.repeat(np.cumsum(per_combo) - per_combo, per_combo)
+    line = np.repeat(starts[c_rule], per_combo) + offsets
+
+    tiers = pd.Index(list(prices))
+    col = tiers.get_indexer(rules["时段"])[line]
+    base = np.full(len(combo), np.nan)
+    rounding = np.zeros(len(combo), dtype=bool)
+    none = np.zeros(len(combo), dtype=bool)
+    ok = col >= 0
+    if ok.any():
+        rows = c_pos[combo[ok]]
+        base[ok] = np.column_stack([prices[t] for t in tiers])[rows, col[ok]]
+        rounding[ok] = np.column_stack([numpy_round[t] for t in tiers])[rows, col[ok]]
+        none[ok] = np.column_stack([absent[t] for t in tiers])[rows, col[ok]]
+
+    # 电价表没有这一档或这一格是 None 写「无对应电价」；NaN 照原样算成 nan元/度
+    return pd.DataFrame({
+        "组合": combo,
+        "时段": rules["时段"].to_numpy(dtype=object)[line],
+        "时间": rules["时间"].to_numpy(dtype=object)[line],
+        "开始": rules["开始"].to_numpy()[line],
+        "结束": rules["结束"].to_numpy()[line],
+        "缺价": ~ok | none,
+        "价格": round_amounts(base * c_mult[combo], rounding),
+    })
+
+
+def _tou_texts(n, lines):
+    """分时组合 → 每个组合的电费文本（object 数组），lines 为 _tou_lines 展开的表。"""
+    out = np.full(n, "", dtype=object)
+    if lines is None:
+        return out
+    tier = lines["时段"].to_numpy(dtype=object)
+    time = lines["时间"].to_numpy(dtype=object)
+    amount = format_amounts(lines["价格"].to_numpy())
+    label = np.where(tier == "", time, tier + " " + time)
+    text = np.where(lines["缺价"].to_numpy(), tier + " " + time + " " + NO_PRICE, label + " " + amount + "元/度")
+
+    joined = pd.Series(text).groupby(lines["组合"].to_numpy(), sort=True).agg("\n".join)
+    out[joined.index.to_numpy()] = joined.to_numpy(dtype=object)
+    return out
+
+
+def prepare(df_station, df_price, index=None):
+    """
+    与月份无关的部分只做一次：站点各列、匹配结果、各时段价格列、不分时站点的电费文本、未匹配列表。
+    返回一个字典，交给 month_fees 按月计算（多个月共用）。
+    """
+    if index is None:
+        index = PriceIndex(df_price)
+    n = len(df_station)
+    ctx = {"n": n, "station": df_station}
+    if not n:
+        return ctx
+
+    ctx["序号"] = seq = df_station["序号"].tolist()
+    ctx["站点名称"] = names = df_station["站点名称"].tolist()
+    ctx["省份"] = provinces = df_station["所在省份"].tolist()
+    ctx["城市"] = cities = _column(df_station, "所属市区", "")
+    ctx["配置"] = configs = df_station["配置"].astype(object).map(lambda v: str(v).strip()).tolist()
+    fs = np.array([str(v).strip() for v in df_station["是否分时"].tolist()], dtype=object)
+    ctx["是否分时"] = fs.tolist()
+    mult = df_station["电费乘子"].astype(object).map(float).to_numpy(dtype=np.float64)
+    ctx["电费乘子"] = mult.tolist()
+
+    pos = index.lookup_many(provinces, configs, cities)
+    matched = pos >= 0
+    plain = matched & (fs == "否")
+    tou = matched & ~plain
+    prices, numpy_round, absent = tier_prices(df_price)
+
+    # 不分时：一整列相乘，金额文字按数值去重格式化（与月份无关）
+    fee = np.full(n, UNMATCHED, dtype=object)
+    plain_amount = np.full(n, np.nan)
+    if plain.any():
+        flat = prices.get(PLAIN_PRICE, np.full(len(df_price), np.nan))
+        rounding = numpy_round.get(PLAIN_PRICE, np.zeros(len(df_price), dtype=bool))
+        plain_amount[plain] = round_amounts(flat[pos[plain]] * mult[plain], rounding[pos[plain]])
+        fee[plain] = "0:00 - 24:00 " + format_amounts(plain_amount[plain]) + "元/度"
+
+    ctx.update({
+        "pos": pos,
+        "mult": mult,
+        "tou": tou,
+        "plain": plain,
+        "plain_amount": plain_amount,
+        "tou_station": df_station[tou],
+        "prices": prices,
+        "numpy_round": numpy_round,
+        "absent": absent,
+        "fee": fee,
+        "errors": [(seq[i], names[i], provinces[i], cities[i], configs[i]) for i in np.flatnonzero(~matched)],
+    })
+    return ctx
+
+
+def month_rules(ctx, month, calendar):
+    """分时站点本月的规则编号数组（两个月的数组相同 → 电费文本也完全相同）。"""
+    return calendar.station_rules(ctx["tou_station"], month)
+
+
+def month_fees(ctx, rule, calendar, with_schedule=False):
+    """
+    按分时站点的规则编号算出全部站点的电费文本（object 数组）；按 (电价行, 乘子, 规则编号) 去重成组合。
+    with_schedule：同时返回本月的时段表（见 month_schedule），返回 (文本, 时段表)。
+    """
+    fee = ctx["fee"].copy()
+    tou = ctx["tou"]
+    combo_code, lines = np.empty(0, dtype=np.int64), None
+    if tou.any():
+        combos = pd.DataFrame({"pos": ctx["pos"][tou], "mult": ctx["mult"][tou], "rule": rule})
+        combo_code = combos.groupby(["pos", "mult", "rule"], sort=False, dropna=False).ngroup().to_numpy()
+        _, first = np.unique(combo_code, return_index=True)
+        c = combos.iloc[first]
+        lines = _tou_lines(
+            c["pos"].to_numpy(), c["mult"].to_numpy(dtype=np.float64), c["rule"].to_numpy(),
+            calendar.lines, ctx["prices"], ctx["numpy_round"], ctx["absent"],
+        )
+        fee[tou] = _tou_texts(len(c), lines)[combo_code]
+    if with_schedule:
+        return fee, month_schedule(ctx, combo_code, lines)
+    return fee
+
+
+def month_schedule(ctx, combo_code, lines):
+    """
+    本月的时段表（core.schedule）：直接用算电费文本时的数值，不再把文本拆回来。
+        不分时站点   一行 0:00 - 24:00；
+        分时站点     所在组合的各规则行，跳过「无对应电价」、时间里没有「H:MM - H:MM」的行；
+    价格是文本里写的金额，不是有限数（nan元/度）的行跳过；同名站点取第一个（与 schedule.from_texts 一致）。
+    """
+    if not ctx["n"]:
+        return schedule.empty()
+    first = ~pd.Series(ctx["站点名称"], dtype=object).duplicated().to_numpy()
+    names = np.array(ctx["站点名称"], dtype=object)
+
+    plain = ctx["plain"] & first & np.isfinite(ctx["plain_amount"])
+    parts = [pd.DataFrame({
+        "位置": np.flatnonzero(plain), "站点": names[plain], "时段": "",
+        "开始": 0, "结束": schedule.DAY_MINUTES, "价格": ctx["plain_amount"][plain],
+    })]
+
+    if lines is not None:
+        tou_pos = np.flatnonzero(ctx["tou"])
+        keep = first[tou_pos]
+        stations = pd.DataFrame({"位置": tou_pos[keep], "组合": combo_code[keep]})
+        stations["站点"] = names[stations["位置"].to_numpy()]
+        ok = ~lines["缺价"] & lines["开始"].notna() & lines["结束"].notna() & np.isfinite(lines["价格"])
+        parts.append(stations.merge(lines[ok], on="组合", how="inner", sort=False))
+
+    rows = pd.concat(parts, ignore_index=True).sort_values("位置", kind="stable")
+    return schedule.from_rows(rows[schedule.SCHEDULE_COLS])
+
+
+def result_frame(ctx, fee):
+    if not ctx["n"]:
+        return pd.DataFrame([])
+    data = {c: ctx[c] for c in OUTPUT_COLS[:-1]}
+    data["电费"] = fee.tolist()
+    return pd.DataFrame(data, columns=OUTPUT_COLS)
+
+
+def compute_fees(df_station, df_price, month, index=None, calendar=None, with_schedule=False):
+    """
+    df_station × df_price → (结果表, errors)，与原 process_station_prices 的返回完全一致。
+    index：同一张电价表的 PriceIndex，可复用（命中统计累计在它上面）。
+    calendar：TouCalendar；站点本月时段为空时按它补齐，时段文本的解析结果也缓存在它上面。
+    with_schedule：再返回结果对应的时段表，(结果表, errors, 时段表)。
+    """
+    if calendar is None:
+        calendar = TouCalendar()
+    ctx = prepare(df_station, df_price, index)
+    if not ctx["n"]:
+        return (pd.DataFrame([]), [], schedule.empty()) if with_schedule else (pd.DataFrame([]), [])
+    out = month_fees(ctx, month_rules(ctx, month, calendar), calendar, with_schedule=with_schedule)
+    if with_schedule:
+        return result_frame(ctx, out[0]), ctx["errors"], out[1]
+    return result_frame(ctx, out), ctx["errors"]
+
+
+# ==========================
+# 多个月一起算（电费立方：站点 × 月份）
+# ==========================
+def compute_months(df_station, df_price, months, index=None, calendar=None, schedule_month=None):
+    """
+    一次算多个月：站点 / 电价的准备工作只做一次；分时站点各月的规则编号完全相同的月份直接复用结果。
+    返回 ({月份: 结果表}, errors, 复用信息 {月份: 与哪个月相同})。每个月的结果表与单月 compute_fees 相同。
+    schedule_month：再返回这个月结果对应的时段表（在 months 里），返回值多一项。
+    """
+    if calendar is None:
+        calendar = TouCalendar()
+    ctx = prepare(df_station, df_price, index)
+    if not ctx["n"]:
+        out = {m: pd.DataFrame([]) for m in months}, [], {}
+        return out if schedule_month is None else (*out, schedule.empty())
+
+    results, reused, seen = {}, {}, {}
+    fee_schedule = schedule.empty()
+    for m in months:
+        rule = month_rules(ctx, m, calendar)
+        key = rule.tobytes()
+        if key in seen:
+            reused[m] = seen[key]
+            results[m] = results[seen[key]].copy()
+            if m == schedule_month:
+                fee_schedule = month_fees(ctx, rule, calendar, with_schedule=True)[1]
+            continue
+        seen[key] = m
+        if m == schedule_month:
+            fee, fee_schedule = month_fees(ctx, rule, calendar, with_schedule=True)
+        else:
+            fee = month_fees(ctx, rule, calendar)
+        results[m] = result_frame(ctx, fee)
+    if schedule_month is None:
+        return results, ctx["errors"], reused
+    return results, ctx["errors"], reused, fee_schedule
+
+
+def fee_cube(results, value_col="电费", label="电费"):
+    """
+    {月份: 结果表} → 宽表：站点各列 + 「{label}-1月」…「{label}-12月」（只含算过的月份）。
+    各月结果的站点行顺序相同（同一张站点表），直接按位置拼列。
+    """
+    months = [m for m, df in results.items() if not df.empty]
+    if not months:
+        return pd.DataFrame()
+    first = results[months[0]]
+    cube = first.drop(columns=[value_col]).copy()
+    for m in months:
+        cube[f"{label}-{m}月"] = results[m][value_col].to_numpy()
+    return cube
+
+
+def months_workbook(results, cube=None, cube_sheet="汇总"):
+    """每个月一个工作表（「1月」…），cube 不为空时第一个工作表放宽表；返回 xlsx 的字节。"""
+    buf = BytesIO()
+    with pd.ExcelWriter(buf, engine="openpyxl") as writer:
+        if cube is not None and not cube.empty:
+            cube.to_excel(writer, index=False, sheet_name=cube_sheet)
+        for m, df in results.items():
+            df.to_excel(writer, index=False, sheet_name=f"{m}月")
+    return buf.getvalue()
@@ -0,0 +1,223 @@
+# -*- coding: utf-8 -*-
+# core/table_diff.py
+"""
+两张电价表的差异对比：按 省份 / 城市 / 制度 / 电压等级 对齐，逐格比较价格。
+
+典型用法（Page2）：
+    - 矫正版 vs Page1 解析结果（price_raw）：看人工改了哪些格子；
+    - 本月 vs 上月（电价历史库）：看哪些省调价了。
+
+全部用整列比较完成，不逐行循环：
+    1. 两边按主键建索引（主键重复时保留第一行，与历史库的主键一致），求并集对齐成同形状的两个矩阵；
+    2. 价格列：两边都是空值算相同，否则差的绝对值在容差内算相同；其他列按字符串比较；
+    3. 只在一边有的行是新增 / 删除，两边都有且有格子不同的是修改。
+
+diff_tables 的结果是一个字典，summary / changes_frame / styled 各自生成摘要、变更明细、高亮视图。
+页面上用 cached_diff：对比对象和编辑版本都没变时（切换显示方式、筛选等重跑）直接用上次的结果。
+"""
+import numpy as np
+import pandas as pd
+
+from core.price_matrix import KEY_FIELDS, PRICE_FIELDS
+
+DEFAULT_TOLERANCE = 1e-6      # 电价保留 4~6 位小数，差这么多以内视为没改
+
+STATUS_ADDED = "新增"
+STATUS_DELETED = "删除"
+STATUS_CHANGED = "修改"
+STATUS_SAME = "未变"
+
+STATUS_COLORS = {
+    STATUS_ADDED: "background-color: #e6f4ea",
+    STATUS_DELETED: "background-color: #fdecea; color: #999; text-decoration: line-through",
+}
+CHANGED_CELL_COLOR = "background-color: #fff3cd; font-weight: bold"
+
+
+def _keyed(df, keys):
+    """主键列统一成字符串（空值 → ""），建唯一索引。"""
+    df = df.copy()
+    for k in keys:
+        if k not in df.columns:
+            df[k] = ""
+        df[k] = df[k].fillna("").astype(str)
+    df = df.drop_duplicates(keys)
+    return df.set_index(keys)
+
+
+def diff_tables(old, new, keys=KEY_FIELDS, columns=None, tol=DEFAULT_TOLERANCE):
+    """
+    old / new 为同格式的电价表。返回：
+        old, new    按主键对齐后的两张表（索引 = 主键并集，列 = columns），缺的一边整行为空
+        changed     同形状的布尔表：哪些格子变了（新增 / 删除行的格子全部为 False）
+        status      每行的状态：新增 / 删除 / 修改 / 未变
+        keys, columns
+    columns 默认为两边共有的价格列；价格列按数值比较（容差 tol），其他列按字符串比较。
+    """
+    old_k = _keyed(old, keys)
+    new_k = _keyed(new, keys)
+    if columns is None:
+        columns = [c for c in PRICE_FIELDS if c in old_k.columns and c in new_k.columns]
+
+    # 新表的行顺序在前，删除的行按旧表顺序接在后面
+    index = new_k.index.append(old_k.index.difference(new_k.index, sort=False))
+    a = old_k.reindex(index=index, columns=columns)
+    b = new_k.reindex(index=index, columns=columns)
+    for col in columns:
+        if col in PRICE_FIELDS:
+            a[col] = pd.to_numeric(a[col], errors="coerce").astype(float)
+            b[col] = pd.to_numeric(b[col], errors="coerce").astype(float)
+
+    in_old = index.isin(old_k.index)
+    in_new = index.isin(new_k.index)
+
+    changed = pd.DataFrame(False, index=index, columns=columns)
+    for col in columns:
+        if col in PRICE_FIELDS:
+            x = a[col].to_numpy()
+            y = b[col].to_numpy()
+            both_nan = np.isnan(x) & np.isnan(y)
+            with np.errstate(invalid="ignore"):
+                same = both_nan | (np.abs(x - y) <= tol)
+        else:
+            x = a[col].fillna("").astype(str).to_numpy()
+            y = b[col].fillna("").astype(str).to_numpy()
+            same = x == y
+        changed[col] = ~same & in_old & in_new
+
+    row_changed = changed.to_numpy().any(axis=1)
+    status = np.select(
+        [~in_old, ~in_new, row_changed],
+        [STATUS_ADDED, STATUS_DELETED, STATUS_CHANGED],
+        default=STATUS_SAME,
+    )
+    return {
+        "old": a,
+        "new": b,
+        "changed": changed,
+        "status": pd.Series(status, index=index, name="状态"),
+        "keys": list(keys),
+        "columns": list(columns),
+    }
+
+
+# ==========================
+# 视图
+# ==========================
+def cached_diff(state, token, load_old, new, key="price_diff"):
+    """
+    session_state 里缓存 diff_tables 的结果：token 相同（对比对象 + 编辑会话来源 + 编辑版本）就不重算；
+    load_old 是取旧表的函数，命中时连旧表都不用取。
+    """
+    hit = state.get(key)
+    if hit is None or hit[0] != token:
+        hit = state[key] = (token, diff_tables(load_old(), new))
+    return hit[1]
+
+
+def summary(result):
+    """各状态的行数 + 每列改动的格子数。"""
+    counts = result["status"].value_counts()
+    rows = {s: int(counts.get(s, 0)) for s in (STATUS_CHANGED, STATUS_ADDED, STATUS_DELETED, STATUS_SAME)}
+    cells = result["changed"].sum().astype(int)
+    return {
+        "行": rows,
+        "改动格子数": int(cells.sum()),
+        "各列改动": {c: int(n) for c, n in cells.items() if n},
+    }
+
+
+def summary_by(result, level="省份"):
+    """按某个主键（默认省份）汇总：修改 / 新增 / 删除 行数、改动格子数；没有任何变化的组不列出。"""
+    status = result["status"]
+    frame = pd.DataFrame({
+        level: status.index.get_level_values(level),
+        "状态": status.to_numpy(),
+        "改动格子数": result["changed"].sum(axis=1).to_numpy(),
+    })
+    frame = frame[frame["状态"] != STATUS_SAME]
+    if frame.empty:
+        return pd.DataFrame(columns=[level, STATUS_CHANGED, STATUS_ADDED, STATUS_DELETED, "改动格子数"])
+    out = pd.crosstab(frame[level], frame["状态"]).reindex(
+        columns=[STATUS_CHANGED, STATUS_ADDED, STATUS_DELETED], fill_value=0
+    )
+    out["改动格子数"] = frame.groupby(level)["改动格子数"].sum()
+    return out.reset_index().rename_axis(columns=None)
+
+
+def changes_frame(result):
+    """
+    变更明细（长表）：主键 + 状态 + 列 + 原值 + 新值 + 差值。
+    修改行每个变了的格子一行；新增 / 删除行整行一条（列为空）。
+    """
+    keys = result["keys"]
+    changed = result["changed"]
+
+    cells = changed.stack()
+    cells = cells[cells]
+    idx = cells.index
+    col_level = idx.get_level_values(-1)
+    row_index = idx.droplevel(-1)
+
+    # 按 (行, 列) 位置一次性取出原值 / 新值
+    a = result["old"]
+    b = result["new"]
+    rows = a.index.get_indexer(row_index)
+    cols = a.columns.get_indexer(col_level)
+    old_v = a.to_numpy(dtype=object)[rows, cols] if len(rows) else np.array([], dtype=object)
+    new_v = b.to_numpy(dtype=object)[rows, cols] if len(rows) else np.array([], dtype=object)
+
+    cell_part = row_index.to_frame(index=False)
+    cell_part["状态"] = STATUS_CHANGED
+    cell_part["列"] = np.asarray(col_level, dtype=object)
+    cell_part["原值"] = old_v
+    cell_part["新值"] = new_v
+
+    status = result["status"]
+    whole = status[status.isin([STATUS_ADDED, STATUS_DELETED])]
+    row_part = whole.index.to_frame(index=False)
+    row_part["状态"] = whole.to_numpy()
+    row_part["列"] = ""
+    row_part["原值"] = None
+    row_part["新值"] = None
+
+    out = pd.concat([cell_part, row_part], ignore_index=True)
+    out = out[keys + ["状态", "列", "原值", "新值"]]
+    diff = pd.to_numeric(out["新值"], errors="coerce") - pd.to_numeric(out["原值"], errors="coerce")
+    out["差值"] = diff.round(6)
+    return out
+
+
+def combined_frame(result, only_diff=False):
+    """高亮视图用的表：主键 + 状态 + 各列（新增 / 修改 / 未变取新值，删除行取旧值）。"""
+    status = result["status"]
+    deleted = (status == STATUS_DELETED).to_numpy()
+    values = result["new"].copy()
+    values.loc[deleted] = result["old"].loc[deleted]
+    frame = values.reset_index()
+    frame.insert(len(result["keys"]), "状态", status.to_numpy())
+    if only_diff:
+        frame = frame[frame["状态"] != STATUS_SAME]
+    return frame
+
+
+def styled(result, only_diff=True):
+    """
+    高亮视图（pandas Styler）：改过的格子标黄加粗，新增行标绿，删除行标红划线。
+    样式表一次性用 np.where 生成，不逐格回调。
+    """
+    frame = combined_frame(result, only_diff=False)
+    columns = result["columns"]
+
+    status = frame["状态"].to_numpy()
+    row_css = frame["状态"].map(STATUS_COLORS).fillna("").to_numpy(dtype=object)
+    css = pd.DataFrame(np.repeat(row_css[:, None], frame.shape[1], axis=1), index=frame.index, columns=frame.columns)
+    changed = result["changed"].to_numpy()
+    css[columns] = np.where(changed, CHANGED_CELL_COLOR, css[columns].to_numpy())
+
+    if only_diff:
+        keep = status != STATUS_SAME
+        frame, css = frame[keep], css[keep]
+
+    fmt = {c: "{:.4f}" for c in columns if c in PRICE_FIELDS}
+    return frame.style.apply(lambda _: css, axis=None).format(fmt, na_rep="")
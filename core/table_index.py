@@ -0,0 +1,177 @@
+# -*- coding: utf-8 -*-
+# core/table_index.py
+"""
+电价表的「行文本索引」：每个 PDF 只建一次，所有表头 / 列 / 电压行识别都从这里读。
+
+以前 detect_columns、get_header_time_labels（调两次）、find_voltage_rows_1_10kv（调两次）
+各自 df.iterrows() 一遍，每遍都重新拼行文本、逐个关键字做 `in` 判断。
+现在：
+    - 建索引时只遍历一次表格，缓存每个单元格 / 每行的文本；
+    - 所有分时关键字、非分时关键字、电压写法编译成【一个】正则，每行扫一遍拿到全部命中；
+    - 命中按位置落到单元格里，单元格级 / 行级的判断都和原来的 `kw in s` 完全等价。
+"""
+import re
+from bisect import bisect_right
+
+# ==========================
+# 关键字表
+# ==========================
+# detect_columns 用来认列号的关键字（单元格级）
+PERIOD_COLUMN_KWS = {
+    "尖": ["尖峰时段", "尖峰", "尖时段", "尖时"],
+    "峰": ["高峰时段", "高峰", "峰时段", "峰时"],
+    "平": ["平段", "平时段", "平时"],
+    "谷": ["低谷时段", "低谷", "谷段", "谷时段", "谷时"],
+    "深": ["深谷时段", "深谷", "深时段", "深时"],
+}
+
+# 「尖峰时段 / 尖峰」强制认为只有“尖”
+PEAK_OVERRIDE_KWS = ["尖峰时段", "尖峰"]
+
+NON_TIME_KWS = [
+    "非分时电度电价",
+    "非分时电量电价",
+    "非分时电价",
+]
+
+# get_header_time_labels 用来判断表头档位顺序的关键字（行级）
+HEADER_KW_TO_PERIOD = {
+    # 尖 / 尖峰
+    "尖峰时段": "尖", "尖峰": "尖", "尖时段": "尖", "尖时": "尖", "尖": "尖",
+    # 峰（高峰、峰段、峰时等）
+    "高峰时段": "峰", "高峰": "峰", "峰段": "峰",
+    "峰时段": "峰", "峰时": "峰", "峰": "峰",
+    # 平
+    "平段": "平", "平时段": "平", "平时": "平", "平": "平",
+    # 谷
+    "低谷时段": "谷", "低谷": "谷", "谷段": "谷",
+    "谷时段": "谷", "谷时": "谷", "谷": "谷",
+    # 深谷 / 深
+    "深谷时段": "深", "深谷": "深", "深时段": "深", "深时": "深", "深": "深",
+}
+
+# 电压单位（页面预筛 core/page_filter.py 也用这一组）
+VOLTAGE_UNITS = r"千伏|kV|KV"
+# 1-10（20）千伏 / 1-10千伏 / 1~10千伏（也认省掉「伏」的「1-10千」）
+VOLTAGE_1_10_PATTERN = r"1\s*[-~～至到]\s*10(?:（\s*20\s*）|\(\s*20\s*\))?\s*(?:" + VOLTAGE_UNITS + r"|千)"
+# 退化写法：10千伏（上海）
+VOLTAGE_10_PATTERN = r"(?:^|[^0-9])10\s*千伏(?!安)"
+# 任意电压等级写法（单元格级，全电压矩阵用）：不满1千伏 / 35千伏 / 110千伏 / 220千伏及以上 / 1~10（20）kV ……
+# 「千伏安」「kVA」是容量单位，不算
+VOLTAGE_ANY = re.compile(
+    r"(?:不满|小于|低于)?\s*\d+(?:\s*[-~～至到]\s*\d+)?(?:（\s*\d+\s*）|\(\s*\d+\s*\))?"
+    r"\s*(?:" + VOLTAGE_UNITS + r")(?![安A])(?:及以上|以上|及以下|以下)?"
+)
+# 用电分类里的制度写法（行级；合并单元格只在第一行有字，识别时向下沿用）
+SCHEME_KWS = ["单一制", "两部制"]
+
+ALL_KWS = sorted(
+    set(kw for kws in PERIOD_COLUMN_KWS.values() for kw in kws)
+    | set(NON_TIME_KWS)
+    | set(HEADER_KW_TO_PERIOD),
+    key=lambda k: (-len(k), k),
+)
+
+# 同一位置能命中的关键字一定互为前缀；正则只报最长的那个，这里预先算好它覆盖的所有关键字
+_PREFIX_KWS = {kw: [k for k in ALL_KWS if kw.startswith(k)] for kw in ALL_KWS}
+
+# 一个正则、每个位置做三个零宽前瞻：关键字（最长优先）/ 1-10kV / 10kV
+SCANNER = re.compile(
+    "(?=(?P<kw>" + "|".join(map(re.escape, ALL_KWS)) + ")|)"
+    "(?=(?P<v1_10>" + VOLTAGE_1_10_PATTERN + ")|)"
+    "(?=(?P<v10>" + VOLTAGE_10_PATTERN + ")|)"
+)
+
+
+class TableIndex:
+    """
+    对一张已清洗的 DataFrame 建索引。
+
+    属性：
+        df              原表（行号与 df.index 一致）
+        labels          行标签列表
+        row_text        {行标签: "".join(str(c) for c in row)}
+        row_kw_pos      {行标签: {关键字: 在行文本中首次出现的位置}}
+        cell_kws        {行标签: [(列号, {该单元格内出现的关键字}), ...]}（只记有命中的单元格，按列号升序）
+        rows_1_10kv     命中 1-10（20）千伏 写法的行标签
+        rows_10kv       命中 10千伏 写法的行标签
+        row_voltage     {行标签: 该行第一个像电压等级的单元格文字（原样）}（没有的行不记）
+        row_scheme      {行标签: 单一制 / 两部制}（行文本里只出现其中一个时才记）
+    """
+
+    def __init__(self, df):
+        self.df = df
+        self.labels = []
+        self.row_text = {}
+        self.row_kw_pos = {}
+        self.cell_kws = {}
+        self.rows_1_10kv = []
+        self.rows_10kv = []
+        self.row_voltage = {}
+        self.row_scheme = {}
+        self._memo = {}
+
+        for label, row in df.iterrows():
+            self._index_row(label, list(row.values))
+
+    def _index_row(self, label, values):
+        texts = [str(c) for c in values]
+        text = "".join(texts)
+
+        # 单元格在行文本里的起点（None 在行文本里是 "None"，单元格级按 "" 处理，不会有命中）
+        starts = []
+        pos = 0
+        for t in texts:
+            starts.append(pos)
+            pos += len(t)
+
+        kw_pos = {}
+        cells = {}
+        hit_1_10 = hit_10 = False
+
+        for m in SCANNER.finditer(text):
+            p = m.start()
+            if m.group("v1_10") is not None:
+                hit_1_10 = True
+            if m.group("v10") is not None:
+                hit_10 = True
+
+            longest = m.group("kw")
+            if longest is None:
+                continue
+
+            j = bisect_right(starts, p) - 1
+            cell_end = starts[j] + len(texts[j])
+            for kw in _PREFIX_KWS[longest]:
+                kw_pos.setdefault(kw, p)
+                if values[j] is not None and p + len(kw) <= cell_end:
+                    cells.setdefault(j, set()).add(kw)
+
+        self.labels.append(label)
+        self.row_text[label] = text
+        self.row_kw_pos[label] = kw_pos
+        self.cell_kws[label] = sorted(cells.items())
+        if hit_1_10:
+            self.rows_1_10kv.append(label)
+        if hit_10:
+            self.rows_10kv.append(label)
+
+        for v, t in zip(values, texts):
+            m = VOLTAGE_ANY.search(t) if v is not None else None
+            if m is not None:
+                self.row_voltage[label] = m.group()
+                break
+        schemes = [kw for kw in SCHEME_KWS if kw in text]
+        if len(schemes) == 1:
+            self.row_scheme[label] = schemes[0]
+
+    def memo(self, key, fn):
+        """同一张表上重复调用的识别结果只算一次。"""
+        if key not in self._memo:
+            self._memo[key] = fn(self)
+        return self._memo[key]
+
+
+def as_index(table):
+    """兼容旧调用：传 DataFrame 时临时建索引。"""
+    return table if isinstance(table, TableIndex) else TableIndex(table)
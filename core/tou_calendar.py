@@ -0,0 +1,307 @@
+# -*- coding: utf-8 -*-
+# core/tou_calendar.py
+"""
+分时日历：尖峰平谷的时段表按 省份（需要时细到城市）× 月份 存一份，站点引用日历，只有确实不同的站点才单独设置。
+
+以前每个站点行都带着自己的 电费-1月 … 电费-12月 时段文本，同一个省的站点几乎全是同一份，
+每次计算都要把相同的文本重新拆一遍。现在：
+    日历条目    (省份, 城市, 月份) → 时段文本；城市为空的是省级条目
+    单独设置    (站点名称, 月份) → 时段文本（与日历不同的站点）
+    编译结果    所有不同的时段文本只拆一次，得到长表 lines（每行一个时段：Page3 / Page4 两种拆法 + 开始 / 结束分钟）
+                和每条规则是否全天一口价（flat）；站点只记规则编号
+
+查找顺序（station_rules）：
+    1. 站点表里本月的时段列有内容 → 用站点自己的（等价于单独设置）；
+    2. 单独设置（按站点名称）；
+    3. 市级条目 → 省级条目；
+    4. 都没有 → -1（视为没有时段）。
+
+日历可以从站点表推出来（from_stations：每个省每月取最常见的文本，个别城市整体不同的再加市级条目），
+也可以上传一张「省份 / 城市 / 月份 / 时段」的表作为基础，站点表里缺的月份 / 空白的时段就按日历补齐。
+"""
+import re
+
+import numpy as np
+import pandas as pd
+
+MONTHS = range(1, 13)
+CALENDAR_COLS = ["省份", "城市", "月份", "时段"]
+OVERRIDE_COLS = ["站点名称", "月份", "时段"]
+
+START_PATTERN = r"\d{1,2}:\d{2}"                                           # 行首是时间：整行是时间，时段为空
+INTERVAL_PATTERN = r"(\d{1,2}):(\d{2})\s*-\s*(\d{1,2}):(\d{2})"            # 时间 → 开始 / 结束（分钟）
+SERVICE_PATTERN = r"(\S+)\s+(\d{1,2}:\d{2})\s*-\s*(\d{1,2}:\d{2})"         # Page4：「谷 0:00 - 7:00」
+FLAT_PATTERN = r"\b0:00\s*-\s*24:00\b"                                     # Page4：全天一口价
+
+LINE_COLS = ["规则", "时段", "时间", "开始", "结束", "服务时段", "服务开始", "服务结束", "全天"]
+_LINE_DTYPES = {"规则": np.int64, "开始": float, "结束": float, "全天": bool}
+
+
+def month_column(month):
+    return f"电费-{month}月"
+
+
+def _text(v):
+    """单元格 → 时段文本；空值 / 全空白 → None。"""
+    if v is None or (not isinstance(v, str) and pd.isna(v)):
+        return None
+    v = str(v)
+    return v if v.strip() else None
+
+
+def _month(v):
+    """月份单元格（1 / 1.0 / "1月"）→ int；认不出返回 None。"""
+    m = re.search(r"\d+", "" if v is None else str(v))
+    return int(m.group()) if m else None
+
+
+def _city(v):
+    return "" if v is None or (not isinstance(v, str) and pd.isna(v)) else str(v).strip()
+
+
+# ==========================
+# 编译：时段文本 → 长表
+# ==========================
+def compile_rules(texts, start=0):
+    """
+    时段文本列表 → 长表（LINE_COLS），规则编号从 start 起按列表顺序编。
+        时段 / 时间      Page3 的拆法：空行跳过；行首是「H:MM」的整行是时间、时段为空；否则按第一个空格拆开
+        开始 / 结束      时间里第一个「H:MM - H:MM」换算成分钟（没有则为空）
+        服务时段 / 服务开始 / 服务结束   Page4 的拆法（SERVICE_PATTERN），匹配不到为空
+        全天            这一行含「0:00 - 24:00」（Page4 按一口价处理）
+    只对不同的文本调用，逐行用 Python 的 re 解析（pandas 字符串列的正则引擎对 \\b、\\d 的理解和 re 不同，
+    比如「尖0:00 - 24:00」在那边也算全天）。
+    """
+    rows = []
+    for rid, text in enumerate(texts, start=start):
+        for line in str(text).split("\n"):
+            line = line.strip()
+            if not line:
+                continue
+            if re.match(START_PATTERN, line):
+                tier, time = "", line
+            else:
+                tier, _, time = line.partition(" ")
+                time = time.strip()
+            span = re.search(INTERVAL_PATTERN, time)
+            begin, end = (
+                (int(span[1]) * 60 + int(span[2]), int(span[3]) * 60 + int(span[4])) if span else (np.nan, np.nan)
+            )
+            service = re.search(SERVICE_PATTERN, line)
+            rows.append((
+                rid, tier, time, begin, end,
+                *(service.groups() if service else (None, None, None)),
+                re.search(FLAT_PATTERN, line) is not None,
+            ))
+
+    out = pd.DataFrame(rows, columns=LINE_COLS)
+    for c in LINE_COLS:
+        out[c] = out[c].astype(_LINE_DTYPES.get(c, object))
+    return out
+
+
+def flat_rules(lines, n):
+    """每条规则是否含「0:00 - 24:00」的行（Page4 按一口价处理）→ 长度 n 的布尔数组。"""
+    out = np.zeros(n, dtype=bool)
+    out[lines.loc[lines["全天"].to_numpy(dtype=bool), "规则"].to_numpy()] = True
+    return out
+
+
+def _most_common(s):
+    """出现最多的取值；并列时取先出现的。"""
+    counts = s.groupby(s, sort=False).size()
+    return counts.idxmax()
+
+
+# ==========================
+# 日历
+# ==========================
+class TouCalendar:
+    """
+    属性：
+        texts        规则编号 → 时段文本
+        by_city      {(省份, 城市, 月份): 规则编号}
+        by_province  {(省份, 月份): 规则编号}
+        by_station   {(站点名称, 月份): 规则编号}（单独设置，同名站点取第一个）
+    lines / flat 为编译结果，新增文本时只编译新增的部分。
+    """
+
+    def __init__(self, table=None, overrides=None):
+        self.texts = []
+        self._ids = {}
+        self.by_city = {}
+        self.by_province = {}
+        self.by_station = {}
+        self._lines = compile_rules([])
+        self._compiled = 0
+
+        if table is not None:
+            for r in table.itertuples(index=False):
+                self.add(r.省份, r.城市, r.月份, r.时段)
+        if overrides is not None:
+            for r in overrides.itertuples(index=False):
+                self.add_override(r.站点名称, r.月份, r.时段)
+
+    # ---------- 条目 ----------
+    def rule_id(self, text):
+        """时段文本 → 规则编号（没见过的文本新编一个号）。"""
+        rid = self._ids.get(text)
+        if rid is None:
+            rid = self._ids[text] = len(self.texts)
+            self.texts.append(text)
+        return rid
+
+    def rule_ids(self, values):
+        """一列时段文本 → 规则编号数组（空白为 -1）；相同的文本只处理一次。"""
+        codes, texts = pd.factorize(pd.Series(list(values), dtype=object))
+        ids = np.array([-1 if t is None else self.rule_id(t) for t in map(_text, texts)] + [-1], dtype=np.int64)
+        return ids[codes]     # factorize 的空值编码是 -1，正好取到末尾补的 -1
+
+    def add(self, province, city, month, text):
+        """加一条日历条目；空白文本忽略，同一键已有条目时保留已有的。"""
+        text, month = _text(text), _month(month)
+        if text is None or month is None or _text(province) is None:
+            return
+        city = _city(city)
+        target = self.by_city if city else self.by_province
+        key = (province, city, month) if city else (province, month)
+        target.setdefault(key, self.rule_id(text))
+
+    def add_override(self, station, month, text):
+        text, month = _text(text), _month(month)
+        if text is not None and month is not None:
+            self.by_station.setdefault((station, month), self.rule_id(text))
+
+    def resolve(self, province, city, month, station=None):
+        """单独设置 → 市级 → 省级，返回规则编号（没有为 -1）。"""
+        month = int(month)
+        for hit in (
+            self.by_station.get((station, month)) if station is not None else None,
+            self.by_city.get((province, _city(city), month)),
+            self.by_province.get((province, month)),
+        ):
+            if hit is not None:
+                return hit
+        return -1
+
+    # ---------- 编译结果 ----------
+    def _compile(self):
+        if self._compiled < len(self.texts):
+            new = compile_rules(self.texts[self._compiled:], start=self._compiled)
+            self._lines = new if self._lines.empty else pd.concat([self._lines, new], ignore_index=True)
+            self._compiled = len(self.texts)
+
+    @property
+    def lines(self):
+        self._compile()
+        return self._lines
+
+    @property
+    def flat(self):
+        return flat_rules(self.lines, len(self.texts))
+
+    # ---------- 站点 ----------
+    def station_rules(self, df_station, month, column=None):
+        """
+        站点表 → 每个站点本月的规则编号数组（int64，-1 表示没有时段）。
+        column 为站点表里本月的时段列（默认 电费-X月）；有内容的直接用站点自己的文本，
+        空白的按 单独设置 → 市级 → 省级 补齐。相同的 (站点, 省份, 城市) 只查一次。
+        """
+        n = len(df_station)
+        column = column or month_column(month)
+        if column in df_station.columns:
+            codes = self.rule_ids(df_station[column].tolist())
+        else:
+            codes = np.full(n, -1, dtype=np.int64)
+
+        todo = np.flatnonzero(codes < 0)
+        if len(todo):
+            stations = _values(df_station, "站点名称", n)
+            provinces = _values(df_station, "所在省份", n)
+            cities = _values(df_station, "所属市区", n)
+            cache = {}
+            for i in todo:
+                key = (stations[i], provinces[i], cities[i])
+                if key not in cache:
+                    cache[key] = self.resolve(provinces[i], cities[i], month, stations[i])
+                codes[i] = cache[key]
+        return codes
+
+    # ---------- 展示 / 导出 ----------
+    def table(self):
+        """日历条目 → DataFrame（CALENDAR_COLS），按省份、城市、月份排序。"""
+        rows = [(p, "", m, self.texts[r]) for (p, m), r in self.by_province.items()]
+        rows += [(p, c, m, self.texts[r]) for (p, c, m), r in self.by_city.items()]
+        out = pd.DataFrame(rows, columns=CALENDAR_COLS)
+        return out.sort_values(["省份", "城市", "月份"], kind="stable").reset_index(drop=True)
+
+    def overrides(self):
+        rows = [(s, m, self.texts[r]) for (s, m), r in self.by_station.items()]
+        return pd.DataFrame(rows, columns=OVERRIDE_COLS)
+
+    def summary(self):
+        return {
+            "省份": len({p for p, _ in self.by_province}),
+            "省级条目": len(self.by_province),
+            "市级条目": len(self.by_city),
+            "单独设置": len(self.by_station),
+            "不同时段文本": len(self.texts),
+        }
+
+    def format_summary(self):
+        s = self.summary()
+        return (
+            f"分时日历：{s['省份']} 个省份，{s['省级条目']} 条省级、{s['市级条目']} 条市级条目，"
+            f"{s['单独设置']} 个站点·月单独设置，共 {s['不同时段文本']} 种不同时段（各只解析一次）"
+        )
+
+    # ---------- 从站点表推日历 ----------
+    @classmethod
+    def from_stations(cls, df_station, table=None, columns=None, overrides=None):
+        """
+        站点表 → 日历。table / overrides 为已有的日历条目和单独设置（优先）；没覆盖到的 省份 × 月份 取站点里最常见的时段文本，
+        某个城市的站点多数与省级不同时加一条市级条目；与日历解析结果仍不同的站点记为单独设置。
+        columns：{月份: 站点表里的时段列}，默认取存在的 电费-1月 … 电费-12月。
+        """
+        cal = cls(table, overrides)
+        if columns is None:
+            columns = {m: month_column(m) for m in MONTHS if month_column(m) in df_station.columns}
+
+        n = len(df_station)
+        stations = _values(df_station, "站点名称", n)
+        provinces = _values(df_station, "所在省份", n)
+        cities = [_city(c) for c in _values(df_station, "所属市区", n)]
+
+        for month, col in columns.items():
+            if col not in df_station.columns:
+                continue
+            frame = pd.DataFrame({
+                "站点": stations,
+                "省份": provinces,
+                "城市": cities,
+                "时段": [_text(t) for t in df_station[col].tolist()],
+            }, dtype=object)
+            frame = frame[frame["时段"].notna() & frame["省份"].map(lambda p: _text(p) is not None)]
+            if frame.empty:
+                continue
+
+            for p, text in frame.groupby("省份", sort=False)["时段"].agg(_most_common).items():
+                cal.add(p, "", month, text)
+
+            in_city = frame[frame["城市"] != ""]
+            for (p, c), text in in_city.groupby(["省份", "城市"], sort=False)["时段"].agg(_most_common).items():
+                if cal.resolve(p, c, month) != cal.rule_id(text):
+                    cal.add(p, c, month, text)
+
+            # 与日历不同的站点记为单独设置（相同的 省份 + 城市 只查一次）
+            pair = frame.groupby(["省份", "城市"], sort=False).ngroup().to_numpy()
+            firsts = frame.iloc[np.unique(pair, return_index=True)[1]]
+            resolved = np.array([cal.resolve(p, c, month) for p, c in zip(firsts["省份"], firsts["城市"])])
+            differ = resolved[pair] != cal.rule_ids(frame["时段"])
+            for s, text in zip(frame["站点"][differ], frame["时段"][differ]):
+                cal.add_override(s, month, text)
+        return cal
+
+
+def _values(df, col, n):
+    return df[col].tolist() if col in df.columns else [None] * n
@@ -1,10 +1,19 @@
 # -*- coding: utf-8 -*-
-import streamlit as st
-import pandas as pd
+import time
+from datetime import datetime
 from io import BytesIO
-import requests
-import pdfplumber
-import re
+
+import pandas as pd
+import streamlit as st
+
+from core.crawler import PROVINCES, TariffCrawler, load_listings, parse_listing_lines, save_listings
+from core.extract_backends import AUTO, BACKENDS, compare_backends, load_province_backends, save_province_backends
+from core.fetch import PdfDownloader
+from core.history import TariffHistory, normalize_month
+from core.pdf_cache import get_pdf_cache
+from core.pdf_parser import DEFAULT_PARSE_WORKERS
+from core.pipeline import ParseJob
+from core.price_matrix import matrix_frame, voltages
 
 # ===============================
 # 页面标题区
@@ -71,457 +80,6 @@ st.markdown("""
 
 
 
-# ========================================================================
-# =============== 以下部分是 PDF 解析函数（可直接运行） ====================
-# ========================================================================
-
-HEADERS = {
-    "User-Agent": "Mozilla/5.0",
-    "Referer": "https://www.95598.cn/",
-    "Accept": "application/pdf",
-}
-
-def safe_float(x):
-    try:
-        return float(str(x).replace(",", ""))
-    except:
-        return None
-
-
-def download_pdf_to_file(url, idx):
-    resp = requests.get(url, headers=HEADERS, timeout=30)
-    resp.raise_for_status()
-    filename = f"power_price_{idx+1}.pdf"
-    with open(filename, "wb") as f:
-        f.write(resp.content)
-    return filename
-
-
-def detect_province_from_pdf(pdf_path):
-    with pdfplumber.open(pdf_path) as pdf:
-        text = pdf.pages[0].extract_text() or ""
-
-    # 去掉所有空白，避免“电力\n公司”这种被断行的情况
-    text_clean = re.sub(r"\s+", "", text)
-
-    start = text_clean.find("国网")
-    if start != -1:
-        end = text_clean.find("电力有限公司", start)
-        if end == -1:
-            end = text_clean.find("电力公司", start)
-        if end != -1:
-            company = text_clean[start + len("国网") : end]
-            province = company.strip()
-        else:
-            province = "未知省份"
-    else:
-        province = "未知省份"
-
-    # 小修正：重庆 → 重庆市
-    if province == "重庆":
-        province = "重庆市"
-    if province == "未知省份":
-        province = "上海市"
-    return province
-
-# ==========================
-# 基础小函数
-# ==========================
-def safe_float(x):
-    try:
-        return float(str(x).replace(",", ""))
-    except Exception:
-        return None
-
-def detect_columns(df):
-    """
-    返回：
-        period_cols: {'尖': col_idx, '峰': col_idx, ...} （只包含存在的档位）
-        non_time_col: 非分时电度电价所在列号（找不到则为 None）
-    """
-    period_kw_map = {
-        "尖": ["尖峰时段", "尖峰", "尖时段", "尖时"],
-        "峰": ["高峰时段", "高峰", "峰时段", "峰时"],
-        "平": ["平段", "平时段", "平时"],
-        "谷": ["低谷时段", "低谷", "谷段", "谷时段", "谷时"],
-        "深": ["深谷时段", "深谷", "深时段", "深时"],
-    }
-
-    non_time_kws = [
-        "非分时电度电价",
-        "非分时电量电价",
-        "非分时电价",
-    ]
-
-    period_cols = {}
-    non_time_col = None
-
-    # ⚠ 不要再提前 break，整张表都扫一遍，后面的行可以覆盖前面的误判
-    for _, row in df.iterrows():
-        for col_idx, cell in enumerate(row):
-            s = str(cell) if cell is not None else ""
-
-            # 1）非分时电价列
-            if any(kw in s for kw in non_time_kws):
-                non_time_col = col_idx
-
-            # 2）分时档位列
-            # 🔹 先专门处理“尖峰时段 / 尖峰” —— 强制认为只有“尖”
-            if any(w in s for w in ["尖峰时段", "尖峰"]):
-                matched_shorts = ["尖"]
-            else:
-                matched_shorts = []
-                for short, kws in period_kw_map.items():
-                    if any(kw in s for kw in kws):
-                        matched_shorts.append(short)
-
-            # 只在“只命中一个档位”的单元格里认列号
-            if len(matched_shorts) == 1:
-                short = matched_shorts[0]
-                period_cols[short] = col_idx
-            else:
-                continue
-    return period_cols, non_time_col
-# ---------- 修复四川：更稳健地识别表头 ----------
-def get_header_time_labels(df):
-    """
-    在整张表里扫描，找到包含分时档关键字的一行，用这行判断分时档位的顺序，
-    映射为 ['尖','峰','平','谷','深'] 中的一部分。
-    优先选择「包含尖峰」的行，若没有再退而求其次。
-    """
-    raw_to_short = {
-        # 尖 / 尖峰
-        "尖峰时段": "尖", "尖峰": "尖", "尖时段": "尖", "尖时": "尖", "尖": "尖",
-        # 峰（高峰、峰段、峰时等）
-        "高峰时段": "峰", "高峰": "峰", "峰段": "峰",
-        "峰时段": "峰", "峰时": "峰", "峰": "峰",
-        # 平
-        "平段": "平", "平时段": "平", "平时": "平", "平": "平",
-        # 谷
-        "低谷时段": "谷", "低谷": "谷", "谷段": "谷",
-        "谷时段": "谷", "谷时": "谷", "谷": "谷",
-        # 深谷 / 深
-        "深谷时段": "深", "深谷": "深", "深时段": "深", "深时": "深", "深": "深",
-    }
-
-    # ---------- 第 1 轮：优先找包含“尖峰”的表头行 ----------
-    header_text = ""
-    # 优先找包含“尖峰”的行
-    for _, row in df.iterrows():
-        row_text = "".join(str(c) for c in row)
-        if "尖峰" in row_text:
-            hits = set()
-            for raw in raw_to_short.keys():
-                if raw in row_text:
-                    hits.add(raw_to_short[raw])
-            if len(hits) >= 2:
-                header_text = row_text
-                break
-
-    # ---------- 第 2 轮：如果没有尖峰，再退而求其次 ----------
-    if not header_text:
-        # 再找任意包含两个以上时段关键字的行
-        for _, row in df.iterrows():
-            row_text = "".join(str(c) for c in row)
-            hits = set()
-            for raw in raw_to_short.keys():
-                if raw in row_text:
-                    hits.add(raw_to_short[raw])
-            if len(hits) >= 2:
-                header_text = row_text
-                break
-
-    if not header_text:
-        # 没识别到，说明这个省可能完全没有分时电价
-        return []
-
-    positions = []
-    for raw, short in raw_to_short.items():
-        idx = header_text.find(raw)
-        if idx != -1:
-            positions.append((idx, short))
-
-    positions.sort(key=lambda x: x[0])
-
-    ordered = []
-    for _, short in positions:
-        if short not in ordered:
-            ordered.append(short)
-
-    return ordered
-
-def get_time_cluster_from_row(row):
-    values = list(row)
-    cluster_rev = []
-    started = False
-    count = 0
-
-    # 从右向左，最多抓 5 个“像电价的数字”
-    for cell in reversed(values):
-        v = safe_float(cell)
-        if v is not None and 0.05 <= v <= 10:
-            if not started:
-                started = True
-            if count < 5:
-                cluster_rev.append(v)
-                count += 1
-            else:
-                break
-        else:
-            if started:
-                break
-            else:
-                continue
-
-    return list(reversed(cluster_rev))
-
-def map_cluster_to_periods(cluster, period_order):
-    """
-    将分时电价簇（cluster）右对齐映射到 period_order 里。
-    返回：{'尖':None,'峰':x,'平':y,'谷':z,'深':None}
-    """
-    result = {p: None for p in ["尖", "峰", "平", "谷", "深"]}
-    if not period_order or not cluster:
-        return result
-
-    n = len(period_order)
-    m = len(cluster)
-
-    if m == n:
-        # 1 对 1 对齐
-        for i, p in enumerate(period_order):
-            result[p] = cluster[i]
-    else:
-        # 默认右对齐（缺尖时），兼容福建这类情况
-        offset = n - m
-        for i, p in enumerate(period_order):
-            j = i - offset
-            if 0 <= j < m:
-                result[p] = cluster[j]
-
-    return result
-
-
-def extract_row_prices(row, period_order):
-    """
-    从一行中抽取：非分时电价 + 分时电价（按 period_order 映射）
-    """
-    # 非分时电价 = 这一行第一个 0.1~2 之间的数
-    non_time = None
-    for cell in row:
-        v = safe_float(cell)
-        if v is not None and 0.1 <= v <= 2:
-            non_time = v
-            break
-
-    cluster = get_time_cluster_from_row(row)
-    period_vals = map_cluster_to_periods(cluster, period_order)
-
-    result = {"non_time": non_time}
-    result.update(period_vals)
-    return result
-
-# ---------- 修复上海：更通用的电压匹配 ----------
-def find_voltage_rows_1_10kv(df):
-    """
-    在整张表中找到“1-10（20）千伏 / 1-10千伏 / 10千伏”等行。
-    优先匹配 1-10（20）千伏，如果没有，再匹配 10千伏。
-    """
-    # 1) 先找 1-10（20）千伏 / 1-10千伏 / 1~10千伏
-    pattern_1_10 = re.compile(
-        r"1\s*[-~～至到]\s*10(?:（\s*20\s*）|\(\s*20\s*\))?\s*(千伏|kV|KV|千)"
-    )
-    idxs = []
-    for i, row in df.iterrows():
-        text = "".join(str(c) for c in row.values)
-        if pattern_1_10.search(text):
-            idxs.append(i)
-
-    if idxs:
-        return idxs
-
-    # 2) 如果完全没有 1-10 这种写法，退化为找 “10千伏”
-    pattern_10kv = re.compile(r"(^|[^0-9])10\s*千伏(?!安)")
-    idxs = []
-    for i, row in df.iterrows():
-        text = "".join(str(c) for c in row.values)
-        if pattern_10kv.search(text):
-            idxs.append(i)
-
-    return idxs
-def extract_row_prices_fallback(row, period_order):
-    # 非分时电价：这一行第一个 0.1~2 的数字
-    non_time = None
-    for cell in row:
-        v = safe_float(cell)
-        if v is not None and 0.1 <= v <= 2:
-            non_time = v
-            break
-
-    cluster = get_time_cluster_from_row(row)
-    period_vals = map_cluster_to_periods(cluster, period_order)
-
-    result = {"non_time": non_time}
-    result.update(period_vals)
-    return result
-
-# ==========================
-# 解析单个 PDF → 返回该省的 1-10kV 结果
-# ==========================
-def parse_single_pdf(pdf_path):
-    province = detect_province_from_pdf(pdf_path)
-    city = ""  # 目前国网表里没有城市这一层，就先留空
-
-    # 1. PDF → DataFrame
-    rows = []
-    with pdfplumber.open(pdf_path) as pdf:
-        for page in pdf.pages:
-            for table in page.extract_tables():
-                for row in table:
-                    clean = [c.strip() if isinstance(c, str) else c for c in row]
-                    if any(clean):
-                        rows.append(clean)
-
-    if not rows:
-        print(f"[{province}] 没有解析到任何表格。")
-        return pd.DataFrame()
-
-    df = pd.DataFrame(rows)
-    df.replace("", None, inplace=True)
-    df.dropna(how="all", axis=1, inplace=True)
-    df.dropna(how="all", axis=0, inplace=True)
-    df.reset_index(drop=True, inplace=True)
-
-    # 2. 识别分时档顺序
-    period_cols, non_time_col = detect_columns(df)
-    print(f"[{province}] 检测到列：", period_cols, " 非分时列 =", non_time_col)
-
-
-    voltage_label = "1-10（20）千伏"  # 只是最终输出的展示文字
-    row_indices = find_voltage_rows_1_10kv(df)
-
-    if not row_indices:
-        print(f"[{province}] 未找到 1-10（20）千伏 / 10千伏 行，跳过。")
-        return pd.DataFrame()
-
-    if "浙江" in province:
-        # 浙江取第 2、3 条
-        if len(row_indices) >= 3:
-            row_indices = row_indices[1:3]
-            row_indices = [row_indices[1], row_indices[0]]
-        else:
-            row_indices = row_indices[:2]
-            row_indices = [row_indices[1], row_indices[0]]
-
-    elif "江苏" in province:
-        # 江苏 PDF 里是 先两部制 后单一制，需要反过来
-        row_indices = row_indices[:2]
-        if len(row_indices) == 2:
-            row_indices = [row_indices[1], row_indices[0]]
-
-    else:
-        # 其他省份：默认取前两条（单一制 + 两部制）
-        row_indices = row_indices[:2]
-    rows_out = []
-
-    for pos, idx in enumerate(row_indices):
-        row = df.iloc[idx]
-
-        # 5. 读取价格（你原来的逻辑）
-        if period_cols:
-            price_info = {"non_time": None, "尖": None, "峰": None, "平": None, "谷": None, "深": None}
-
-            # 非分时电价
-            if non_time_col is not None and non_time_col < len(row):
-                price_info["non_time"] = safe_float(row[non_time_col])
-            # 兜底再扫一遍
-            if price_info["non_time"] is None:
-                for cell in row:
-                    v = safe_float(cell)
-                    if v is not None and 0.1 <= v <= 2:
-                        price_info["non_time"] = v
-                        break
-
-            # 各分时段
-            for p, col_idx in period_cols.items():
-                if col_idx < len(row):
-                    price_info[p] = safe_float(row[col_idx])
-
-        else:
-            period_order = get_header_time_labels(df)
-            price_info = extract_row_prices_fallback(row, period_order)
-
-        # ------------------------------------------------------------------
-        # 【新增】浙江省专用修正：去掉“政府性基金”那一列，只保留 尖/峰/平/谷
-        # ------------------------------------------------------------------
-        if "浙江" in province:
-            cluster = get_time_cluster_from_row(row)  # 例如 [0.0292, 1.3162, 1.0969, 0.6648, 0.2526]
-
-            # 如果前面有一个很小的数（通常是政府性基金），把它丢掉，只保留后 4 个
-            while len(cluster) > 4 and cluster[0] is not None and cluster[0] < 0.1:
-                cluster = cluster[1:]
-
-            if len(cluster) == 4:
-                # 保留原来算出来的 non_time（不分时电价）
-                non_time_val = price_info.get("non_time")
-
-                price_info = {
-                    "non_time": non_time_val,
-                    "尖": cluster[0],
-                    "峰": cluster[1],
-                    "平": cluster[2],
-                    "谷": cluster[3],
-                    "深": None,  # 浙江没有深谷
-                }
-        # ------------------------------------------------------------------
-
-        # 6. 行标签：单一制 / 两部制 / 方案3...
-        if pos == 0:
-            scheme = "单一制"
-        elif pos == 1:
-            scheme = "两部制"
-        else:
-            scheme = f"方案{pos + 1}"
-
-        rows_out.append(
-            {
-                "省份": province,
-                "城市": city if province != "重庆市" else "重庆市",
-                "制度": scheme,
-                "电压等级": voltage_label,
-                "不分时电价": price_info["non_time"],
-                "尖": price_info["尖"],
-                "峰": price_info["峰"],
-                "平": price_info["平"],
-                "谷": price_info["谷"],
-                "深": price_info["深"],
-            }
-        )
-
-    return pd.DataFrame(rows_out)
-
-def parse_price_from_urls(url_list):
-    results = []
-    errors = []
-
-    for i, url in enumerate(url_list):
-        try:
-            file = download_pdf_to_file(url, i)
-            df_one = parse_single_pdf(file)
-            if df_one.empty:
-                errors.append((url, "未能识别有效电价行"))
-            else:
-                results.append(df_one)
-
-        except Exception as e:
-            errors.append((url, str(e)))
-
-    if results:
-        df_final = pd.concat(results, ignore_index=True)
-    else:
-        df_final = pd.DataFrame()
-
-    return df_final, errors
 # ========================================================================
 # =============================== UI 部分 ================================
 # ========================================================================
@@ -535,29 +93,166 @@ st.markdown("""
 </div>
 """, unsafe_allow_html=True)
 
-st.caption("支持一次粘贴多个链接，每行一个；仅支持国网 95598 公示的电价 PDF。")
+input_mode = st.radio(
+    "链接来源",
+    ["手动粘贴 PDF 链接", "自动发现（从列表页找各省最新一期）"],
+    horizontal=True,
+)
+
+if input_mode == "手动粘贴 PDF 链接":
+    st.caption("支持一次粘贴多个链接，每行一个；仅支持国网 95598 公示的电价 PDF。")
+
+    url_text = st.text_area(
+        "每行一个 PDF 链接",
+        height=200,
+        placeholder="https://www.95598.cn/...pdf\nhttps://www.95598.cn/...pdf"
+    )
+else:
+    st.caption("每行一个列表页，可在 URL 后空格加省份名；只解析没抓过、内容也没见过的新文档。列表页配置会自动保存。")
+
+    listing_text = st.text_area(
+        "列表页（每行一个）",
+        value=load_listings(),
+        height=160,
+        placeholder="https://www.95598.cn/.../list.shtml 浙江省",
+    )
 
-url_text = st.text_area(
-    "每行一个 PDF 链接",
-    height=200,
-    placeholder="https://www.95598.cn/...pdf\nhttps://www.95598.cn/...pdf"
+parse_workers = st.number_input(
+    "解析进程数（1 = 单进程串行；多核机器上调大可并行解析多个 PDF）",
+    min_value=1,
+    max_value=max(1, DEFAULT_PARSE_WORKERS * 2),
+    value=min(4, DEFAULT_PARSE_WORKERS),
 )
 
+col_pf, col_cmp = st.columns(2)
+with col_pf:
+    prefilter = st.checkbox("页面预筛（只在含「千伏 / 分时表头」的区域抽表）", value=True)
+with col_cmp:
+    measure_full = st.checkbox("同时测量全量抽表耗时（评估加速比，会更慢）", value=False)
+
+col_be, col_becmp = st.columns(2)
+with col_be:
+    backend_labels = {AUTO: "按省份自动选择", **{name: name for name in BACKENDS}}
+    backend = st.selectbox(
+        "抽表引擎（geometry = 按表格线 / 文字坐标直接拼表，更快）",
+        list(backend_labels),
+        format_func=backend_labels.get,
+    )
+with col_becmp:
+    compare_mode = st.checkbox("对比各抽表引擎（解析完后逐个文档各引擎重跑一遍，报告耗时和结果是否一致）", value=False)
+
+with st.expander("按省份选择抽表引擎"):
+    province_backends = load_province_backends()
+    geo_provinces = st.multiselect(
+        "这些省份用 geometry 引擎（其余省份用 pdfplumber）",
+        sorted(set(PROVINCES) | set(province_backends)),
+        default=[p for p, name in province_backends.items() if name == "geometry"],
+    )
+    st.caption("建议先勾选上面的「对比各抽表引擎」，确认某省结果一致后再切换。")
+    if st.button("保存省份引擎配置"):
+        save_province_backends({p: "geometry" for p in geo_provinces})
+        st.success("已保存")
+
+col_month, col_save = st.columns(2)
+with col_month:
+    price_month = st.text_input("电价生效月份（YYYY-MM）", value=datetime.now().strftime("%Y-%m"))
+with col_save:
+    save_history = st.checkbox("解析结果存入电价历史库（Page2 / Page3 可按月份直接加载）", value=True)
+
 # 解析按钮
 if st.button("▶ 解析电价", use_container_width=True):
 
-    urls = [u.strip() for u in url_text.splitlines() if u.strip()]
+    crawler = found = fresh = None
+    if input_mode == "手动粘贴 PDF 链接":
+        urls = [u.strip() for u in url_text.splitlines() if u.strip()]
+    else:
+        if not parse_listing_lines(listing_text):
+            st.error("❌ 请至少填写一个列表页")
+            st.markdown("</div>", unsafe_allow_html=True)
+            st.stop()
+        save_listings(listing_text)
+
+        with st.spinner("正在检查列表页……"):
+            crawler = TariffCrawler()
+            found = crawler.discover(listing_text)
+            with PdfDownloader(cache=get_pdf_cache(), rate_limiter=crawler.rate_limiter) as downloader:
+                fresh = crawler.fetch_new(found, downloader)
+
+        st.dataframe(found, use_container_width=True)
+        with st.expander("列表页抓取记录"):
+            st.dataframe(pd.DataFrame(crawler.page_log, columns=["页面", "结果"]), use_container_width=True)
+        urls = list(fresh)
+
+        if not urls:
+            st.info("没有发现新文档：各省最新一期都已经解析过了。")
+            st.markdown("</div>", unsafe_allow_html=True)
+            st.stop()
 
     if not urls:
         st.error("❌ 请至少粘贴一个链接")
         st.markdown("</div>", unsafe_allow_html=True)
         st.stop()
 
-    with st.spinner("正在解析 PDF 电价表，请稍候…"):
-        df_price, errors = parse_price_from_urls(urls)
+    # 下载 / 解析在后台线程里跑，这里每隔一会儿把新完成的文档刷到页面上
+    job = ParseJob(
+        urls,
+        parse_workers=int(parse_workers),
+        prefilter=prefilter,
+        measure_full=measure_full,
+        backend=backend,
+    ).start()
+
+    live = st.empty()
+    with live.container():
+        progress = st.progress(0.0, text=f"正在解析 PDF 电价表：0 / {job.total}")
+        live_rows = st.empty()
+        live_errors = st.empty()
+        live_stats = st.empty()
+
+    live_dfs, live_errs, live_timing = [], [], []
+    while True:
+        finished = job.done
+        new_events = job.drain(timeout=0.3)
+        for ev in new_events:
+            live_timing.append({"URL": ev.url, "状态": "失败" if ev.error else "成功", **ev.stats})
+            if ev.error is not None:
+                live_errs.append((ev.url, ev.error))
+            else:
+                live_dfs.append(ev.df)
+
+        if new_events:
+            n_done = len(job.events)
+            progress.progress(n_done / job.total, text=f"正在解析 PDF 电价表：{n_done} / {job.total}")
+            if live_dfs:
+                live_rows.dataframe(pd.concat(live_dfs, ignore_index=True), use_container_width=True)
+            if live_errs:
+                live_errors.dataframe(pd.DataFrame(live_errs, columns=["URL", "错误信息"]), use_container_width=True)
+            live_stats.dataframe(pd.DataFrame(live_timing), use_container_width=True)
+
+        if finished:
+            break
+        time.sleep(0.05)
+
+    df_price, errors = job.result()
+    live.empty()   # 过程表换成下面按输入顺序排好的最终结果
+
+    if crawler is not None:
+        crawler.mark_parsed(found, fresh, errors)   # 解析失败的不入库，下次再试
+    parse_stats = df_price.attrs.get("parse_stats", [])
 
     # 把结果存入 session_state，后续 Page2 直接沿用
     st.session_state["price_raw"] = df_price
+    # 全部电压等级（一次解析取全），Page2 / Page3 可以从历史库按电压等级加载
+    df_matrix = matrix_frame(df_price.attrs.get("price_matrix", []))
+    st.session_state["price_matrix"] = df_matrix
+    st.session_state["price_month"] = price_month.strip()
+
+    saved = 0
+    if save_history and df_price is not None and not df_price.empty:
+        try:
+            saved = TariffHistory().save(df_matrix if not df_matrix.empty else df_price, price_month.strip(), source="raw")
+        except ValueError as e:
+            st.warning(f"未存入电价历史库：{e}")
 
     st.markdown("</div>", unsafe_allow_html=True)
 
@@ -572,8 +267,14 @@ if st.button("▶ 解析电价", use_container_width=True):
 
     if df_price is not None and not df_price.empty:
         st.success(f"解析完成：共 {len(df_price)} 条记录")
+        if saved:
+            st.caption(f"已存入电价历史库：{normalize_month(price_month.strip())}（解析版，全部电压等级）{saved} 条")
         st.dataframe(df_price, use_container_width=True)
 
+        if not df_matrix.empty:
+            with st.expander(f"全部电压等级（{'、'.join(voltages(df_matrix))}）"):
+                st.dataframe(df_matrix, use_container_width=True)
+
         buf = BytesIO()
         df_price.to_excel(buf, index=False)
         st.download_button(
@@ -601,6 +302,45 @@ if st.button("▶ 解析电价", use_container_width=True):
         st.dataframe(err_df, use_container_width=True)
         st.markdown("</div>", unsafe_allow_html=True)
 
+    # 输出卡片：每个文档的解析耗时 / 预筛效果
+    if parse_stats:
+        st.markdown("<div class='card'>", unsafe_allow_html=True)
+        st.markdown("""
+        <div class='card-title'>
+            <div class='icon-circle'>⏱</div>
+            解析耗时统计
+        </div>
+        """, unsafe_allow_html=True)
+        st.dataframe(pd.DataFrame(parse_stats), use_container_width=True)
+        st.markdown("</div>", unsafe_allow_html=True)
+
+    # 输出卡片：抽表引擎对比（PDF 从本地缓存读，不再下载）
+    if compare_mode:
+        st.markdown("<div class='card'>", unsafe_allow_html=True)
+        st.markdown("""
+        <div class='card-title'>
+            <div class='icon-circle'>⚖️</div>
+            抽表引擎对比
+        </div>
+        """, unsafe_allow_html=True)
+        cache = get_pdf_cache()
+        compare_rows = []
+        with st.spinner("正在用各引擎重跑……"):
+            for url in urls:
+                sha = cache.lookup(url)
+                if sha is None:
+                    continue
+                try:
+                    for r in compare_backends(cache.read(sha), prefilter=prefilter):
+                        compare_rows.append({"URL": url, **r})
+                except Exception as e:
+                    compare_rows.append({"URL": url, "错误信息": str(e)})
+        if compare_rows:
+            st.dataframe(pd.DataFrame(compare_rows), use_container_width=True)
+        else:
+            st.info("没有可对比的文档（PDF 不在本地缓存里）。")
+        st.markdown("</div>", unsafe_allow_html=True)
+
 else:
     # 没点按钮时，正常关闭输入卡片的 div
     st.markdown("</div>", unsafe_allow_html=True)
@@ -1,17 +1,26 @@
 # -*- coding: utf-8 -*-
+import os
 import streamlit as st
 import pandas as pd
 from io import BytesIO
+from datetime import datetime
 
-PRICE_COLS = ["不分时电价", "尖", "峰", "平", "谷", "深"]  # 你实际有哪些就写哪些
+from core import edit_log, excel_cache, table_diff
+from core.history import TariffHistory, normalize_month, page_columns
+from core.price_matrix import VOLTAGE_1_10_LABEL
+
+
+def _previous_month(month):
+    try:
+        return str(pd.Period(month.strip(), freq="M") - 1)
+    except ValueError:
+        return None
+
+
+def _record_edit(editor_key, view_index):
+    """表格每提交一次修改，只把改动的格子记进增量日志（见 core/edit_log.py）。"""
+    edit_log.record(st.session_state["price_edit"], view_index, st.session_state[editor_key])
 
-def cast_price_cols(df: pd.DataFrame) -> pd.DataFrame:
-    """把所有价钱列统一转成 float，避免 object 混在一起导致奇怪的复制行为。"""
-    df = df.copy()
-    for col in PRICE_COLS:
-        if col in df.columns:
-            df[col] = pd.to_numeric(df[col], errors="coerce")
-    return df
 
 # ================================
 # 页面标题区
@@ -33,9 +42,9 @@ st.markdown("""
     操作流程
 </div>
 
-1. 选择电价表来源（上传 Excel 或使用 Page1 自动解析结果）。  
-2. 进入可编辑表格界面，可执行增删改查（支持快捷键）。  
-3. 点击“保存修正版”，系统将数据保存到全局，并可下载 Excel 文件。  
+1. 选择电价表来源（上传 Excel、使用 Page1 自动解析结果，或从电价历史库按月份加载）。  
+2. 进入可编辑表格界面，可按省份 / 制度筛选后执行增删改查（支持快捷键、撤销 / 重做）。  
+3. 点击“保存修正版”，系统将数据保存到全局和电价历史库（按生效月份），并可下载 Excel 文件。  
 4. 修正版将用于 Page3（电费计算）与 Page6（总价计算）。
 """, unsafe_allow_html=True)
 st.markdown("</div>", unsafe_allow_html=True)
@@ -54,35 +63,59 @@ st.markdown("""
 
 source = st.radio(
     "请选择电价来源：",
-    ["从 Page1 导入电价表（推荐）", "上传 Excel 文件"],
+    ["从 Page1 导入电价表（推荐）", "从电价历史库加载", "上传 Excel 文件"],
     horizontal=False
 )
 
-df: pd.DataFrame | None = None
+history = TariffHistory()
+
+# 数据来源只记「从哪来 + 怎么取」，真正取表 / 转 float 只在来源变了、新建编辑会话时做一次
+load = None
+src_key = None
 df_fixed = st.session_state.get("price_fixed")   # 已保存的修正版（如果有）
 
 # ---------------------------
 # 情况 1：优先使用已保存的修正版
 # ---------------------------
 if df_fixed is not None:
-    df = cast_price_cols(df_fixed)   # 👈 先把价钱列转 float
+    load, src_key = (lambda: df_fixed), edit_log.state_source_key(st.session_state, "fixed", df_fixed)
     st.info("当前加载的是 **上次保存的电价修正版**。如需重新从 Page1 或 Excel 载入，请先在下方选择来源并重新上传/解析。")
 
 # ---------------------------
 # 如果还没有修正版，再按来源取数据
 # ---------------------------
-if df is None:
+if load is None:
     if source == "从 Page1 导入电价表（推荐）":
         df_raw = st.session_state.get("price_raw")
         if df_raw is None:
             st.warning("⚠ Page1 尚未解析电价，请先前往 Page1 进行解析，或选择上传 Excel 文件。")
         else:
-            df = cast_price_cols(df_raw)
+            load, src_key = (lambda: df_raw), edit_log.state_source_key(st.session_state, "raw", df_raw)
+    elif source == "从电价历史库加载":
+        months = history.months()
+        if not months:
+            st.warning("⚠ 电价历史库还是空的，请先在 Page1 解析并存库，或选择其他来源。")
+        else:
+            month = st.selectbox("选择生效月份", months)
+            voltage_opts = history.voltages(month)
+            voltage = st.selectbox(
+                "电压等级",
+                voltage_opts,
+                index=voltage_opts.index(VOLTAGE_1_10_LABEL) if VOLTAGE_1_10_LABEL in voltage_opts else 0,
+            )
+            with st.expander("电价历史库概览"):
+                st.dataframe(history.summary(), use_container_width=True)
+            df_hist = history.load_month(month, voltage=voltage)   # 同一行矫正版优先，没有再用解析版
+            if df_hist.empty:
+                st.warning(f"⚠ 历史库中没有 {month} 的电价。")
+            else:
+                st.session_state["price_month"] = month
+                load, src_key = (lambda: page_columns(df_hist)), edit_log.source_key("history", None, month, voltage)
     else:
         uploaded_file = st.file_uploader("上传电价 Excel 文件", type=["xlsx"])
         if uploaded_file:
-            df_up = pd.read_excel(uploaded_file)
-            df = cast_price_cols(df_up)
+            load = lambda: excel_cache.read_excel(uploaded_file)
+            src_key = edit_log.source_key("upload", None, uploaded_file.file_id)
 
 st.markdown("</div>", unsafe_allow_html=True)
 
@@ -90,7 +123,7 @@ st.markdown("</div>", unsafe_allow_html=True)
 # ================================
 # 可编辑表格
 # ================================
-if df is not None:
+if load is not None:
 
     st.markdown("<div class='card'>", unsafe_allow_html=True)
     st.markdown("""
@@ -100,26 +133,71 @@ if df is not None:
     </div>
     """, unsafe_allow_html=True)
 
-    st.info("🔧 提示：在表格中可直接增删改查，并支持快捷键编辑（如 Delete / Ctrl+X）。")
+    st.info("🔧 提示：在表格中可直接增删改查，并支持快捷键编辑（如 Delete / Ctrl+X）。全国表较大时先按省份 / 制度筛选再改。")
+
+    # 编辑会话：基准表 + 增量日志（同一来源跨页面重跑沿用，撤销历史也在里面）
+    edit = edit_log.ensure_session(st.session_state, src_key, load)
+    current = edit_log.current_frame(edit)
+
+    filter_cols = st.columns(len(edit_log.FILTER_COLS))
+    filters = {
+        col: box.multiselect(f"按{col}筛选（不选 = 全部）", edit_log.filter_options(current, col), key=f"price_edit_filter_{col}")
+        for col, box in zip(edit_log.FILTER_COLS, filter_cols)
+    }
+    view = edit_log.filter_view(current, filters)
 
-    # 用 df 作为当前可编辑基准（无论是原始数据还是修正版）
-    edited_df = st.data_editor(
-        df,
+    # 只把筛出来的行交给表格；每次提交修改都在回调里记一步增量，并换一个 key 让表格按最新结果重新显示
+    editor_key = f"price_editor_{edit['version']}"
+    st.data_editor(
+        view,
         num_rows="dynamic",      # 允许增删行
         use_container_width=True,
-        key="price_editor"
+        key=editor_key,
+        on_change=_record_edit,
+        args=(editor_key, view.index),
+    )
+
+    undo_col, redo_col, reset_col = st.columns(3)
+    undo_col.button("↩ 撤销", on_click=edit_log.undo, args=(edit,), disabled=not edit_log.can_undo(edit),
+                    use_container_width=True)
+    redo_col.button("↪ 重做", on_click=edit_log.redo, args=(edit,), disabled=not edit_log.can_redo(edit),
+                    use_container_width=True)
+    reset_col.button("🗑 放弃全部修改", on_click=edit_log.reset, args=(edit,), disabled=not edit_log.can_undo(edit),
+                     use_container_width=True)
+
+    st.caption(
+        f"共 {len(current)} 行，当前显示 {len(view)} 行；已修改 {edit_log.change_count(edit)} 处"
+        f"（第 {edit['cursor']} / {len(edit['steps'])} 步）。"
+    )
+    if edit["cursor"]:
+        with st.expander("修改记录"):
+            st.dataframe(edit_log.changes_frame(edit), use_container_width=True, hide_index=True)
+
+    price_month = st.text_input(
+        "电价生效月份（YYYY-MM，保存时同步写入电价历史库）",
+        value=st.session_state.get("price_month") or datetime.now().strftime("%Y-%m"),
     )
 
     # 保存按钮
     if st.button("💾 保存电价修正版", use_container_width=True):
-        cleaned = cast_price_cols(edited_df)   # 再清洗一次，防止复制出的字符串被乱广播
+        cleaned = edit_log.saved_frame(edit)   # 价钱列在载入 / 记录增量时已转成 float
         st.session_state["price_fixed"] = cleaned
+        # 下次重跑来源变成刚存的修正版，沿用当前会话（日志和撤销历史都还在）
+        edit["source"] = edit_log.state_source_key(st.session_state, "fixed", cleaned)
+        st.session_state["price_month"] = price_month.strip()
 
-        st.success("已保存修正版，可用于 Page3 & Page6。")
+        # 整月覆盖：编辑时删掉的行，历史库里的矫正版也一并删掉
+        try:
+            saved = history.save(cleaned, price_month.strip(), source="fixed", replace_month=True)
+        except ValueError as e:
+            st.success("已保存修正版，可用于 Page3 & Page6。")
+            st.error(f"未写入电价历史库：{e}")
+        else:
+            st.success(f"已保存修正版，可用于 Page3 & Page6；已写入电价历史库 {normalize_month(price_month.strip())}（矫正版）{saved} 条。")
 
     # 下载当前编辑内容（无论是否点击保存）
     buf = BytesIO()
-    cast_price_cols(edited_df).to_excel(buf, index=False)
+    edit_log.saved_frame(edit).to_excel(buf, index=False)
     st.download_button(
         "📥 下载当前电价表（Excel）",
         buf.getvalue(),
@@ -130,6 +208,80 @@ if df is not None:
 
     st.markdown("</div>", unsafe_allow_html=True)
 
+    # ================================
+    # 差异对比（当前表 vs Page1 解析结果 / 历史库某月）
+    # ================================
+    st.markdown("<div class='card'>", unsafe_allow_html=True)
+    st.markdown("""
+    <div class='card-title'>
+        <div class='icon-circle'>🔍</div>
+        差异对比
+    </div>
+    """, unsafe_allow_html=True)
+
+    compare_opts = []
+    if st.session_state.get("price_raw") is not None:
+        compare_opts.append("Page1 解析结果")
+    history_months = history.months()
+    if history_months:
+        compare_opts.append("电价历史库某月")
+
+    if not compare_opts:
+        st.info("没有可对比的表：Page1 尚未解析，电价历史库也是空的。")
+    else:
+        compare_with = st.radio("对比对象", compare_opts, horizontal=True, key="price_diff_with")
+        current = edit_log.current_frame(edit)
+        if compare_with == "Page1 解析结果":
+            df_raw = st.session_state["price_raw"]
+            load_old = lambda: df_raw
+            old_key = edit_log.state_source_key(st.session_state, "raw", df_raw)
+            old_label = "Page1 解析结果"
+        else:
+            prev = _previous_month(price_month)
+            diff_month = st.selectbox(
+                "对比月份（默认上个月）",
+                history_months,
+                index=history_months.index(prev) if prev in history_months else 0,
+                key="price_diff_month",
+            )
+
+            def load_old():
+                df_old = page_columns(history.load_month(diff_month))
+                # 只比当前表里有的电压等级，不然其他电压等级全算成「删除」
+                if "电压等级" in current.columns and "电压等级" in df_old.columns:
+                    df_old = df_old[df_old["电压等级"].isin(current["电压等级"].dropna().unique())]
+                return df_old
+
+            # 历史库文件的修改时间也算进去：别处存了新电价，对比结果跟着更新
+            old_key = ("history", diff_month, os.path.getmtime(history.path))
+            old_label = f"历史库 {diff_month}"
+
+        # 对比对象、编辑会话、编辑版本都没变的重跑（切换显示方式、筛选等）直接用上次的结果
+        diff = table_diff.cached_diff(st.session_state, (old_key, edit["source"], edit["version"]), load_old, current)
+        overview = table_diff.summary(diff)
+        rows = overview["行"]
+        c1, c2, c3, c4 = st.columns(4)
+        c1.metric("修改行", rows[table_diff.STATUS_CHANGED])
+        c2.metric("新增行", rows[table_diff.STATUS_ADDED])
+        c3.metric("删除行", rows[table_diff.STATUS_DELETED])
+        c4.metric("改动格子", overview["改动格子数"])
+        st.caption(f"以 {old_label} 为原值、当前编辑结果为新值，按 省份 / 城市 / 制度 / 电压等级 对齐。")
+
+        if rows[table_diff.STATUS_CHANGED] + rows[table_diff.STATUS_ADDED] + rows[table_diff.STATUS_DELETED] == 0:
+            st.success("两张表完全一致。")
+        else:
+            diff_view = st.radio("显示方式", ["按省份汇总", "高亮表格", "变更明细"], horizontal=True, key="price_diff_view")
+            if diff_view == "按省份汇总":
+                st.dataframe(table_diff.summary_by(diff), use_container_width=True, hide_index=True)
+            elif diff_view == "高亮表格":
+                only_diff = st.checkbox("只看有变化的行", value=True, key="price_diff_only")
+                st.caption("🟨 改过的格子　🟩 新增行　🟥 删除行")
+                st.dataframe(table_diff.styled(diff, only_diff=only_diff), use_container_width=True, hide_index=True)
+            else:
+                st.dataframe(table_diff.changes_frame(diff), use_container_width=True, hide_index=True)
+
+    st.markdown("</div>", unsafe_allow_html=True)
+
 else:
     st.info("⬆ 请先选择数据来源并加载电价表。")
 
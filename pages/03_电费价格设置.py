@@ -3,135 +3,23 @@
 import streamlit as st
 import pandas as pd
 from io import BytesIO
-import re
-
-# ========== 时间规则解析函数（不动） ==========
-def parse_time_rule_line(line):
-    line = line.strip()
-    if re.match(r"^\d{1,2}:\d{2}", line):
-        return "", line
-    parts = line.split(" ", 1)
-    if len(parts) == 1:
-        return parts[0], ""
-    return parts[0], parts[1].strip()
-
-def parse_month_rule(text):
-    if pd.isna(text):
-        return []
-    lines = [l for l in str(text).split("\n") if l.strip()]
-    out = []
-    for l in lines:
-        t, tm = parse_time_rule_line(l)
-        out.append({"type": t, "time": tm})
-    return out
-
-def get_price(tier, row):
-    """
-    tier 可能是：""（不分时）、"尖"、"峰"、"平"、"谷" 等。
-    需求：如果 tier == "尖" 但电价表里没有 "尖" 或值为空，就自动用 "峰" 价格。
-    """
-    if tier == "":
-        return row.get("不分时电价", None)
-
-    # 先按原来的 tier 取值
-    val = row.get(tier, None)
 
-    # 如果是尖时段，但没有“尖”这一列或是 NaN，则回退到“峰”
-    if tier == "尖":
-        if val is None or (isinstance(val, (int, float)) and pd.isna(val)):
-            # 回退用峰价
-            val = row.get("峰", None)
-
-    return val
+from core import excel_cache, schedule, schema
+from core.history import TariffHistory, page_columns
+from core.price_index import PriceIndex
+from core.price_matrix import VOLTAGE_1_10_LABEL
+from core.station_fee import compute_fees, compute_months, fee_cube, months_workbook
+from core.tou_calendar import CALENDAR_COLS, TouCalendar
 
 # ========== 核心计算函数 ==========
-def process_station_prices(df_station, df_price, month):
-    df_station = df_station.copy()
-    df_station["配置"] = df_station["配置"].astype(str).str.strip()
-
-    output = []
-    errors = []
-    col = f"电费-{month}月"
-
-    for _, r in df_station.iterrows():
-
-        prov = r["所在省份"]
-        city = r.get("所属市区", "")
-        config = str(r["配置"]).strip()
-        fs = str(r["是否分时"]).strip()
-        mult = float(r["电费乘子"])
-        rule_txt = r.get(col, "")
-
-        # ------- 关键：广东省按城市匹配，其它省按省份匹配 --------
-        if "广东" in str(prov):
-            # 先按 省份 + 制度 + 城市 精确匹配
-            if "城市" in df_price.columns:
-                match = df_price[
-                    (df_price["省份"] == prov)
-                    & (df_price["制度"] == config)
-                    & (df_price["城市"] == str(city).strip())
-                ]
-            else:
-                # 万一电价表没有“城市”列，就退回省份 + 制度
-                match = df_price[
-                    (df_price["省份"] == prov)
-                    & (df_price["制度"] == config)
-                ]
-
-            # 如果按城市完全没匹配到，再退回 省份 + 制度
-            if match.empty:
-                match = df_price[
-                    (df_price["省份"] == prov)
-                    & (df_price["制度"] == config)
-                ]
-        else:
-            # 其他省份：省份 + 制度
-            match = df_price[
-                (df_price["省份"] == prov)
-                & (df_price["制度"] == config)
-            ]
-        # ----------------------------------------------------
-
-        if match.empty:
-            final = "未匹配到价格"
-            errors.append((r["序号"], r["站点名称"], prov, city, config))
-
-        else:
-            prow = match.iloc[0]
-
-            if fs == "否":
-                p = prow["不分时电价"] * mult
-                final = f"0:00 - 24:00 {round(p, 2)}元/度"
-
-            else:
-                rules = parse_month_rule(rule_txt)
-                lines = []
-                for rr in rules:
-                    t = rr["type"]
-                    tm = rr["time"]
-                    base = get_price(t, prow)
-                    if base is None:
-                        lines.append(f"{t} {tm} 无对应电价")
-                    else:
-                        p = round(base * mult, 2)
-                        if t == "":
-                            lines.append(f"{tm} {p}元/度")
-                        else:
-                            lines.append(f"{t} {tm} {p}元/度")
-                final = "\n".join(lines)
-
-        output.append({
-            "序号": r["序号"],
-            "站点名称": r["站点名称"],
-            "省份": prov,
-            "城市": city,
-            "配置": config,
-            "是否分时": fs,
-            "电费乘子": mult,
-            "电费": final
-        })
-
-    return pd.DataFrame(output), errors
+def process_station_prices(df_station, df_price, month, index=None, calendar=None, with_schedule=False):
+    """
+    df_price 最好是 schema.compact 过的紧凑表；匹配走 PriceIndex（广东按城市、查不到回退省份 + 制度）。
+    整表批量计算交给 core.station_fee：时段文本由分时日历编译（每种只拆一次），价格按列取、乘子一次相乘，
+    文字批量拼接；站点时段为空时按 calendar 补齐（不传则与原来一样为空）。
+    返回 (结果表, 未匹配列表)；with_schedule 时再加上用同一批数值生成的时段表。
+    """
+    return compute_fees(df_station, df_price, month, index=index, calendar=calendar, with_schedule=with_schedule)
 
 
 # ========== UI：标题 ==========
@@ -150,10 +38,10 @@ st.markdown("""
     操作流程
 </div>
 
-1. 上传站点信息 Excel。  
-2. 选择电价来源（Page2 修正版 / Page1 原始 / 上传 Excel）。  
-3. 点击“开始计算电费”，系统生成每站点分时电价文本。  
-4. 结果将自动保存，用于 Page6（总价计算）。
+1. 上传站点信息 Excel（可另外上传分时日历：省份 / 城市 / 月份 / 时段，站点时段为空的按日历补齐；不上传时空白时段照旧为空，也可勾选按站点表推出的日历补齐）。  
+2. 选择电价来源（Page2 修正版 / Page1 原始 / 电价历史库 / 上传 Excel）。  
+3. 点击“开始计算电费”，系统生成每站点分时电价文本（可勾选批量，一次算多个月，每月一个工作表）。  
+4. 结果（电费文本 + 列式时段表）将自动保存，用于 Page6（总价计算）；分时日历同时保存，供 Page4 使用；时段表也可下载为 Parquet。
 """, unsafe_allow_html=True)
 st.markdown("</div>", unsafe_allow_html=True)
 
@@ -170,11 +58,21 @@ st.markdown("""
 
 # --- 上传站点信息 ---
 station_file = st.file_uploader("① 上传站点信息 Excel 文件", type=["xlsx"])
+calendar_file = st.file_uploader(
+    f"（可选）上传分时日历 Excel（{' / '.join(CALENDAR_COLS)}，城市为空表示全省）",
+    type=["xlsx"],
+    key="tou_calendar_file",
+)
+fill_from_stations = st.checkbox(
+    "站点本月时段为空时，按站点表推出的分时日历补齐（同省 / 同市站点最常见的时段）",
+    value=False,
+    key="tou_fill_from_stations",
+)
 
 # --- 电价来源 ---
 price_src = st.radio(
     "② 选择电价表来源：",
-    ["使用 Page2 修正版", "使用 Page1 原始结果", "上传电价 Excel 文件"]
+    ["使用 Page2 修正版", "使用 Page1 原始结果", "从电价历史库加载", "上传电价 Excel 文件"]
 )
 
 df_price = None
@@ -185,13 +83,51 @@ if price_src == "使用 Page2 修正版":
 elif price_src == "使用 Page1 原始结果":
     df_price = st.session_state.get("price_raw")
 
+elif price_src == "从电价历史库加载":
+    history = TariffHistory()
+    months = history.months()
+    if not months:
+        st.warning("⚠ 电价历史库还是空的，请先在 Page1 解析或在 Page2 保存修正版。")
+    else:
+        hist_month = st.selectbox("电价生效月份", months)
+        voltage_opts = history.voltages(hist_month)
+        hist_voltage = st.selectbox(
+            "电压等级",
+            voltage_opts,
+            index=voltage_opts.index(VOLTAGE_1_10_LABEL) if VOLTAGE_1_10_LABEL in voltage_opts else 0,
+        )
+        use_latest = st.checkbox(
+            "该月缺失的省份，用此前最近一次已知的电价补齐",
+            value=True,
+        )
+        if use_latest:
+            df_hist = history.latest(voltage=hist_voltage, before=hist_month)
+        else:
+            df_hist = history.load_month(hist_month, voltage=hist_voltage)
+        if not df_hist.empty:
+            stale = df_hist[df_hist["生效月份"] != hist_month]
+            if not stale.empty:
+                st.caption(
+                    "以下省份沿用旧月份电价："
+                    + "、".join(f"{p}（{m}）" for p, m in stale.groupby("省份")["生效月份"].max().items())
+                )
+            df_price = page_columns(df_hist)
+
 else:
     up_price = st.file_uploader("上传电价 Excel", type=["xlsx"])
     if up_price:
-        df_price = pd.read_excel(up_price)
+        df_price = excel_cache.read_excel(up_price)
+
+# 电价表只在来源变了时转换一次（分类列 + 定点价格），之后重跑直接用缓存
+if df_price is not None and not df_price.empty:
+    df_price, price_report = schema.cached_compact(st.session_state, "price_compact", df_price, "电价表")
+    st.caption(schema.format_report(price_report))
 
 # --- 月份选择 ---
 month = st.number_input("③ 选择月份（月）", 1, 12, 1)
+batch = st.checkbox("批量计算多个月（站点表 / 电价表只读一次，时段相同的月份直接复用）", key="fee_batch")
+if batch:
+    month_from, month_to = st.select_slider("月份范围", options=list(range(1, 13)), value=(1, 12))
 
 st.markdown("</div>", unsafe_allow_html=True)
 
@@ -212,27 +148,84 @@ if st.button("▶ 开始计算电费", width="stretch"):
         st.error("❌ 请上传站点信息文件！")
         st.stop()
 
-    df_station = pd.read_excel(station_file)
+    df_station, station_report = schema.compact(excel_cache.read_excel(station_file), "站点表")
+    st.caption(schema.format_report(station_report))
 
     if df_price is None or df_price.empty:
         st.error("❌ 电价表为空，请检查来源或先完成 Page1/Page2。")
         st.stop()
 
-    with st.spinner("正在为每个站点生成分时电费……"):
-        df_out, errors = process_station_prices(df_station, df_price, month)
+    # 分时日历：上传的日历为准，没覆盖的省份 / 月份从站点表推（各省最常见的时段），不同的站点单独设置。
+    # 推出来的日历只保存、展示、供 Page4 选用；计算时空白时段只按上传的日历补，勾选后才按推出来的补
+    calendar_table = None
+    if calendar_file is not None:
+        calendar_table = excel_cache.read_excel(calendar_file)
+        missing = [c for c in CALENDAR_COLS if c not in calendar_table.columns]
+        if missing:
+            st.error(f"❌ 分时日历缺少列：{'、'.join(missing)}")
+            st.stop()
+    calendar = TouCalendar.from_stations(df_station, table=calendar_table)
+    st.session_state["tou_calendar"] = calendar
+    fill_calendar = calendar if fill_from_stations else TouCalendar(calendar_table)
+
+    price_index = PriceIndex(df_price)
+    if batch:
+        months = list(range(month_from, month_to + 1))
+        with st.spinner(f"正在生成 {month_from}～{month_to} 月的分时电费……"):
+            month_results, errors, reused, fee_schedule = compute_months(
+                df_station, df_price, months, index=price_index, calendar=fill_calendar,
+                schedule_month=month if month in months else months[0],
+            )
+        df_out = month_results[month if month in month_results else months[0]]
+        st.session_state["station_fee_months"] = month_results
+    else:
+        with st.spinner("正在为每个站点生成分时电费……"):
+            df_out, errors, fee_schedule = process_station_prices(
+                df_station, df_price, month, index=price_index, calendar=fill_calendar, with_schedule=True
+            )
+    st.caption(price_index.format_stats())
+    st.caption(calendar.format_summary())
 
     st.session_state["station_fee"] = df_out
-
-    st.success(f"电费计算完成，共 {len(df_out)} 条记录。")
-    st.dataframe(df_out, width="stretch")
-
-    buf = BytesIO()
-    df_out.to_excel(buf, index=False)
+    # 列式时段表：计算时直接用同一批数值生成（不再从文字拆回来），Page6 等后面的页面直接用
+    schedule.store(st.session_state, "station_fee_schedule", df_out, fee_schedule)
+
+    if batch:
+        st.success(f"电费计算完成：{len(months)} 个月 × {len(df_out)} 个站点。")
+        if reused:
+            st.caption(
+                "时段与前面月份完全相同、直接复用的月份："
+                + "、".join(f"{m}月（同{src}月）" for m, src in reused.items())
+            )
+        cube = fee_cube(month_results)
+        st.dataframe(cube, width="stretch")
+        st.download_button(
+            f"📥 下载电费计算结果（{month_from}～{month_to}月，每月一个工作表）",
+            months_workbook(month_results, cube),
+            f"电费计算_{month_from}-{month_to}月.xlsx",
+            mime="application/vnd.ms-excel",
+            width="stretch"
+        )
+    else:
+        st.success(f"电费计算完成，共 {len(df_out)} 条记录。")
+        st.dataframe(df_out, width="stretch")
+
+        buf = BytesIO()
+        df_out.to_excel(buf, index=False)
+        st.download_button(
+            f"📥 下载电费计算结果（{month}月）",
+            buf.getvalue(),
+            f"电费计算_{month}月.xlsx",
+            mime="application/vnd.ms-excel",
+            width="stretch"
+        )
+
+    fee_month = month if not batch or month in month_results else months[0]
     st.download_button(
-        f"📥 下载电费计算结果（{month}月）",
-        buf.getvalue(),
-        f"电费计算_{month}月.xlsx",
-        mime="application/vnd.ms-excel",
+        f"📥 下载{fee_month}月电费时段表（Parquet，可上传到 Page6）",
+        schedule.to_parquet(fee_schedule),
+        f"电费时段_{fee_month}月.parquet",
+        mime="application/octet-stream",
         width="stretch"
     )
 
@@ -241,5 +234,22 @@ if st.button("▶ 开始计算电费", width="stretch"):
         err_df = pd.DataFrame(errors, columns=["序号", "站点名称", "省份", "城市", "配置"])
         st.dataframe(err_df, width="stretch")
 
+    with st.expander("分时日历（省 / 市 × 月份）"):
+        cal_df = calendar.table()
+        st.dataframe(cal_df, width="stretch")
+        overrides = calendar.overrides()
+        if not overrides.empty:
+            st.caption(f"单独设置时段的站点·月：{len(overrides)} 条")
+            st.dataframe(overrides, width="stretch")
+        cal_buf = BytesIO()
+        cal_df.to_excel(cal_buf, index=False)
+        st.download_button(
+            "📥 下载分时日历",
+            cal_buf.getvalue(),
+            "分时日历.xlsx",
+            mime="application/vnd.ms-excel",
+            width="stretch"
+        )
+
 st.markdown("</div>", unsafe_allow_html=True)
 
@@ -2,9 +2,12 @@
 # pages/04_服务费价格设置.py
 import streamlit as st
 import pandas as pd
-import re
 from io import BytesIO
 
+from core import excel_cache, schedule, schema
+from core.station_fee import fee_cube, months_workbook
+from core.tou_calendar import TouCalendar
+
 # ===============================
 # 页面标题
 # ===============================
@@ -29,6 +32,8 @@ st.markdown("""
 2. 上传 **服务费价格表**（包含一口价服务费、尖、峰、平、谷、深）。  
 3. 选择月份，系统将根据【当月电费/服务费时段划分】生成对应的服务费时段价格。  
 4. 若某站点任意月份的时段为 **0:00 - 24:00**，则自动使用“一口价服务费”。  
+5. 站点当月时段为空时默认为空；勾选后按 Page3 保存的分时日历（省 / 市 × 月份）补齐，缺少某月时段列时也按日历生成。  
+6. 可勾选批量，一次生成多个月的服务费（每月一个工作表，时段相同的月份直接复用）。  
 
 """, unsafe_allow_html=True)
 st.markdown("</div>", unsafe_allow_html=True)
@@ -59,27 +64,21 @@ file_service = st.file_uploader(
 
 # 选择月份
 month = st.number_input("③ 选择月份", min_value=1, max_value=12, value=1)
+batch = st.checkbox("批量生成多个月（两张表只读一次，时段相同的月份直接复用）", key="service_batch")
+if batch:
+    month_from, month_to = st.select_slider("月份范围", options=list(range(1, 13)), value=(1, 12))
+fill_from_calendar = st.checkbox(
+    "站点当月时段为空（或没有该月时段列）时，按 Page3 保存的分时日历补齐",
+    value=False,
+    key="service_fill_calendar",
+)
 
 st.markdown("</div>", unsafe_allow_html=True)
 
 
 # ===============================
-# 工具：解析时段行
+# 工具
 # ===============================
-pattern = re.compile(r"(\S+)\s+(\d{1,2}:\d{2})\s*-\s*(\d{1,2}:\d{2})")
-
-def parse_line(line: str):
-    """
-    输入 "谷 0:00 - 7:00"
-    输出 ("谷", "0:00", "7:00")
-    """
-    m = pattern.search(line)
-    if not m:
-        return None
-    tier, start, end = m.group(1), m.group(2), m.group(3)
-    return tier, start, end
-
-
 def detect_month_col(df: pd.DataFrame, month: int) -> str | None:
     """
     兼容：
@@ -102,6 +101,59 @@ def detect_month_col(df: pd.DataFrame, month: int) -> str | None:
     return None
 
 
+def service_fee_text(price_info, lines, flat):
+    """
+    一个站点的服务费，返回 (文本, 时段行)。lines 为该站点本月时段（日历编译好的 (时段, 开始, 结束) 列表），
+    flat 表示时段里有 0:00 - 24:00 → 用一口价服务费。
+    时段行 [(时段, 开始分钟, 结束分钟, 价格)] 与文本逐行对应，价格就是文本里写的两位小数。
+    """
+    if flat:
+        flat_price = price_info.get("一口价服务费")
+        if pd.isna(flat_price):
+            return "一口价缺失", []
+        amount = f"{flat_price:.2f}"
+        return f"0:00 - 24:00 {amount}元/度", [("", 0, schedule.DAY_MINUTES, float(amount))]
+
+    out_lines, rows = [], []
+    for tier, start, end in lines:
+        service_price = price_info.get(tier)
+        if pd.isna(service_price):
+            continue
+        amount = f"{service_price:.2f}"
+        out_lines.append(f"{tier} {start} - {end} {amount}元/度")
+        rows.append((tier, schedule.to_minutes(start), schedule.to_minutes(end), float(amount)))
+    return "\n".join(out_lines), rows
+
+
+def compute_service_fees(stations, rules, service_pos, df_service_price, rule_lines, flat_rules, texts):
+    """
+    一个月的服务费，返回 (结果表, 时段表)。rules 为各站点本月的规则编号；
+    texts 为 {(服务费价格行, 规则编号): (文本, 时段行)} 缓存，多个月共用，同一组合只生成一次。
+    时段表直接由时段行拼成（同名站点取第一个），不再从文本拆回来。
+    """
+    fees, rows, named = [], [], set()
+    for station, rule in zip(stations, rules.tolist()):
+        first = station not in named
+        named.add(station)
+        # 找该站点的服务费价格（同名多行取第一行）
+        pos = service_pos.get(station)
+        if pos is None:
+            fees.append("未找到服务费价格")
+            continue
+        key = (pos, rule)
+        if key not in texts:
+            texts[key] = service_fee_text(
+                schema.row_values(df_service_price, pos),
+                rule_lines.get(rule, []),
+                rule >= 0 and flat_rules[rule],
+            )
+        text, lines = texts[key]
+        fees.append(text)
+        if first:
+            rows.extend((station, *line) for line in lines)
+    return pd.DataFrame({"站点名称": stations, "服务费": fees}), schedule.from_rows(rows)
+
+
 # ===============================
 # 主逻辑：点击生成服务费
 # ===============================
@@ -119,96 +171,115 @@ if st.button("▶ 生成服务费时段", use_container_width=True):
         st.error("❌ 请先上传两张表。")
         st.stop()
 
-    df_station = pd.read_excel(file_station)
-    df_service_price = pd.read_excel(file_service)
-
-    # 智能识别本月时段字段名：既兼容“电费-1月”也兼容“服务费-1月”
-    fee_col = detect_month_col(df_station, month)
-
-    if fee_col is None:
-        st.error(f"❌ 未在站点信息表中找到 {month} 月对应的『电费-X月 / 服务费-X月』字段，请检查列名。")
+    # 载入时转换一次：站点名称统一成同一套分类，后面按整数编码一次性建查找表
+    df_station, station_report = schema.compact(excel_cache.read_excel(file_station), "站点表")
+    df_service_price, service_report = schema.compact(excel_cache.read_excel(file_service), "服务费价格表")
+    df_station, df_service_price = schema.unify_categories([df_station, df_service_price], "站点名称")
+    st.caption(schema.format_report(station_report) + "；" + schema.format_report(service_report))
+    service_pos = schema.first_positions(df_service_price, "站点名称")
+
+    # 智能识别各月时段字段名：既兼容“电费-1月”也兼容“服务费-1月”
+    months = list(range(month_from, month_to + 1)) if batch else [month]
+    fee_cols = {m: detect_month_col(df_station, m) for m in months}
+    base = st.session_state.get("tou_calendar") if fill_from_calendar else None
+    if fill_from_calendar and base is None:
+        st.warning("⚠ Page3 还没有生成分时日历，空白时段不补齐。")
+    no_col = [m for m, c in fee_cols.items() if c is None]
+
+    if no_col and base is None:
+        st.error(
+            f"❌ 未在站点信息表中找到 {'、'.join(f'{m}月' for m in no_col)} 对应的『电费-X月 / 服务费-X月』字段，"
+            "请检查列名（或在 Page3 生成分时日历后勾选按日历补齐）。"
+        )
         st.stop()
+    elif no_col:
+        st.info(f"站点信息表里没有 {'、'.join(f'{m}月' for m in no_col)} 的时段字段，按 Page3 的分时日历生成。")
+    if not batch and fee_cols[month] is not None:
+        st.info(f"本次使用的时段字段为：**{fee_cols[month]}**")
+
+    # 时段走分时日历，每种时段文本只解析一次；勾选补齐时以 Page3 的日历为基础，本表里有时段的站点以自己的为准，
+    # 不勾选时日历是空的，空白时段照旧为空
+    if base is not None:
+        calendar = TouCalendar.from_stations(
+            df_station,
+            table=base.table(),
+            overrides=base.overrides(),
+            columns={m: c for m, c in fee_cols.items() if c is not None},
+        )
     else:
-        st.info(f"本次使用的时段字段为：**{fee_col}**")
-
-    results = []
-
-    for idx, row in df_station.iterrows():
-
-        station = row.get("站点名称")
-        fee_text = row.get(fee_col)
-
-        # 找该站点的服务费价格
-        matched = df_service_price[df_service_price["站点名称"] == station]
-
-        if matched.empty:
-            results.append({
-                "站点名称": station,
-                "服务费": "未找到服务费价格"
-            })
-            continue
-
-        price_info = matched.iloc[0]
-
-        # 多行时段拆分
-        fee_lines = str(fee_text).split("\n")
-
-        # 判断是否含 0:00 - 24:00 → 一口价
-        flat_pattern = re.compile(r"\b0:00\s*-\s*24:00\b")
-
-        is_flat = any(flat_pattern.search(line) for line in fee_lines)
-
-        if is_flat:
-            flat_price = price_info.get("一口价服务费")
-            if pd.isna(flat_price):
-                results.append({
-                    "站点名称": station,
-                    "服务费": "一口价缺失"
-                })
-            else:
-                results.append({
-                    "站点名称": station,
-                    "服务费": f"0:00 - 24:00 {flat_price:.2f}元/度"
-                })
+        calendar = TouCalendar()
+    month_rules = {m: calendar.station_rules(df_station, m, column=fee_cols[m]) for m in months}
+    parsed = calendar.lines.dropna(subset=["服务时段"])
+    rule_lines = {
+        r: list(zip(g["服务时段"], g["服务开始"], g["服务结束"]))
+        for r, g in parsed.groupby("规则", sort=False)
+    }
+    flat_rules = calendar.flat
+    if base is not None:
+        st.caption(calendar.format_summary())
+
+    # 各月规则编号完全相同的直接复用；(服务费价格行, 时段规则) 的文本各月共用
+    stations = df_station["站点名称"].tolist() if "站点名称" in df_station.columns else [None] * len(df_station)
+    texts = {}
+    month_results, month_schedules, reused, seen = {}, {}, {}, {}
+    for m in months:
+        key = month_rules[m].tobytes()
+        if key in seen:
+            reused[m] = seen[key]
+            month_results[m] = month_results[seen[key]].copy()
+            month_schedules[m] = month_schedules[seen[key]]
             continue
+        seen[key] = m
+        month_results[m], month_schedules[m] = compute_service_fees(
+            stations, month_rules[m], service_pos, df_service_price, rule_lines, flat_rules, texts
+        )
+    shown = month if month in month_results else months[0]
+    df_out = month_results[shown]
+    # 列式时段表：生成服务费时直接用同一批数值拼好（不再从文字拆回来），Page5 / Page6 直接用
+    fee_schedule = month_schedules[shown]
+
+    # 显示结果 + 下载
+    if batch:
+        st.success(f"服务费计算完成：{len(months)} 个月 × {len(df_out)} 个站点。")
+        if reused:
+            st.caption(
+                "时段与前面月份完全相同、直接复用的月份："
+                + "、".join(f"{m}月（同{src}月）" for m, src in reused.items())
+            )
+        cube = fee_cube(month_results, value_col="服务费", label="服务费")
+        st.dataframe(cube, use_container_width=True)
+        st.download_button(
+            f"📥 下载服务费结果 Excel（{month_from}～{month_to}月，每月一个工作表）",
+            months_workbook(month_results, cube),
+            f"服务费-第{month_from}-{month_to}月.xlsx",
+            mime="application/vnd.ms-excel",
+            use_container_width=True
+        )
+        st.session_state["service_price_months"] = month_results
+    else:
+        st.success("服务费计算完成！")
+        st.dataframe(df_out, use_container_width=True)
+
+        buf = BytesIO()
+        df_out.to_excel(buf, index=False)
+        st.download_button(
+            "📥 下载服务费结果 Excel",
+            buf.getvalue(),
+            f"服务费-第{month}月.xlsx",
+            mime="application/vnd.ms-excel",
+            use_container_width=True
+        )
 
-        # 否则按分时段生成
-        out_lines = []
-        for line in fee_lines:
-            parsed = parse_line(line)
-            if not parsed:
-                continue
-            tier, start, end = parsed
-
-            service_price = price_info.get(tier)
-            if pd.isna(service_price):
-                continue
-
-            out_lines.append(f"{tier} {start} - {end} {service_price:.2f}元/度")
-
-        results.append({
-            "站点名称": station,
-            "服务费": "\n".join(out_lines)
-        })
-
-    df_out = pd.DataFrame(results)
-
-    # 显示结果
-    st.success("服务费计算完成！")
-    st.dataframe(df_out, use_container_width=True)
-
-    # 下载
-    buf = BytesIO()
-    df_out.to_excel(buf, index=False)
     st.download_button(
-        "📥 下载服务费结果 Excel",
-        buf.getvalue(),
-        f"服务费-第{month}月.xlsx",
-        mime="application/vnd.ms-excel",
+        f"📥 下载{shown}月服务费时段表（Parquet，可上传到 Page6）",
+        schedule.to_parquet(fee_schedule),
+        f"服务费时段-第{shown}月.parquet",
+        mime="application/octet-stream",
         use_container_width=True
     )
 
     # 保存到 session_state（给 Page5 / Page6 使用）
     st.session_state["service_price_raw"] = df_out
+    schedule.store(st.session_state, "service_price_schedule", df_out, fee_schedule)
 
 st.markdown("</div>", unsafe_allow_html=True)
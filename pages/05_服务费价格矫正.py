@@ -6,6 +6,8 @@ import pandas as pd
 from io import BytesIO
 import re
 
+from core import excel_cache, schedule
+
 # ============================================
 # 页面标题
 # ============================================
@@ -55,10 +57,11 @@ st.markdown("</div>", unsafe_allow_html=True)
 # ============================================
 # 数据载入逻辑
 # ============================================
-if source_option == "从 Page4 导入服务费表（推荐）" and has_page4_data:
-    df_source = st.session_state["service_price_raw"].copy()
+from_page4 = source_option == "从 Page4 导入服务费表（推荐）" and has_page4_data
+if from_page4:
+    df_source = st.session_state["service_price_raw"]
 elif uploaded_file is not None:
-    df_source = pd.read_excel(uploaded_file)
+    df_source = excel_cache.read_excel(uploaded_file)
 
 if df_source is None:
     st.warning("请先从 Page4 导入服务费结果，或上传包含『站点名称 + 服务费』列的 Excel 文件。")
@@ -71,41 +74,54 @@ if "站点名称" not in df_source.columns or "服务费" not in df_source.colum
 # ============================================
 # 文本解析函数：服务费文本 → (start, end, price)
 # ============================================
+FEE_LINE_PATTERN = r"(\d{1,2}:\d{2})\s*-\s*(\d{1,2}:\d{2}).*?([0-9]+(?:\.[0-9]+)?)"
+
+
 def parse_fee_text(text):
     """
     输入示例（支持有/没有“谷/峰/平/尖”等前缀）：
         谷 0:00 - 7:00 0.50元/度
-        平 7:00 - 10:00 0.50元/度
         0:00 - 24:00 0.50元/度
-    输出 DataFrame:
-        start | end | price
+    输出 [{start, end, price}]（与矫正结果同一结构），开始 / 结束保留原文字的写法（如「08:00」）。
     """
     rows = []
-
     if text is None:
-        return pd.DataFrame(columns=["start", "end", "price"])
-
+        return rows
     for line in str(text).splitlines():
-        line = line.strip()
-        if not line:
-            continue
-
-        m = re.search(
-            r"(\d{1,2}:\d{2})\s*-\s*(\d{1,2}:\d{2}).*?([0-9]+(?:\.[0-9]+)?)",
-            line
-        )
-        if not m:
-            continue
-
-        start, end, price_str = m.groups()
-        try:
-            price = float(price_str)
-        except ValueError:
-            continue
+        m = re.search(FEE_LINE_PATTERN, line.strip())
+        if m:
+            start, end, price = m.groups()
+            rows.append({"start": start, "end": end, "price": float(price)})
+    return rows
+
 
-        rows.append([start, end, price])
+def fee_display(records):
+    """演示模式 / 导出的写法：「0:00 - 7:00  0.5元/度」逐行相连，没有时段为「-」。"""
+    if not records:
+        return "-"
+    return "\n".join(f"{r['start']} - {r['end']}  {r['price']}元/度" for r in records)
 
-    return pd.DataFrame(rows, columns=["start", "end", "price"])
+
+def source_displays(texts):
+    """一列服务费文本 → 演示写法；相同的文本只解析一次。"""
+    codes, uniques = pd.factorize(pd.Series(list(texts), dtype=object))
+    out = [fee_display(parse_fee_text(t)) for t in uniques] + ["-"]
+    return [out[c] for c in codes]     # factorize 的空值编码是 -1，正好取到末尾补的 "-"
+
+
+# 同名站点取第一行的服务费文本
+source_first = df_source.drop_duplicates("站点名称")
+source_texts = dict(zip(source_first["站点名称"].tolist(), source_first["服务费"].tolist()))
+
+# ============================================
+# 列式时段表（导出 Parquet 用）：Page4 的结果直接用它保存的时段表，上传的 Excel 按同样的认法拆一次
+# ============================================
+if from_page4:
+    source_schedule = schedule.cached(st.session_state, "service_price_schedule", df_source, "服务费")
+else:
+    source_schedule = schedule.from_texts(
+        df_source["站点名称"], df_source["服务费"], pattern=schedule.HYPHEN_LINE_PATTERN
+    )
 
 
 # ============================================
@@ -131,8 +147,7 @@ with tab_edit:
     if station in st.session_state["service_price_corrected"]:
         df_current = pd.DataFrame(st.session_state["service_price_corrected"][station])
     else:
-        raw_text = df_source[df_source["站点名称"] == station]["服务费"].values[0]
-        df_current = parse_fee_text(raw_text)
+        df_current = pd.DataFrame(parse_fee_text(source_texts.get(station)), columns=["start", "end", "price"])
 
     st.markdown("### 当前服务费时段")
     st.dataframe(df_current, use_container_width=True)
@@ -225,24 +240,18 @@ with tab_view:
 
     st.markdown("### 全部站点的最新服务费时段结构")
 
-    rows_out = []
-
-    for st_name in df_source["站点名称"].unique():
-
-        # 优先使用矫正结果
-        if st_name in st.session_state["service_price_corrected"]:
-            df_final = st.session_state["service_price_corrected"][st_name]
-        else:
-            raw_text = df_source[df_source["站点名称"] == st_name]["服务费"].values[0]
-            df_final = parse_fee_text(raw_text).to_dict("records")
-
-        txt = "\n".join(
-            [f"{r['start']} - {r['end']}  {r['price']}元/度" for r in df_final]
-        ) if df_final else "-"
-
-        rows_out.append([st_name, txt])
-
-    df_show = pd.DataFrame(rows_out, columns=["站点名称", "服务费"])
+    # 优先使用矫正结果；没矫正的站点按原文字生成（相同的文字只解析一次），开始 / 结束照原样
+    station_names = df_source["站点名称"].unique().tolist()
+    corrected = {
+        k: v for k, v in st.session_state["service_price_corrected"].items() if k in station_names
+    }
+    shown = source_displays([source_texts.get(k) for k in station_names])
+    df_show = pd.DataFrame({
+        "站点名称": station_names,
+        "服务费": [fee_display(corrected[k]) if k in corrected else t for k, t in zip(station_names, shown)],
+    })
+    # 时段表：矫正过的站点整段替换
+    final_schedule = schedule.replace(source_schedule, schedule.from_segments(corrected))
     st.dataframe(df_show, use_container_width=True)
 
     # === 新增：下载矫正后的服务费表 ===
@@ -260,4 +269,11 @@ with tab_view:
         ),
         use_container_width=True,
     )
+    st.download_button(
+        "📥 下载矫正后的服务费时段表（Parquet，可上传到 Page6）",
+        data=schedule.to_parquet(final_schedule),
+        file_name="服务费_矫正结果.parquet",
+        mime="application/octet-stream",
+        use_container_width=True,
+    )
 
@@ -4,125 +4,55 @@
 import streamlit as st
 import pandas as pd
 from io import BytesIO
-import re
+
+from core import excel_cache, schedule
 
 # ============================================
-# 工具函数：时间 & 文本解析
+# 工具函数：按时段合并（时段来自列式时段表，不再解析文字）
 # ============================================
 
-def time_to_min(t: str) -> int:
-    """'7:00' -> 420"""
-    t = t.strip()
-    h, m = t.split(":")
-    return int(h) * 60 + int(m)
-
-
-def min_to_time(m: int) -> str:
-    """420 -> '7:00'"""
-    h = m // 60
-    mm = m % 60
-    return f"{h}:{mm:02d}"
-
-
-def parse_price_text(text):
-    """
-    解析类似：
-      谷 0:00 - 7:00 0.50元/度
-      平 7:00 - 10:00 0.75元/度
-      0:00 - 24:00 0.5元/度   （没有“谷/峰/平/尖”也可以）
-
-    返回：
-      [{"start": "0:00", "end": "7:00", "price": 0.5}, ...]
-    """
-    rows = []
-    if text is None:
-        return rows
-
-    for line in str(text).splitlines():
-        line = line.strip()
-        if not line:
-            continue
-
-        # 提取：开始时间 结束时间 价格数字
-        m = re.search(
-            r"(\d{1,2}:\d{2})\s*[-–~至]\s*(\d{1,2}:\d{2}).*?([0-9]+(?:\.[0-9]+)?)",
-            line
-        )
-        if not m:
-            # 有些行可能是备注，直接跳过
-            continue
-
-        start, end, price_str = m.groups()
-        try:
-            price = float(price_str)
-        except ValueError:
-            continue
-
-        rows.append({
-            "start": start.strip(),
-            "end": end.strip(),
-            "price": price
-        })
-
-    return rows
-
-
-def merge_two_schedules(elec_rows, serv_rows):
+def merge_two_schedules(elec_segs, serv_segs):
     """
     输入：
-        elec_rows: [{'start','end','price'}]  电费
-        serv_rows: [{'start','end','price'}]  服务费
+        elec_segs: [(开始分钟, 结束分钟, 价格, 时段)]  电费（schedule.segments 的取值）
+        serv_segs: [(开始分钟, 结束分钟, 价格, 时段)]  服务费
 
     逻辑：
-        - 把两边所有 start/end 转成分钟，取并集 + 排序
+        - 把两边所有 开始/结束 取并集 + 排序
         - 逐段 [t_i, t_{i+1}) 找到对应的电费、服务费，做相加
     返回：
-        [{'start','end','electric_price','service_price','total_price'}]
+        [{'start','end','electric_price','service_price','total_price'}]，start / end 为分钟
     """
-    if not elec_rows or not serv_rows:
+    if not elec_segs or not serv_segs:
         return []
 
-    # 转分钟 & 收集边界
-    elec = []
-    serv = []
     boundaries = set()
-
-    for r in elec_rows:
-        s = time_to_min(r["start"])
-        e = time_to_min(r["end"])
-        elec.append({"s": s, "e": e, "price": r["price"]})
-        boundaries.add(s)
-        boundaries.add(e)
-
-    for r in serv_rows:
-        s = time_to_min(r["start"])
-        e = time_to_min(r["end"])
-        serv.append({"s": s, "e": e, "price": r["price"]})
+    for s, e, _, _ in elec_segs + serv_segs:
         boundaries.add(s)
         boundaries.add(e)
 
     points = sorted(boundaries)
 
     def find_price(segs, t_min):
-        for seg in segs:
-            if seg["s"] <= t_min < seg["e"]:
-                return seg["price"]
+        for s, e, price, _ in segs:
+            if s <= t_min < e:
+                return price
         return None  # 理论上不应该出现
 
     merged = []
     for i in range(len(points) - 1):
         s = points[i]
         e = points[i + 1]
-        p_e = find_price(elec, s)
-        p_s = find_price(serv, s)
+        p_e = find_price(elec_segs, s)
+        p_s = find_price(serv_segs, s)
 
         # 如果其中一个没有覆盖，就跳过（数据不完整）
         if p_e is None or p_s is None:
             continue
 
         merged.append({
-            "start": min_to_time(s),
-            "end": min_to_time(e),
+            "start": s,
+            "end": e,
             "electric_price": p_e,
             "service_price": p_s,
             "total_price": round(p_e + p_s, 2)
@@ -131,6 +61,30 @@ def merge_two_schedules(elec_rows, serv_rows):
     return merged
 
 
+def total_line(tier, start, end, price):
+    return f"{schedule.min_to_time(start)} - {schedule.min_to_time(end)} {price:.2f}元/度"
+
+
+def load_result(file, col):
+    """
+    上传的结果文件 → (站点名称列表, 时段表)。
+    Parquet（Page3 / Page4 / Page5 导出的时段表）直接读；Excel 检查列后把 col 列的文字拆一次。
+    """
+    if file.name.endswith(".parquet"):
+        try:
+            sched = schedule.read_parquet(file)
+        except ValueError as e:
+            st.error(f"{col}时段表格式不对：{e}")
+            st.stop()
+        return pd.unique(sched["站点"].to_numpy(dtype=object)).tolist(), sched
+
+    df = excel_cache.read_excel(file)
+    if ("站点名称" not in df.columns) or (col not in df.columns):
+        st.error(f"{col}数据中必须包含列：『站点名称』和『{col}』。")
+        st.stop()
+    return df["站点名称"].unique().tolist(), schedule.from_texts(df["站点名称"], df[col])
+
+
 # ============================================
 # 页面标题
 # ============================================
@@ -184,8 +138,8 @@ with col_a:
     elec_file = None
     if "上传" in src_elec:
         elec_file = st.file_uploader(
-            "电费结果文件（需包含：站点名称 + 电费 文本列）",
-            type=["xlsx"],
+            "电费结果文件（Excel 需包含：站点名称 + 电费 文本列；或 Page3 导出的时段表 Parquet）",
+            type=["xlsx", "parquet"],
             key="elec_upload"
         )
 
@@ -219,68 +173,54 @@ with col_b:
     serv_file = None
     if "上传" in src_serv:
         serv_file = st.file_uploader(
-            "服务费结果文件（需包含：站点名称 + 服务费 文本列）",
-            type=["xlsx"],
+            "服务费结果文件（Excel 需包含：站点名称 + 服务费 文本列；或 Page4/5 导出的时段表 Parquet）",
+            type=["xlsx", "parquet"],
             key="serv_upload"
         )
 
 st.markdown("</div>", unsafe_allow_html=True)
 
 # ============================================
-# 2. 载入 DataFrame
+# 2. 载入：站点名称 + 列式时段表
 # ============================================
 
-df_elec = None
-df_serv = None
+elec_names = elec_schedule = None
+serv_names = serv_schedule = None
 
-# ---- 电费 DF ----
+# ---- 电费 ----
 if "沿用" in src_elec and has_page3:
-    # 直接使用 Page3 保存的 station_fee
-    df_elec = state_fee.copy()
+    # 直接使用 Page3 保存的 station_fee 和对应的时段表（只读，不复制、不重新解析）
+    elec_names = state_fee["站点名称"].unique().tolist()
+    elec_schedule = schedule.cached(st.session_state, "station_fee_schedule", state_fee, "电费")
 elif elec_file is not None:
-    df_elec = pd.read_excel(elec_file)
+    elec_names, elec_schedule = load_result(elec_file, "电费")
 
-# ---- 服务费 DF ----
+# ---- 服务费 ----
 if "沿用" in src_serv and has_page5_raw:
-    # 按 Page5 的逻辑，把 raw + corrected 合成为最新服务费表
-    raw = raw_from_state.copy()
-    station_list = raw["站点名称"].unique().tolist()
-    corrected = st.session_state.get("service_price_corrected", {})
-
-    rows = []
-    for name in station_list:
-        if name in corrected:
-            segs = corrected[name]
-            txt = "\n".join(
-                [f"{s['start']} - {s['end']} {s['price']}元/度" for s in segs]
-            )
-        else:
-            txt = str(raw[raw["站点名称"] == name]["服务费"].values[0])
-        rows.append({"站点名称": name, "服务费": txt})
-
-    df_serv = pd.DataFrame(rows)
+    # 按 Page5 的逻辑：Page4 的时段表，矫正过的站点整段替换
+    raw = raw_from_state
+    serv_names = raw["站点名称"].unique().tolist()
+    corrected = {
+        k: v for k, v in st.session_state.get("service_price_corrected", {}).items() if k in serv_names
+    }
+    serv_schedule = schedule.replace(
+        schedule.cached(st.session_state, "service_price_schedule", raw, "服务费"),
+        schedule.from_segments(corrected),
+    )
 elif serv_file is not None:
-    df_serv = pd.read_excel(serv_file)
+    serv_names, serv_schedule = load_result(serv_file, "服务费")
 
 # ============================================
 # 3. 基本检查
 # ============================================
 
-if df_elec is None or df_serv is None:
+if elec_names is None or serv_names is None:
     st.warning("请先完成电费 / 服务费数据的导入，再进行总价计算。")
     st.stop()
 
-if ("站点名称" not in df_elec.columns) or ("电费" not in df_elec.columns):
-    st.error("电费数据中必须包含列：『站点名称』和『电费』。")
-    st.stop()
-
-if ("站点名称" not in df_serv.columns) or ("服务费" not in df_serv.columns):
-    st.error("服务费数据中必须包含列：『站点名称』和『服务费』。")
-    st.stop()
-
 # 只保留两边都有的站点
-set_elec = set(df_elec["站点名称"].unique())
-set_serv = set(df_serv["站点名称"].unique())
+set_elec = set(elec_names)
+set_serv = set(serv_names)
 common_stations = sorted(list(set_elec & set_serv))
 
 if not common_stations:
@@ -305,39 +245,36 @@ st.markdown("""
 """, unsafe_allow_html=True)
 
 if st.button("▶ 开始计算总价", use_container_width=True):
-    total_rows = []
     detail_dict = {}
+    total_segs = []
 
-    for name in common_stations:
-        elec_text = df_elec[df_elec["站点名称"] == name]["电费"].values[0]
-        serv_text = df_serv[df_serv["站点名称"] == name]["服务费"].values[0]
-
-        elec_rows = parse_price_text(elec_text)
-        serv_rows = parse_price_text(serv_text)
+    # 两边的时段按站点一次分组好，逐站点只做合并
+    elec_segs = schedule.segments(elec_schedule)
+    serv_segs = schedule.segments(serv_schedule)
 
-        merged = merge_two_schedules(elec_rows, serv_rows)
+    for name in common_stations:
+        merged = merge_two_schedules(elec_segs.get(name, []), serv_segs.get(name, []))
 
         # 保存详情
         detail_dict[name] = merged
+        total_segs.extend(
+            (name, "", m["start"], m["end"], m["total_price"]) for m in merged
+        )
 
-        # 汇总文本
-        if merged:
-            total_txt = "\n".join(
-                [f"{m['start']} - {m['end']} {m['total_price']:.2f}元/度" for m in merged]
-            )
-        else:
-            total_txt = "未能成功合并电费与服务费，请检查源数据。"
-
-        total_rows.append({
-            "站点名称": name,
-            "总价": total_txt
-        })
-
-    df_total = pd.DataFrame(total_rows)
+    # 总价时段表；文本只在这里生成（没合并出时段的站点写提示）
+    total_schedule = schedule.from_rows(total_segs)
+    df_total = pd.DataFrame({
+        "站点名称": common_stations,
+        "总价": schedule.render(
+            total_schedule, common_stations, total_line,
+            default="未能成功合并电费与服务费，请检查源数据。",
+        ),
+    })
 
     # 存到 session，方便后面页面或重新渲染使用
     st.session_state["total_price_result"] = df_total
     st.session_state["total_price_detail"] = detail_dict
+    schedule.store(st.session_state, "total_price_schedule", df_total, total_schedule)
 
     st.success("✅ 总价计算完成！")
 
@@ -373,6 +310,13 @@ if isinstance(df_total_state, pd.DataFrame) and not df_total_state.empty:
                 "spreadsheetml.sheet"
             ),
         )
+        total_schedule = schedule.cached(st.session_state, "total_price_schedule", df_total, "总价")
+        st.download_button(
+            "📥 下载总价时段表（Parquet）",
+            data=schedule.to_parquet(total_schedule),
+            file_name="总价时段表.parquet",
+            mime="application/octet-stream",
+        )
 
     # -------- 单站点详情 ----------
     with tab_detail:
@@ -384,7 +328,10 @@ if isinstance(df_total_state, pd.DataFrame) and not df_total_state.empty:
             st.warning("该站点没有可展示的时段数据。")
         else:
             df_detail = pd.DataFrame(records)
-            df_detail["时段"] = df_detail["start"] + " - " + df_detail["end"]
+            df_detail["时段"] = [
+                f"{schedule.min_to_time(s)} - {schedule.min_to_time(e)}"
+                for s, e in zip(df_detail["start"], df_detail["end"])
+            ]
             df_detail = df_detail[["时段", "electric_price", "service_price", "total_price"]]
             df_detail.columns = ["时段", "电费(元/度)", "服务费(元/度)", "总价(元/度)"]
             st.dataframe(df_detail, use_container_width=True)
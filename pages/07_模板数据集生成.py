@@ -6,6 +6,8 @@ from io import BytesIO
 import pandas as pd
 from openpyxl.styles import Font, Alignment
 
+from core import excel_cache, schema
+
 # ================================
 # 常量配置
 # ================================
@@ -145,7 +147,7 @@ col_p, col_s, col_t = st.columns(3)
 with col_p:
     if not need_power_upload:
         st.success("已检测到 Page3 的电费结果，可直接使用。")
-        power_df = power_df_state.copy()
+        power_df = power_df_state          # 只读，不复制
         power_file_upload = None
     else:
         st.warning("未检测到 Page3 的电费结果，请上传电费结果 Excel（含『站点名称』『电费』列）。")
@@ -161,10 +163,11 @@ with col_s:
     if not need_serv_upload:
         st.success("已检测到 Page4/5 的服务费结果，可直接使用（优先使用 Page5 矫正后数据）。")
 
-        raw = service_df_state.copy()
+        raw = service_df_state
         station_list = raw["站点名称"].unique().tolist()
 
         if isinstance(corrected_map, dict) and corrected_map:
+            raw_pos = schema.first_positions(raw, "站点名称")
             rows = []
             for name in station_list:
                 if name in corrected_map:
@@ -173,11 +176,11 @@ with col_s:
                         [f"{s['start']} - {s['end']} {s['price']}元/度" for s in segs]
                     )
                 else:
-                    txt = str(raw.loc[raw["站点名称"] == name, "服务费"].values[0])
+                    txt = str(raw["服务费"].iat[raw_pos[name]])
                 rows.append({"站点名称": name, "服务费": txt})
             service_df = pd.DataFrame(rows)
         else:
-            service_df = raw[["站点名称", "服务费"]].copy()
+            service_df = raw[["站点名称", "服务费"]]
 
         serv_file_upload = None
     else:
@@ -193,7 +196,7 @@ with col_s:
 with col_t:
     if not need_total_upload:
         st.success("已检测到 Page6 的总价结果，可直接使用。")
-        total_df = total_df_state.copy()
+        total_df = total_df_state
         total_file_upload = None
     else:
         st.warning("未检测到 Page6 的总价结果，请上传总价结果 Excel（含『站点名称』『总价』列）。")
@@ -224,9 +227,12 @@ if st.button("▶ 生成价格模板数据集", use_container_width=True):
         st.error("❌ 请先上传：电费价格时段表 / 服务费价格时段表 / 当前服务费均价表。")
         st.stop()
 
-    df_elec_struct = pd.read_excel(file_elec_struct)
-    df_serv_struct = pd.read_excel(file_serv_struct)
-    df_serv_avg = pd.read_excel(file_serv_avg)
+    # 三张结构表载入时各转换一次（重复多的文字列 → 分类），并报告省下的内存
+    df_elec_struct, r_elec = schema.compact(excel_cache.read_excel(file_elec_struct), "电费价格时段表")
+    df_serv_struct, r_serv = schema.compact(excel_cache.read_excel(file_serv_struct), "服务费价格时段表")
+    df_serv_avg, r_avg = schema.compact(excel_cache.read_excel(file_serv_avg), "当前服务费均价表")
+    st.caption("；".join(schema.format_report(r) for r in (r_elec, r_serv, r_avg)))
+    st.caption(excel_cache.get_excel_cache().format_stats() + "（同一份文件在各页面只解析一次）")
 
     required_elec_cols = {"序号", "站点编号", "供电规则"}
     required_serv_cols = {"站点全称", "站点编号", "站点名称", "目标服务费"}
@@ -247,7 +253,7 @@ if st.button("▶ 生成价格模板数据集", use_container_width=True):
     # -------- 4.2 电费 / 服务费 / 总价结果表处理 --------
     # 电费结果
     if power_df is None and power_file_upload is not None:
-        power_df = pd.read_excel(power_file_upload)
+        power_df = excel_cache.read_excel(power_file_upload)
     if power_df is None:
         st.error("❌ 仍未获取到电费结果表，请上传或回到 Page3 先计算。")
         st.stop()
@@ -257,7 +263,7 @@ if st.button("▶ 生成价格模板数据集", use_container_width=True):
 
     # 服务费结果
     if service_df is None and serv_file_upload is not None:
-        service_df = pd.read_excel(serv_file_upload)
+        service_df = excel_cache.read_excel(serv_file_upload)
     if service_df is None:
         st.error("❌ 仍未获取到服务费结果表，请上传或先在 Page4/5 生成。")
         st.stop()
@@ -267,7 +273,7 @@ if st.button("▶ 生成价格模板数据集", use_container_width=True):
 
     # 总价结果
     if total_df is None and total_file_upload is not None:
-        total_df = pd.read_excel(total_file_upload)
+        total_df = excel_cache.read_excel(total_file_upload)
     if total_df is None:
         st.error("❌ 仍未获取到总价结果表，请上传或先在 Page6 生成。")
         st.stop()
@@ -278,12 +284,17 @@ if st.button("▶ 生成价格模板数据集", use_container_width=True):
         total_df = total_df.rename(columns={"总价": "总电价"})
 
     # -------- 4.3 组装基础表（以服务费结构表为主） --------
-    base = df_serv_struct[["站点编号", "站点全称", "站点名称", "目标服务费"]].copy()
+    # 各表的站点名称统一成同一套分类，下面几次 merge 都在整数编码上对齐
+    df_serv_struct, df_serv_avg, power_df, service_df, total_df = schema.unify_categories(
+        [df_serv_struct, df_serv_avg, power_df, service_df, total_df], "站点名称"
+    )
+
+    base = df_serv_struct[["站点编号", "站点全称", "站点名称", "目标服务费"]]
 
-    elec_seq = df_elec_struct[["站点编号", "序号", "供电规则"]].copy()
+    elec_seq = df_elec_struct[["站点编号", "序号", "供电规则"]]
     base = base.merge(elec_seq, on="站点编号", how="left")
 
-    avg_small = df_serv_avg[["站点名称", "当前服务费均价"]].copy()
+    avg_small = df_serv_avg[["站点名称", "当前服务费均价"]]
     base = base.merge(avg_small, on="站点名称", how="left")
 
     def make_service_strategy(row):
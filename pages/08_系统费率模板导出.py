@@ -8,6 +8,8 @@ from io import BytesIO
 from datetime import datetime
 from openpyxl.styles import Font, Alignment
 
+from core import excel_cache
+
 # ==============================
 # 页面标题
 # ==============================
@@ -144,6 +146,16 @@ def normalize_tariff_text(raw_text: str, decimals: int = 4) -> str:
     return "\n".join(out_lines)
 
 
+def normalize_tariff_texts(texts, decimals: int = 4) -> list:
+    """
+    一列费率文本 → 系统格式（normalize_tariff_text）；相同的文本只处理一次。
+    这里逐行保留原文字里的开始 / 结束时间写法（如「08:00」），不走 core.schedule 的分钟表。
+    """
+    codes, uniques = pd.factorize(pd.Series(list(texts), dtype=object))
+    out = [normalize_tariff_text(t, decimals) for t in uniques] + [""]
+    return [out[c] for c in codes]     # factorize 的空值编码是 -1，正好取到末尾补的 ""
+
+
 # ==============================
 # 数据来源：沿用 Page7 或上传
 # ==============================
@@ -211,7 +223,7 @@ if st.button("▶ 生成费率版本并导出", use_container_width=True):
         if upload_file is None:
             st.error("❌ 请先上传 Page7 导出的模板Excel。")
             st.stop()
-        df_src = pd.read_excel(upload_file)
+        df_src = excel_cache.read_excel(upload_file)
 
     # ---- 必要列检查 ----
     need_cols = {"站点名称", "站点编号", "本次生效价格-电费", "本次生效价格-服务费"}
@@ -231,8 +243,8 @@ if st.button("▶ 生成费率版本并导出", use_container_width=True):
     df_out["站点编号"] = df_out["站点编号"].apply(lambda x: "" if pd.isna(x) else str(x))
 
     # ---- 文本格式化（充电费/服务费都要转）----
-    df_out["充电费"] = df_out["充电费"].apply(lambda x: normalize_tariff_text(x, decimals=2))
-    df_out["服务费"] = df_out["服务费"].apply(lambda x: normalize_tariff_text(x, decimals=2))
+    df_out["充电费"] = normalize_tariff_texts(df_out["充电费"].tolist(), decimals=2)
+    df_out["服务费"] = normalize_tariff_texts(df_out["服务费"].tolist(), decimals=2)
 
     st.success(f"✅ 费率版本生成完成，共 {len(df_out)} 行。")
     st.dataframe(df_out, use_container_width=True)
@@ -0,0 +1,122 @@
+# -*- coding: utf-8 -*-
+# tests/conftest.py
+"""
+测试共用：本地 HTTP 服务器（代替 95598 / 电网公司网站），按路由返回固定内容、304、Range 续传。
+
+    routes[path] = {
+        "body":          响应体（bytes）
+        "etag":          可选，给了就支持 If-None-Match → 304、If-Range → 206
+        "last_modified": 可选
+        "content_type":  默认 application/pdf
+        "cut":           前几次 GET 只发这么多字节就断开（Content-Length 仍按全长声明），用来测续传
+        "status":        固定返回这个状态码（如 404 / 500）
+    }
+服务器记下每个请求的 (path, headers)，测试里据此断言发了哪些请求。
+"""
+import os
+import sys
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        server = self.server
+        with server.lock:
+            server.requests.append((self.path, dict(self.headers)))
+            route = server.routes.get(self.path)
+            cuts = server.cuts
+            cut = None
+            if route is not None and route.get("cut") and cuts.get(self.path, 0) < route.get("cut_times", 1):
+                cuts[self.path] = cuts.get(self.path, 0) + 1
+                cut = route["cut"]
+
+        if route is None:
+            return self._send(404, b"not found")
+        if route.get("status"):
+            return self._send(route["status"], route.get("body", b""))
+
+        body = route["body"]
+        etag = route.get("etag")
+        last_modified = route.get("last_modified")
+        validators = {"ETag": etag, "Last-Modified": last_modified}
+
+        if etag and self.headers.get("If-None-Match") == etag:
+            return self._send(304, b"", validators, body_allowed=False)
+
+        range_header = self.headers.get("Range")
+        if range_header and etag and self.headers.get("If-Range") in (etag, last_modified):
+            start = int(range_header.split("=")[1].split("-")[0])
+            if start >= len(body):
+                return self._send(416, b"")
+            headers = dict(validators, **{"Content-Range": f"bytes {start}-{len(body) - 1}/{len(body)}"})
+            return self._send(206, body[start:], headers, content_type=route.get("content_type"))
+
+        self._send(200, body, validators, content_type=route.get("content_type"), cut=cut)
+
+    def _send(self, status, body, headers=None, content_type=None, cut=None, body_allowed=True):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type or "application/pdf")
+        for k, v in (headers or {}).items():
+            if v:
+                self.send_header(k, v)
+        if body_allowed:
+            self.send_header("Content-Length", str(len(body)))
+        if cut is not None:
+            self.send_header("Connection", "close")
+        self.end_headers()
+        if not body_allowed:
+            return
+        if cut is not None:
+            self.wfile.write(body[:cut])
+            self.wfile.flush()
+            self.close_connection = True
+            return
+        self.wfile.write(body)
+
+
+class LocalServer:
+
+    def __init__(self):
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+        self.httpd.daemon_threads = True
+        self.httpd.routes = {}
+        self.httpd.requests = []
+        self.httpd.cuts = {}
+        self.httpd.lock = threading.Lock()
+        self.thread = threading.Thread(target=self.httpd.serve_forever, kwargs={"poll_interval": 0.05}, daemon=True)
+        self.thread.start()
+
+    @property
+    def routes(self):
+        return self.httpd.routes
+
+    @property
+    def requests(self):
+        return self.httpd.requests
+
+    def url(self, path):
+        return f"http://127.0.0.1:{self.httpd.server_address[1]}{path}"
+
+    def hits(self, path):
+        return [h for p, h in self.requests if p == path]
+
+    def close(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+@pytest.fixture
+def server():
+    s = LocalServer()
+    yield s
+    s.close()
@@ -0,0 +1,91 @@
+# -*- coding: utf-8 -*-
+# tests/test_batch.py
+"""命令行批处理（core.batch.run）与 Page1 的解析流程（iter_parse_urls + collect）结果一致，写出的文件也一致。"""
+from io import BytesIO
+
+import pandas as pd
+import pytest
+
+from bench.corpus import build_corpus
+from core import batch, config, layout_profiles, pdf_cache, stage_cache
+from core.extract_backends import DEFAULT_BACKEND
+from core.pipeline import collect, iter_parse_urls
+from core.price_matrix import matrix_frame
+
+
+@pytest.fixture(scope="module")
+def corpus(tmp_path_factory):
+    return build_corpus(str(tmp_path_factory.mktemp("corpus")))
+
+
+@pytest.fixture
+def fresh_caches(tmp_path, monkeypatch):
+    """每次调用换一套空的缓存 / 数据目录，两边都从头下载、解析，不互相命中。"""
+    runs = iter(range(100))
+
+    def reset():
+        root = tmp_path / f"run{next(runs)}"
+        monkeypatch.setattr(config, "CACHE_ROOT", root / "cache")
+        monkeypatch.setattr(config, "DATA_ROOT", root / "data")
+        monkeypatch.setattr(pdf_cache, "_default_cache", None)
+        monkeypatch.setattr(stage_cache, "_default_cache", None)
+        monkeypatch.setattr(layout_profiles, "_default_profiles", None)
+
+    reset()
+    return reset
+
+
+def _plain(df):
+    df = df.copy()
+    df.attrs = {}
+    return df
+
+
+def _read(path):
+    with open(path, "rb") as f:
+        return f.read()
+
+
+def test_batch_matches_page1(server, corpus, fresh_caches, tmp_path):
+    for c in corpus:
+        server.routes[f"/{c['case']}.pdf"] = {"body": _read(c["path"])}
+    urls = [server.url(f"/{c['case']}.pdf") for c in corpus] + [server.url("/missing.pdf")]
+    kwargs = {"parse_workers": 1, "backend": DEFAULT_BACKEND}
+
+    ui_price, ui_errors = collect(iter_parse_urls(urls, **kwargs))
+    ui_matrix = matrix_frame(ui_price.attrs["price_matrix"])
+
+    fresh_caches()
+    out = tmp_path / "out"
+    df_price, errors = batch.run(urls, out, quiet=True, **kwargs)
+
+    assert not ui_price.empty and not ui_matrix.empty
+    assert errors == ui_errors and [u for u, _ in errors] == [server.url("/missing.pdf")]
+    pd.testing.assert_frame_equal(_plain(df_price), _plain(ui_price))
+    pd.testing.assert_frame_equal(matrix_frame(df_price.attrs["price_matrix"]), ui_matrix)
+
+    # 写出的文件：与 Page1 下载按钮（to_excel）/ 同样写法的 parquet、csv 内容相同
+    for name, ui_df in ((batch.RESULT_NAME, ui_price), (batch.MATRIX_NAME, ui_matrix)):
+        buf = BytesIO()
+        ui_df.to_excel(buf, index=False)
+        buf.seek(0)
+        pd.testing.assert_frame_equal(pd.read_excel(out / f"{name}.xlsx"), pd.read_excel(buf))
+        pd.testing.assert_frame_equal(
+            pd.read_parquet(out / f"{name}.parquet"), pd.read_parquet(BytesIO(ui_df.to_parquet(index=False)))
+        )
+        assert _read(out / f"{name}.csv") == ui_df.to_csv(index=False, encoding="utf-8-sig").encode("utf-8-sig")
+    error_csv = pd.DataFrame(ui_errors, columns=["URL", "错误信息"]).to_csv(index=False, encoding="utf-8-sig")
+    assert _read(out / f"{batch.ERROR_NAME}.csv") == error_csv.encode("utf-8-sig")
+
+
+def test_batch_local_files_match_page1(server, corpus, fresh_caches, tmp_path):
+    for c in corpus:
+        server.routes[f"/{c['case']}.pdf"] = {"body": _read(c["path"])}
+    kwargs = {"parse_workers": 2, "backend": DEFAULT_BACKEND}
+
+    ui_price, _ = collect(iter_parse_urls([server.url(f"/{c['case']}.pdf") for c in corpus], **kwargs))
+    fresh_caches()
+    df_price, errors = batch.run(batch.expand_inputs([c["path"] for c in corpus]), tmp_path / "out", quiet=True, **kwargs)
+
+    assert errors == []
+    pd.testing.assert_frame_equal(_plain(df_price), _plain(ui_price))
@@ -0,0 +1,140 @@
+# -*- coding: utf-8 -*-
+# tests/test_crawler.py
+"""TariffCrawler 对着本地镜像站：列表页 304 / 未变 / 已更新、详情页、每省最新一期、URL 和内容去重。"""
+import pytest
+
+from core.crawler import STATUS_DUP, STATUS_KNOWN, STATUS_NEW, TariffCrawler
+from core.fetch import PdfDownloader
+from core.pdf_cache import PdfCache
+
+HTML = "text/html; charset=utf-8"
+
+
+def _html(*links):
+    items = "".join(f'<li><a href="{href}">{text}</a></li>' for href, text in links)
+    return f"<html><body><ul>{items}</ul></body></html>".encode("utf-8")
+
+
+def _pdf(n):
+    return b"%PDF-1.4 " + str(n).encode() * 1000
+
+
+@pytest.fixture
+def crawler(tmp_path):
+    return TariffCrawler(state_path=str(tmp_path / "crawl.sqlite"), min_interval=0)
+
+
+@pytest.fixture
+def downloader(tmp_path):
+    with PdfDownloader(cache=PdfCache(root=str(tmp_path / "pdf")), backoff=0) as dl:
+        yield dl
+
+
+def _mirror(server, etag='"l1"'):
+    server.routes["/list.html"] = {
+        "body": _html(
+            ("/zj/202610.pdf", "国网浙江省电力有限公司2026年10月代理购电价格"),
+            ("/zj/202609.pdf", "国网浙江省电力有限公司2026年9月代理购电价格"),
+            ("/js/detail.html", "江苏2026年10月代理购电价格公告"),
+            ("/about.html", "关于我们"),
+        ),
+        "etag": etag,
+        "content_type": HTML,
+    }
+    server.routes["/js/detail.html"] = {
+        "body": _html(("/js/files/a.pdf", "附件：电价表")),
+        "content_type": HTML,
+    }
+    server.routes["/zj/202610.pdf"] = {"body": _pdf(1)}
+    server.routes["/zj/202609.pdf"] = {"body": _pdf(2)}
+    server.routes["/js/files/a.pdf"] = {"body": _pdf(3)}
+
+
+def test_newest_only_keeps_latest_per_province(server, crawler):
+    _mirror(server)
+    listings = f"{server.url('/list.html')}\n"
+
+    found = crawler.discover(listings)
+    assert found[["省份", "月份", "URL"]].values.tolist() == [
+        ["江苏省", "2026-10", server.url("/js/files/a.pdf")],
+        ["浙江省", "2026-10", server.url("/zj/202610.pdf")],
+    ]
+    assert set(found["状态"]) == {STATUS_NEW}
+
+    everything = crawler.discover(listings, newest_only=False)
+    assert len(everything) == 3
+
+
+def test_listing_revalidates_and_detail_pages_are_fetched_once(server, crawler):
+    _mirror(server)
+    listings = [(server.url("/list.html"), None)]
+
+    crawler.discover(listings)
+    crawler.page_log.clear()
+    crawler.discover(listings)
+
+    log = dict(crawler.page_log)
+    assert log[server.url("/list.html")] == "304"
+    assert log[server.url("/js/detail.html")] == "已缓存"
+    assert server.hits("/list.html")[-1].get("If-None-Match") == '"l1"'
+    assert len(server.hits("/js/detail.html")) == 1
+
+
+def test_listing_without_etag_unchanged_then_changed(server, crawler):
+    _mirror(server, etag=None)
+    listings = [(server.url("/list.html"), "浙江省")]
+
+    crawler.discover(listings)
+    crawler.page_log.clear()
+    crawler.discover(listings)
+    assert dict(crawler.page_log)[server.url("/list.html")] == "未变"
+
+    route = server.routes["/list.html"]
+    route["body"] = _html(("/zj/202611.pdf", "国网浙江省电力有限公司2026年11月代理购电价格")) + route["body"]
+    crawler.page_log.clear()
+    found = crawler.discover(listings)
+    assert dict(crawler.page_log)[server.url("/list.html")] == "已更新"
+    assert server.url("/zj/202611.pdf") in found["URL"].tolist()
+
+
+def test_known_urls_and_duplicate_content_are_skipped(server, crawler, downloader):
+    _mirror(server)
+    listings = [(server.url("/list.html"), None)]
+
+    found = crawler.discover(listings)
+    fresh = crawler.fetch_new(found, downloader)
+    assert set(fresh) == set(found["URL"])
+    crawler.mark_parsed(found, fresh)
+
+    # 再跑一次：URL 都抓过
+    again = crawler.discover(listings)
+    assert set(again["状态"]) == {STATUS_KNOWN}
+    assert crawler.fetch_new(again, downloader) == {}
+
+    # 新一期换了链接，内容却和已入库的一样：标记为内容重复，不解析
+    server.routes["/zj/202611.pdf"] = {"body": _pdf(1)}
+    route = server.routes["/list.html"]
+    route["body"] = _html(("/zj/202611.pdf", "国网浙江省电力有限公司2026年11月代理购电价格")) + route["body"]
+    route["etag"] = '"l2"'
+    found = crawler.discover(listings)
+    assert found.set_index("URL").loc[server.url("/zj/202611.pdf"), "状态"] == STATUS_NEW
+    assert crawler.fetch_new(found, downloader) == {}
+    assert found.set_index("URL").loc[server.url("/zj/202611.pdf"), "状态"] == STATUS_DUP
+
+
+def test_same_content_under_two_new_urls_is_parsed_once(server, crawler, downloader):
+    server.routes["/list.html"] = {
+        "body": _html(
+            ("/a.pdf", "国网河北省电力有限公司2026年10月代理购电价格"),
+            ("/b.pdf", "国网山东省电力有限公司2026年10月代理购电价格"),
+        ),
+        "content_type": HTML,
+    }
+    server.routes["/a.pdf"] = {"body": _pdf(9)}
+    server.routes["/b.pdf"] = {"body": _pdf(9)}
+
+    found = crawler.discover([(server.url("/list.html"), None)])
+    fresh = crawler.fetch_new(found, downloader)
+
+    assert len(fresh) == 1
+    assert sorted(found["状态"]) == sorted([STATUS_NEW, STATUS_DUP])
@@ -0,0 +1,139 @@
+# -*- coding: utf-8 -*-
+# tests/test_fetch.py
+"""PdfDownloader 对着本地 HTTP 服务器：并发下载、失败、条件请求 304、断开后 Range 续传、缓存淘汰。"""
+import hashlib
+import os
+
+import pytest
+
+from core.fetch import PdfDownloader
+from core.pdf_cache import PdfCache
+
+
+def _pdf(n, size=200_000):
+    return (b"%PDF-1.4 " + str(n).encode()) * (size // 10)
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return PdfCache(root=str(tmp_path / "pdf"))
+
+
+def test_iter_fetch_downloads_all(server):
+    bodies = {f"/f{i}.pdf": _pdf(i) for i in range(6)}
+    for path, body in bodies.items():
+        server.routes[path] = {"body": body}
+    urls = [server.url(p) for p in bodies]
+
+    with PdfDownloader(max_workers=3, per_host=2, backoff=0) as dl:
+        results = list(dl.iter_fetch(urls))
+
+    assert sorted(r.idx for r in results) == list(range(6))
+    for r in results:
+        assert r.error is None
+        assert r.content == bodies[f"/f{r.idx}.pdf"]
+        assert r.sha256 == hashlib.sha256(r.content).hexdigest()
+        assert r.how == "downloaded"
+
+
+def test_http_error_is_reported_per_url(server):
+    server.routes["/ok.pdf"] = {"body": _pdf(1)}
+    server.routes["/gone.pdf"] = {"status": 404}
+
+    with PdfDownloader(max_workers=2, retries=0, backoff=0) as dl:
+        results = {r.url: r for r in dl.iter_fetch([server.url("/ok.pdf"), server.url("/gone.pdf")])}
+
+    assert results[server.url("/ok.pdf")].error is None
+    gone = results[server.url("/gone.pdf")]
+    assert gone.content is None and gone.error is not None
+
+
+def test_fresh_cache_sends_no_request(server, cache):
+    server.routes["/a.pdf"] = {"body": _pdf(1), "etag": '"v1"'}
+    url = server.url("/a.pdf")
+
+    with PdfDownloader(cache=cache, backoff=0) as dl:
+        first = list(dl.iter_fetch([url]))[0]
+        second = list(dl.iter_fetch([url]))[0]
+
+    assert first.how == "downloaded" and second.how == "cached"
+    assert second.content == first.content
+    assert len(server.hits("/a.pdf")) == 1
+
+
+def test_stale_cache_revalidates_with_304(server, cache):
+    body = _pdf(2)
+    server.routes["/b.pdf"] = {"body": body, "etag": '"v1"', "last_modified": "Wed, 01 Jan 2025 00:00:00 GMT"}
+    url = server.url("/b.pdf")
+
+    with PdfDownloader(cache=cache, fresh_seconds=0, backoff=0) as dl:
+        list(dl.iter_fetch([url]))
+        again = list(dl.iter_fetch([url]))[0]
+
+    assert again.how == "not_modified" and again.from_cache
+    assert again.content == body
+    hits = server.hits("/b.pdf")
+    assert len(hits) == 2 and hits[1].get("If-None-Match") == '"v1"'
+
+
+def test_changed_file_is_downloaded_again(server, cache):
+    server.routes["/c.pdf"] = {"body": _pdf(3), "etag": '"v1"'}
+    url = server.url("/c.pdf")
+
+    with PdfDownloader(cache=cache, fresh_seconds=0, backoff=0) as dl:
+        list(dl.iter_fetch([url]))
+        server.routes["/c.pdf"] = {"body": _pdf(4), "etag": '"v2"'}
+        again = list(dl.iter_fetch([url]))[0]
+
+    assert again.how == "downloaded" and again.content == _pdf(4)
+
+
+def test_interrupted_body_resumes_with_range(server, cache):
+    body = _pdf(5, size=300_000)
+    server.routes["/d.pdf"] = {"body": body, "etag": '"v1"', "cut": 100_000}
+    url = server.url("/d.pdf")
+
+    with PdfDownloader(cache=cache, retries=0, backoff=0, body_retries=1) as dl:
+        result = list(dl.iter_fetch([url]))[0]
+
+    assert result.error is None and result.how == "resumed"
+    assert result.content == body
+    assert result.sha256 == hashlib.sha256(body).hexdigest()
+    resumed = server.hits("/d.pdf")[-1]
+    start = int(resumed["Range"].split("=")[1].rstrip("-"))
+    assert 0 < start <= 100_000 and resumed.get("If-Range") == '"v1"'
+
+
+def test_304_without_cached_copy_is_an_error(server, cache):
+    server.routes["/e.pdf"] = {"status": 304}
+
+    with PdfDownloader(cache=cache, retries=0, backoff=0) as dl:
+        result = list(dl.iter_fetch([server.url("/e.pdf")]))[0]
+
+    assert result.content is None and result.error is not None
+    assert cache.lookup(server.url("/e.pdf")) is None
+
+
+def test_evicted_blob_is_downloaded_again(server, cache):
+    body = _pdf(6)
+    server.routes["/f.pdf"] = {"body": body, "etag": '"v1"'}
+    url = server.url("/f.pdf")
+
+    with PdfDownloader(cache=cache, fresh_seconds=0, backoff=0) as dl:
+        list(dl.iter_fetch([url]))
+        known = cache.validators(url)
+        os.remove(cache.blob_path(known["sha256"]))     # 条件请求发出后、304 回来前文件被淘汰
+        content, sha, how = dl._get(url, known, None)
+
+    assert content == body and how == "downloaded"
+    hits = server.hits("/f.pdf")
+    assert hits[-2].get("If-None-Match") == '"v1"' and "If-None-Match" not in hits[-1]
+
+
+def test_evict_keeps_blob_just_written(tmp_path):
+    cache = PdfCache(root=str(tmp_path / "pdf"), max_bytes=100_000)
+    small = cache.put("http://x/small.pdf", _pdf(7, size=50_000))
+    big = cache.put("http://x/big.pdf", _pdf(8, size=150_000))
+
+    assert cache.read(big) == _pdf(8, size=150_000)
+    assert cache.lookup("http://x/small.pdf") is None and small != big
@@ -0,0 +1,23 @@
+# -*- coding: utf-8 -*-
+# tests/test_history.py
+"""电价历史库：生效月份的写法统一成 YYYY-MM，认不出（包括只写了年份）的一律报错。"""
+import pytest
+
+from core.history import normalize_month
+
+
+@pytest.mark.parametrize("month, expected", [
+    ("2026-10", "2026-10"),
+    ("2026-1", "2026-01"),
+    ("2026/10", "2026-10"),
+    ("202610", "2026-10"),
+    (" 2026-03 ", "2026-03"),
+])
+def test_normalize_month(month, expected):
+    assert normalize_month(month) == expected
+
+
+@pytest.mark.parametrize("month", ["2026", "2026-13", "2026-00", "26-10", "2026-10-01", "十月", "", None])
+def test_normalize_month_rejects(month):
+    with pytest.raises(ValueError):
+        normalize_month(month)
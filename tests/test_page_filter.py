@@ -0,0 +1,30 @@
+# -*- coding: utf-8 -*-
+# tests/test_page_filter.py
+"""页面预筛：抽表认得出的电压写法，预筛同样当作候选字；开不开预筛，解析结果相同。"""
+import pandas as pd
+
+from bench.corpus import HEADER, _row, _text, table_ops, write_pdf
+from core.extract_backends import DEFAULT_BACKEND
+from core.pdf_parser import parse_single_pdf
+
+
+def _short_voltage(scheme):
+    """1-10kV 行的电压只写「1-10千」（省掉「伏」）。"""
+    row = _row(scheme, "1-10（20）千伏")
+    return [row[0], "1-10千", *row[2:]]
+
+
+def test_prefilter_keeps_rows_the_scanner_recognizes(tmp_path):
+    # 1-10kV 行在表格最下面，除了「1-10千」以外没有别的候选字
+    rows = [_row("单一制", "不满1千伏", label="工商业"), _short_voltage("单一制"), _short_voltage("两部制")]
+    path = write_pdf(
+        str(tmp_path / "short.pdf"),
+        [[_text(40, 800, "国网河北省电力有限公司代理购电价格表", 12)] + table_ops(HEADER, rows)],
+    )
+
+    full = parse_single_pdf(path, prefilter=False, backend=DEFAULT_BACKEND)
+    filtered = parse_single_pdf(path, prefilter=True, backend=DEFAULT_BACKEND)
+    full.attrs, filtered.attrs = {}, {}
+
+    assert full["制度"].tolist() == ["单一制", "两部制"]
+    pd.testing.assert_frame_equal(full, filtered)
@@ -0,0 +1,232 @@
+# -*- coding: utf-8 -*-
+# tests/test_station_fee.py
+"""整表计算（station_fee.compute_fees）与原来逐站点 iterrows 的 process_station_prices 结果逐字节一致。"""
+import re
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from core import schedule, schema
+from core.station_fee import compute_fees, compute_months
+
+
+# ==========================
+# 原 Page3 的逐行实现（照抄，作为对照）
+# ==========================
+def _parse_time_rule_line(line):
+    line = line.strip()
+    if re.match(r"^\d{1,2}:\d{2}", line):
+        return "", line
+    parts = line.split(" ", 1)
+    if len(parts) == 1:
+        return parts[0], ""
+    return parts[0], parts[1].strip()
+
+
+def _parse_month_rule(text):
+    if pd.isna(text):
+        return []
+    lines = [l for l in str(text).split("\n") if l.strip()]
+    out = []
+    for l in lines:
+        t, tm = _parse_time_rule_line(l)
+        out.append({"type": t, "time": tm})
+    return out
+
+
+def _get_price(tier, row):
+    if tier == "":
+        return row.get("不分时电价", None)
+    val = row.get(tier, None)
+    if tier == "尖":
+        if val is None or (isinstance(val, (int, float)) and pd.isna(val)):
+            val = row.get("峰", None)
+    return val
+
+
+def process_station_prices(df_station, df_price, month):
+    df_station = df_station.copy()
+    df_station["配置"] = df_station["配置"].astype(str).str.strip()
+
+    output = []
+    errors = []
+    col = f"电费-{month}月"
+
+    for _, r in df_station.iterrows():
+        prov = r["所在省份"]
+        city = r.get("所属市区", "")
+        config = str(r["配置"]).strip()
+        fs = str(r["是否分时"]).strip()
+        mult = float(r["电费乘子"])
+        rule_txt = r.get(col, "")
+
+        if "广东" in str(prov):
+            if "城市" in df_price.columns:
+                match = df_price[
+                    (df_price["省份"] == prov)
+                    & (df_price["制度"] == config)
+                    & (df_price["城市"] == str(city).strip())
+                ]
+            else:
+                match = df_price[(df_price["省份"] == prov) & (df_price["制度"] == config)]
+            if match.empty:
+                match = df_price[(df_price["省份"] == prov) & (df_price["制度"] == config)]
+        else:
+            match = df_price[(df_price["省份"] == prov) & (df_price["制度"] == config)]
+
+        if match.empty:
+            final = "未匹配到价格"
+            errors.append((r["序号"], r["站点名称"], prov, city, config))
+        else:
+            prow = match.iloc[0]
+            if fs == "否":
+                p = prow["不分时电价"] * mult
+                final = f"0:00 - 24:00 {round(p, 2)}元/度"
+            else:
+                lines = []
+                for rr in _parse_month_rule(rule_txt):
+                    t = rr["type"]
+                    tm = rr["time"]
+                    base = _get_price(t, prow)
+                    if base is None:
+                        lines.append(f"{t} {tm} 无对应电价")
+                    else:
+                        p = round(base * mult, 2)
+                        if t == "":
+                            lines.append(f"{tm} {p}元/度")
+                        else:
+                            lines.append(f"{t} {tm} {p}元/度")
+                final = "\n".join(lines)
+
+        output.append({
+            "序号": r["序号"],
+            "站点名称": r["站点名称"],
+            "省份": prov,
+            "城市": city,
+            "配置": config,
+            "是否分时": fs,
+            "电费乘子": mult,
+            "电费": final,
+        })
+
+    return pd.DataFrame(output), errors
+
+
+# ==========================
+# 随机输入
+# ==========================
+PROVINCES = ["浙江省", "江苏省", "广东省", "河北省", "上海市", "四川省"]
+RULES = [
+    "尖 0:00 - 8:00\n峰 8:00 - 12:00\n平 12:00 - 18:00\n谷 18:00 - 24:00",
+    "0:00 - 24:00",
+    " \n峰  8:00-9:00 \r\n\n深 1:00\n低谷 2:00\n尖\n  12:00 - 13:00  \n",
+    np.nan,
+    "",
+    "峰 8:00　x",
+    12.5,
+    "谷 0:00 - 7:00\n",
+]
+
+
+def _price_table(rng):
+    rows = []
+    for prov in PROVINCES:
+        for scheme in ["单一制", "两部制"]:
+            for city in (["广州", "深圳", ""] if prov == "广东省" else [""]):
+                # 小数位数随机：.5 附近的舍入也覆盖到
+                v = np.round(rng.random(6) * 2 - 0.1, rng.integers(2, 6))
+                if prov == "四川省":
+                    v[1] = np.nan                       # 没有尖 → 用峰
+                if prov == "河北省":
+                    v[0] = v[4] = np.nan                # 不分时、谷为空 → nan元/度
+                if prov == "江苏省":
+                    v[1] = v[2] = np.nan                # 尖、峰都空
+                rows.append([prov, city, scheme, "1-10（20）千伏", *v])
+    return pd.DataFrame(rows, columns=["省份", "城市", "制度", "电压等级", *schema.PRICE_FIELDS])
+
+
+def _with_none(df_price, rng):
+    """深 改成 object 列、一半是 None：原来写「无对应电价」；数值的 round 走 Python 的 round。"""
+    df_price = df_price.copy()
+    df_price["深"] = pd.Series([None if rng.random() < 0.5 else float(v) for v in df_price["深"]], dtype=object)
+    return df_price
+
+
+def _station_table(rng, n):
+    return pd.DataFrame({
+        "序号": range(n),
+        "站点名称": [f"站{i}" for i in range(n)],
+        "所在省份": rng.choice(PROVINCES + ["西藏"], n),
+        "所属市区": rng.choice(["广州", "深圳", "佛山", None], n),
+        "配置": rng.choice(["单一制", " 两部制 ", "单一制", None], n),
+        "是否分时": rng.choice(["是", "否", " 否"], n),
+        "电费乘子": rng.choice([1.0, 1.1, 0.95, 1.005, np.nan, -1.0], n),
+        "电费-1月": rng.choice(np.array(RULES, dtype=object), n),
+    })
+
+
+def _assert_same(df_station, df_price, month=1, compact=False):
+    """compact：compute_fees 拿紧凑表（schema.compact），对照仍用原表——原来的逐行实现只见过原表。"""
+    expected, expected_errors = process_station_prices(df_station, df_price, month)
+    if compact:
+        df_station, df_price = schema.compact(df_station)[0], schema.compact(df_price)[0]
+    result, errors = compute_fees(df_station, df_price, month)
+    pd.testing.assert_frame_equal(result, expected)
+    assert result.equals(expected)
+    assert errors == expected_errors
+
+
+@pytest.mark.parametrize("seed", [1, 2, 3])
+@pytest.mark.parametrize("compact", [False, True])
+def test_compute_fees_matches_iterrows(seed, compact):
+    rng = np.random.default_rng(seed)
+    df_price, df_station = _price_table(rng), _station_table(rng, 400)
+    _assert_same(df_station, df_price, compact=compact)
+    _assert_same(df_station, _with_none(df_price, rng), compact=compact)
+
+
+def test_compute_fees_missing_columns():
+    rng = np.random.default_rng(7)
+    df_price, df_station = _with_none(_price_table(rng), rng), _station_table(rng, 200)
+    _assert_same(df_station.drop(columns="电费-1月"), df_price)              # 本月没有时段列
+    _assert_same(df_station.drop(columns="所属市区"), df_price.drop(columns="尖"))
+    _assert_same(df_station, df_price, month=2)
+
+
+def test_compute_fees_empty():
+    rng = np.random.default_rng(8)
+    result, errors = compute_fees(_station_table(rng, 0), _price_table(rng), 1)
+    assert result.empty and errors == []
+
+
+def test_compute_months_matches_single_month():
+    rng = np.random.default_rng(9)
+    df_price, df_station = _with_none(_price_table(rng), rng), _station_table(rng, 200)
+    df_station["电费-2月"] = df_station["电费-1月"]
+    df_station["电费-3月"] = rng.choice(np.array(RULES, dtype=object), len(df_station))
+
+    results, errors, reused = compute_months(df_station, df_price, [1, 2, 3])
+    assert reused == {2: 1}
+    for m in (1, 2, 3):
+        expected, expected_errors = process_station_prices(df_station, df_price, m)
+        pd.testing.assert_frame_equal(results[m], expected)
+        assert errors == expected_errors
+
+
+@pytest.mark.parametrize("compact", [False, True])
+def test_schedule_matches_fee_texts(compact):
+    # 时段表用算文本的数值直接生成：与把文本拆回来（from_texts）相同，只是负数金额保留符号
+    rng = np.random.default_rng(11)
+    df_price, df_station = _with_none(_price_table(rng), rng), _station_table(rng, 400)
+    df_station["站点名称"] = rng.choice([f"站{i}" for i in range(300)], len(df_station))    # 有同名站点
+    if compact:
+        df_price, df_station = schema.compact(df_price)[0], schema.compact(df_station)[0]
+
+    result, _, fee_schedule = compute_fees(df_station, df_price, 1, with_schedule=True)
+    parsed = schedule.from_texts(result["站点名称"], result["电费"])
+    assert (fee_schedule["价格"] < 0).any() and not parsed.empty
+    pd.testing.assert_frame_equal(fee_schedule.assign(价格=fee_schedule["价格"].abs()), parsed)
+
+    _, _, _, month_schedule = compute_months(df_station, df_price, [1, 2], schedule_month=1)
+    pd.testing.assert_frame_equal(month_schedule, fee_schedule)